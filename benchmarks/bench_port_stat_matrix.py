@@ -0,0 +1,164 @@
+# pylint: disable=too-many-locals
+
+"""
+Benchmark for the CPU time a scrape of the ``PortCollector`` takes, with
+the port statistics derived one port at a time and from a NumPy matrix.
+
+A trace of the stand-in server is recorded once per number of ports, then
+replayed without delays, so that the CPU time of a scrape is that of the
+collector and the exposition of its metrics, and not that of the server.
+The CPU time of the collection alone is reported as well, since the
+exposition of the metrics takes as long either way.
+
+Usage::
+
+    python -m benchmarks.bench_port_stat_matrix --ports 64,128,256
+"""
+
+import pathlib
+import statistics
+import tempfile
+import time
+
+import click
+from prometheus_client import CollectorRegistry, generate_latest
+
+from benchmarks.standin_server import install_sde_modules, serve_in_subprocess
+
+CHANNELS = 4
+
+
+def record_trace(path: pathlib.Path, ports: int):
+    """
+    Record a trace of two scrapes of the stand-in server with the given
+    number of ports, the second of them for the rates.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ska_exporter_common.call_trace import TraceWriter
+    from ska_p4_switch_exporter.port_collector import PortCollector
+    from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+
+    with serve_in_subprocess(
+        front_ports=ports // CHANNELS, channels=CHANNELS
+    ) as (host, port), TraceWriter.open(path) as recorder:
+        pool = RpcConnectionPool(
+            rpc_host=host, rpc_port=port, recorder=recorder
+        )
+        collector = PortCollector(
+            rpc_host=host, rpc_port=port, registry=None, connection_pool=pool
+        )
+        for _ in range(2):
+            list(collector.collect())
+        pool.close()
+
+
+def cpu_times(collector) -> tuple[float, float]:
+    """
+    Scrape the collector once, returning the CPU time the collection took
+    and the CPU time the whole scrape took.
+    """
+    registry = CollectorRegistry()
+    start = time.process_time()
+    metrics = list(collector.collect())
+    collected = time.process_time()
+    registry.register(_Collected(metrics))
+    generate_latest(registry)
+    return collected - start, time.process_time() - start
+
+
+class _Collected:
+    # pylint: disable=too-few-public-methods
+
+    def __init__(self, metrics):
+        self._metrics = metrics
+
+    def collect(self):
+        """
+        Return the metrics collected already.
+        """
+        return self._metrics
+
+
+@click.command()
+@click.option(
+    "--ports",
+    type=str,
+    default="64,128,256",
+    help="Comma-separated numbers of ports to compare",
+)
+@click.option(
+    "--all-stats/--default-stats",
+    default=True,
+    help="Whether to export the metrics of all port statistics, or only the"
+    " ones exported by default",
+)
+@click.option(
+    "--rates/--no-rates",
+    default=True,
+    help="Whether to export the rates of the ports as well",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=20,
+    help="Number of scrapes per configuration",
+)
+def main(ports: str, all_stats: bool, rates: bool, repeat: int):
+    """
+    Benchmark the CPU time of a scrape with and without the statistics
+    matrix.
+    """
+    install_sde_modules()
+    # pylint: disable=import-outside-toplevel
+    from ska_exporter_common.call_trace import read_trace
+    from ska_p4_switch_exporter import port_matrix
+    from ska_p4_switch_exporter.port_collector import PortCollector
+    from ska_p4_switch_exporter.port_stats import (
+        PORT_STAT_METRICS,
+        select_port_stat_metrics,
+    )
+    from ska_p4_switch_exporter.rpc_replay import RpcReplayPool
+
+    if not port_matrix.AVAILABLE:
+        raise click.ClickException("NumPy is not available")
+
+    click.echo(
+        f"Scraping {'all' if all_stats else 'the default'} port statistics"
+        f"{' and rates' if rates else ''}, median CPU time of {repeat}"
+    )
+    for count in [int(count) for count in ports.split(",")]:
+        with tempfile.TemporaryDirectory() as directory:
+            trace = pathlib.Path(directory) / "standin.trace"
+            record_trace(trace, count)
+            records = list(read_trace(trace))
+
+        for stat_matrix in [False, True]:
+            collector = PortCollector(
+                rpc_host="",
+                rpc_port=0,
+                registry=None,
+                connection_pool=RpcReplayPool(records),
+                stat_metrics=(
+                    PORT_STAT_METRICS
+                    if all_stats
+                    else select_port_stat_metrics()
+                ),
+                rates=rates,
+                stat_matrix=stat_matrix,
+            )
+            cpu_times(collector)  # Warm up, and a sample for the rates
+            collect, scrape = (
+                statistics.median(times)
+                for times in zip(
+                    *(cpu_times(collector) for _ in range(repeat))
+                )
+            )
+            click.echo(
+                f"{count:>4} ports, {'matrix' if stat_matrix else 'loop':>6}:"
+                f" {collect * 1e3:8.2f} ms per collection,"
+                f" {scrape * 1e3:8.2f} ms per scrape"
+            )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
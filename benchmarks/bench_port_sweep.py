@@ -0,0 +1,151 @@
+# pylint: disable=no-member
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-locals
+# pylint: disable=too-many-positional-arguments
+
+"""
+Benchmark for a full port sweep of the ``PortCollector``, with and without
+pipelining and concurrency.
+
+Runs the collector against the stand-in ``pal`` server, behind a proxy that
+adds the given round-trip time to every exchange, and reports how long a
+sweep takes for each combination of pipeline depth and concurrency.
+
+Usage::
+
+    python -m benchmarks.bench_port_sweep --front-ports 64 --rtt-ms 1
+"""
+
+import itertools
+import statistics
+import time
+
+import click
+
+from benchmarks.standin_server import install_sde_modules, serve_in_subprocess
+
+
+def sweep(collector) -> tuple[float, int]:
+    """
+    Collect the metrics of the collector once.
+
+    Returns the duration of the sweep and the number of ports collected.
+    """
+    start = time.perf_counter()
+    metrics = {metric.name: metric for metric in collector.collect()}
+    return (
+        time.perf_counter() - start,
+        len(metrics["p4_switch_port_up"].samples),
+    )
+
+
+@click.command()
+@click.option(
+    "--front-ports",
+    type=click.IntRange(min=1),
+    default=64,
+    help="Number of front panel ports of the simulated switch",
+)
+@click.option(
+    "--channels",
+    type=click.IntRange(min=1, max=8),
+    default=4,
+    help="Number of channels per front panel port",
+)
+@click.option(
+    "--rtt-ms",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Round-trip time in milliseconds added to every exchange",
+)
+@click.option(
+    "--depths",
+    type=str,
+    default="0,3,24,96",
+    help="Comma-separated pipeline depths to compare, 0 for no pipelining",
+)
+@click.option(
+    "--concurrency",
+    type=str,
+    default="1,4",
+    help="Comma-separated numbers of connections to compare",
+)
+@click.option(
+    "--refresh-tiers/--no-refresh-tiers",
+    default=False,
+    help="Whether to cache the static information, such as the ports and"
+    " their front panel ports, between sweeps",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=5,
+    help="Number of sweeps per pipeline depth",
+)
+def main(
+    front_ports: int,
+    channels: int,
+    rtt_ms: float,
+    depths: str,
+    concurrency: str,
+    refresh_tiers: bool,
+    repeat: int,
+):
+    """
+    Benchmark a full port sweep with different pipeline depths and
+    concurrency.
+    """
+    install_sde_modules()
+    # pylint: disable=import-outside-toplevel
+    from ska_exporter_common.refresh import RefreshIntervals
+    from ska_p4_switch_exporter.port_collector import PortCollector
+    from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+
+    with serve_in_subprocess(
+        rtt=rtt_ms / 1e3, front_ports=front_ports, channels=channels
+    ) as (host, port):
+        click.echo(
+            f"Sweeping {front_ports * channels} ports"
+            f" with a round-trip time of {rtt_ms} ms, median of {repeat}"
+        )
+
+        baseline = None
+        for workers, depth in itertools.product(
+            [int(workers) for workers in concurrency.split(",")],
+            [int(depth) for depth in depths.split(",")],
+        ):
+            pool = RpcConnectionPool(
+                rpc_host=host, rpc_port=port, max_connections=workers
+            )
+            collector = PortCollector(
+                rpc_host=host,
+                rpc_port=port,
+                registry=None,
+                connection_pool=pool,
+                pipeline_depth=depth,
+                concurrency=workers,
+                refresh_intervals=(
+                    RefreshIntervals() if refresh_tiers else None
+                ),
+            )
+            sweep(collector)  # Connect and warm up
+
+            durations = []
+            for _ in range(repeat):
+                duration, ports = sweep(collector)
+                assert ports == front_ports * channels
+                durations.append(duration)
+            pool.close()
+
+            median = statistics.median(durations)
+            baseline = baseline or median
+            click.echo(
+                f"concurrency {workers:>2}, depth {depth:>4}:"
+                f" {median * 1e3:9.1f} ms per sweep,"
+                f" {median / ports * 1e6:8.1f} us per port,"
+                f" {baseline / median:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
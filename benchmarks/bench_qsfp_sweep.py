@@ -0,0 +1,142 @@
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-locals
+# pylint: disable=too-many-positional-arguments
+
+"""
+Benchmark for a full QSFP sweep of the ``QSFPCollector``, with and without
+concurrency.
+
+Runs the collector against the stand-in ``pltfm_mgr_rpc`` server, where
+each I2C read of a QSFP takes the given time and the reads of one QSFP are
+much slower, and reports how long a sweep takes for each concurrency.
+
+Usage::
+
+    python -m benchmarks.bench_qsfp_sweep --i2c-ms 1 --slow-i2c-ms 50
+"""
+
+import statistics
+import time
+
+import click
+
+from benchmarks.standin_server import (
+    Latency,
+    install_sde_modules,
+    serve_in_subprocess,
+)
+
+
+def sweep(collector) -> tuple[float, int]:
+    """
+    Collect the metrics of the collector once.
+
+    Returns the duration of the sweep and the number of QSFPs collected.
+    """
+    start = time.perf_counter()
+    metrics = {metric.name: metric for metric in collector.collect()}
+    return (
+        time.perf_counter() - start,
+        len(metrics["p4_switch_qsfp_temperature_celsius"].samples),
+    )
+
+
+@click.command()
+@click.option(
+    "--front-ports",
+    type=click.IntRange(min=1),
+    default=64,
+    help="Number of QSFP cages of the simulated switch",
+)
+@click.option(
+    "--rtt-ms",
+    type=click.FloatRange(min=0),
+    default=0.2,
+    help="Round-trip time in milliseconds added to every exchange",
+)
+@click.option(
+    "--i2c-ms",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Time in milliseconds taken by each I2C read of a QSFP",
+)
+@click.option(
+    "--slow-i2c-ms",
+    type=click.FloatRange(min=0),
+    default=50.0,
+    help="Time in milliseconds taken by each I2C read of the slow QSFP",
+)
+@click.option(
+    "--concurrency",
+    type=str,
+    default="1,2,4,8",
+    help="Comma-separated numbers of connections to compare",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Number of sweeps per concurrency",
+)
+def main(
+    front_ports: int,
+    rtt_ms: float,
+    i2c_ms: float,
+    slow_i2c_ms: float,
+    concurrency: str,
+    repeat: int,
+):
+    """
+    Benchmark a full QSFP sweep with different concurrency.
+    """
+    install_sde_modules()
+    # pylint: disable-next=import-outside-toplevel
+    from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
+
+    # pylint: disable-next=import-outside-toplevel
+    from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+
+    with serve_in_subprocess(
+        rtt=rtt_ms / 1e3,
+        front_ports=front_ports,
+        qsfp_presence=1.0,
+        i2c_latency=Latency(i2c_ms / 1e3),
+        slow_qsfps=frozenset([1]),
+        slow_i2c_latency=Latency(slow_i2c_ms / 1e3),
+    ) as (host, port):
+        click.echo(
+            f"Sweeping {front_ports} QSFPs with I2C reads of {i2c_ms} ms,"
+            f" {slow_i2c_ms} ms for QSFP 1, median of {repeat}"
+        )
+
+        baseline = None
+        for workers in [int(workers) for workers in concurrency.split(",")]:
+            pool = RpcConnectionPool(
+                rpc_host=host, rpc_port=port, max_connections=workers
+            )
+            collector = QSFPCollector(
+                rpc_host=host,
+                rpc_port=port,
+                registry=None,
+                connection_pool=pool,
+                concurrency=workers,
+            )
+            sweep(collector)  # Connect and warm up
+
+            durations = []
+            for _ in range(repeat):
+                duration, qsfps = sweep(collector)
+                assert qsfps == front_ports
+                durations.append(duration)
+            pool.close()
+
+            median = statistics.median(durations)
+            baseline = baseline or median
+            click.echo(
+                f"concurrency {workers:>2}: {median * 1e3:9.1f} ms per sweep,"
+                f" {baseline / median:5.1f}x"
+            )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
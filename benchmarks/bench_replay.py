@@ -0,0 +1,157 @@
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-locals
+# pylint: disable=too-many-positional-arguments
+
+"""
+Benchmark for a scrape of the ``PortCollector`` and ``QSFPCollector``,
+replayed from a trace of the calls to the Barefoot RPC server.
+
+The trace is normally recorded on a switch with the ``--rpc-record`` option
+of the exporter, so that the benchmark runs against the responses and
+timings of production. Without a trace, one is first recorded from the
+stand-in server. Each replayed call takes as long as the recorded call, so
+concurrency is compared but pipelining is not: the recorded durations of
+pipelined calls already include its effect.
+
+Usage::
+
+    python -m benchmarks.bench_replay --trace rpc.trace --speed 1
+"""
+
+import pathlib
+import statistics
+import tempfile
+import time
+
+import click
+
+from benchmarks.standin_server import (
+    Latency,
+    install_sde_modules,
+    serve_in_subprocess,
+)
+
+
+def scrape(collectors) -> float:
+    """
+    Collect the metrics of all collectors once, returning how long it took.
+    """
+    start = time.perf_counter()
+    for collector in collectors:
+        list(collector.collect())
+    return time.perf_counter() - start
+
+
+def record_standin_trace(path: pathlib.Path, rtt_ms: float):
+    """
+    Record a trace of a scrape of the stand-in server.
+    """
+    # pylint: disable=import-outside-toplevel
+    from ska_exporter_common.call_trace import TraceWriter
+    from ska_p4_switch_exporter.port_collector import PortCollector
+    from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
+    from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+
+    with serve_in_subprocess(
+        rtt=rtt_ms / 1e3,
+        i2c_latency=Latency(1e-3),
+        latencies=(("pal_port_all_stats_get", Latency(2e-4, 1e-4)),),
+    ) as (host, port), TraceWriter.open(path) as recorder:
+        pool = RpcConnectionPool(
+            rpc_host=host, rpc_port=port, recorder=recorder
+        )
+        scrape(
+            [
+                cls(
+                    rpc_host=host,
+                    rpc_port=port,
+                    registry=None,
+                    connection_pool=pool,
+                )
+                for cls in [PortCollector, QSFPCollector]
+            ]
+        )
+        pool.close()
+
+
+@click.command()
+@click.option(
+    "--trace",
+    type=click.Path(exists=True, dir_okay=False, path_type=pathlib.Path),
+    default=None,
+    help="Trace recorded with --rpc-record, instead of the stand-in server",
+)
+@click.option(
+    "--rtt-ms",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Round-trip time in milliseconds when recording the stand-in server",
+)
+@click.option(
+    "--speed",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Replay speed, 1 for real time or 0 to replay without delays",
+)
+@click.option(
+    "--concurrency",
+    type=str,
+    default="1,2,4,8",
+    help="Comma-separated numbers of connections to compare",
+)
+@click.option(
+    "--repeat",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Number of scrapes per configuration",
+)
+def main(
+    trace: pathlib.Path | None,
+    rtt_ms: float,
+    speed: float,
+    concurrency: str,
+    repeat: int,
+):
+    """
+    Benchmark a replayed scrape with different concurrency.
+    """
+    install_sde_modules()
+    # pylint: disable=import-outside-toplevel
+    from ska_exporter_common.call_trace import read_trace
+    from ska_p4_switch_exporter.port_collector import PortCollector
+    from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
+    from ska_p4_switch_exporter.rpc_replay import RpcReplayPool
+
+    with tempfile.TemporaryDirectory() as directory:
+        if trace is None:
+            trace = pathlib.Path(directory) / "standin.trace"
+            record_standin_trace(trace, rtt_ms)
+        records = list(read_trace(trace))
+
+    click.echo(
+        f"Replaying {len(records)} calls ({trace.name}) at speed {speed},"
+        f" median of {repeat}"
+    )
+    baseline = None
+    for workers in [int(workers) for workers in concurrency.split(",")]:
+        pool = RpcReplayPool(records, speed=speed)
+        collectors = [
+            cls(
+                rpc_host="",
+                rpc_port=0,
+                registry=None,
+                connection_pool=pool,
+                concurrency=workers,
+            )
+            for cls in [PortCollector, QSFPCollector]
+        ]
+        median = statistics.median(scrape(collectors) for _ in range(repeat))
+        baseline = baseline or median
+        click.echo(
+            f"concurrency {workers:>2}: {median * 1e3:9.1f} ms per scrape,"
+            f" {baseline / median:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,74 @@
+# pylint: disable=invalid-name
+# pylint: disable=no-member
+
+"""
+Stand-in Thrift definitions for the parts of the BF SDE ``pal`` service used
+by the exporter.
+
+The SDE generates these definitions from its Thrift IDL, but they are only
+available on a machine with the SDE installed. The definitions here are
+wire-compatible with the SDE for the fields the exporter reads, and this
+module can be used in place of ``tofino.pal_rpc.pal``.
+"""
+
+from thrift.protocol.TBase import TExceptionBase
+from thrift.Thrift import TType
+
+from benchmarks.thrift_service import Method, service, struct
+
+STAT_COUNT = 89
+
+InvalidPalOperation = struct(
+    "InvalidPalOperation",
+    [(1, TType.I32, "code", None)],
+    base=TExceptionBase,
+)
+
+pal_front_panel_port_t = struct(
+    "pal_front_panel_port_t",
+    [
+        (1, TType.I32, "pal_front_port", None),
+        (2, TType.I32, "pal_front_chnl", None),
+    ],
+)
+
+pal_port_stats_t = struct(
+    "pal_port_stats_t",
+    [
+        (1, TType.LIST, "entry", (TType.I64, None, False)),
+        (2, TType.I32, "entry_count", None),
+        (3, TType.I32, "status", None),
+    ],
+)
+
+_DEVICE = (1, TType.I32, "device", None)
+_DEV_PORT = (2, TType.I32, "dev_port", None)
+
+Client, Processor = service(
+    [
+        Method("pal_port_get_first", [_DEVICE], TType.I32),
+        Method(
+            "pal_port_get_next",
+            [_DEVICE, (2, TType.I32, "curr_port", None)],
+            TType.I32,
+        ),
+        Method("pal_port_is_valid", [_DEVICE, _DEV_PORT], TType.I32),
+        Method(
+            "pal_port_dev_port_to_front_panel_port_get",
+            [_DEVICE, _DEV_PORT],
+            TType.STRUCT,
+            pal_front_panel_port_t,
+        ),
+        Method("pal_port_oper_status_get", [_DEVICE, _DEV_PORT], TType.I32),
+        Method(
+            "pal_port_all_stats_get",
+            [_DEVICE, _DEV_PORT],
+            TType.STRUCT,
+            pal_port_stats_t,
+        ),
+    ],
+    exception=InvalidPalOperation,
+)
+
+pal_port_all_stats_get_args = Client.pal_port_all_stats_get_args
+pal_port_all_stats_get_result = Client.pal_port_all_stats_get_result
@@ -0,0 +1,92 @@
+# pylint: disable=invalid-name
+# pylint: disable=no-member
+
+"""
+Stand-in Thrift definitions for the parts of the BF platforms
+``pltfm_mgr_rpc`` service used by the exporter.
+
+Like :py:mod:`benchmarks.pal_thrift`, these definitions follow the Thrift
+IDL shipped with the BF platforms package for the fields the exporter
+reads, and this module can be used in place of
+``pltfm_mgr_rpc.pltfm_mgr_rpc``.
+"""
+
+from thrift.protocol.TBase import TExceptionBase
+from thrift.Thrift import TType
+
+from benchmarks.thrift_service import Method, service, struct
+
+SYS_TMP_COUNT = 10
+
+InvalidPltfmMgrOperation = struct(
+    "InvalidPltfmMgrOperation",
+    [(1, TType.I32, "code", None)],
+    base=TExceptionBase,
+)
+
+pltfm_mgr_sys_tmp_t = struct(
+    "pltfm_mgr_sys_tmp_t",
+    [(i, TType.DOUBLE, f"tmp{i}", None) for i in range(1, SYS_TMP_COUNT + 1)],
+)
+
+pltfm_mgr_qsfp_threshold_t = struct(
+    "pltfm_mgr_qsfp_threshold_t",
+    [
+        (1, TType.DOUBLE, "highalarm", None),
+        (2, TType.DOUBLE, "lowalarm", None),
+        (3, TType.DOUBLE, "highwarning", None),
+        (4, TType.DOUBLE, "lowwarning", None),
+    ],
+)
+
+pltfm_mgr_qsfp_thresholds_t = struct(
+    "pltfm_mgr_qsfp_thresholds_t",
+    [
+        (1, TType.BOOL, "temp_is_set", None),
+        (2, TType.STRUCT, "temp", pltfm_mgr_qsfp_threshold_t),
+        (3, TType.BOOL, "vcc_is_set", None),
+        (4, TType.STRUCT, "vcc", pltfm_mgr_qsfp_threshold_t),
+        (5, TType.BOOL, "rx_pwr_is_set", None),
+        (6, TType.STRUCT, "rx_pwr", pltfm_mgr_qsfp_threshold_t),
+        (7, TType.BOOL, "tx_pwr_is_set", None),
+        (8, TType.STRUCT, "tx_pwr", pltfm_mgr_qsfp_threshold_t),
+    ],
+)
+
+_PORT = (1, TType.I32, "port_num", None)
+
+Client, Processor = service(
+    [
+        Method(
+            "pltfm_mgr_sys_tmp_get",
+            [],
+            TType.STRUCT,
+            pltfm_mgr_sys_tmp_t,
+        ),
+        Method("pltfm_mgr_qsfp_get_max_port", [], TType.I32),
+        Method("pltfm_mgr_qsfp_presence_get", [_PORT], TType.BOOL),
+        Method("pltfm_mgr_qsfp_info_get", [_PORT], TType.STRING, "UTF8"),
+        Method("pltfm_mgr_qsfp_temperature_get", [_PORT], TType.DOUBLE),
+        Method("pltfm_mgr_qsfp_voltage_get", [_PORT], TType.DOUBLE),
+        Method("pltfm_mgr_qsfp_chan_count_get", [_PORT], TType.I32),
+        Method(
+            "pltfm_mgr_qsfp_chan_rx_pwr_get",
+            [_PORT],
+            TType.LIST,
+            (TType.DOUBLE, None, False),
+        ),
+        Method(
+            "pltfm_mgr_qsfp_chan_tx_pwr_get",
+            [_PORT],
+            TType.LIST,
+            (TType.DOUBLE, None, False),
+        ),
+        Method(
+            "pltfm_mgr_qsfp_thresholds_get",
+            [_PORT],
+            TType.STRUCT,
+            pltfm_mgr_qsfp_thresholds_t,
+        ),
+    ],
+    exception=InvalidPltfmMgrOperation,
+)
@@ -0,0 +1,722 @@
+# pylint: disable=no-member
+# pylint: disable=raising-non-exception
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# pylint: disable=too-many-positional-arguments
+
+"""
+Local stand-in for the Thrift server of ``bf_switchd``.
+
+Serves the stand-in ``pal`` and ``pltfm_mgr_rpc`` services over TCP, so
+that the exporter can be benchmarked end to end without a switch. The
+switch is modelled by a :py:class:`StandInConfig`: its number of ports,
+which QSFPs are present, how long each method takes, how slow I2C reads of
+the QSFPs are, and how often connections are dropped. A
+:py:class:`LatencyProxy` can be put in front of the server to simulate the
+round-trip time of a network.
+
+Use :py:func:`serve_in_subprocess` for benchmarks, so that the server does
+not compete with the code being measured for the GIL. The server can also
+be run on its own, see ``python -m benchmarks.standin_server --help``.
+"""
+
+import contextlib
+import dataclasses
+import fnmatch
+import multiprocessing
+import queue
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+import types
+
+import click
+from thrift.protocol import TBinaryProtocol
+from thrift.TMultiplexedProcessor import TMultiplexedProcessor
+from thrift.transport import TSocket, TTransport
+
+from benchmarks import pal_thrift, pltfm_mgr_thrift
+
+# Methods of the pltfm_mgr_rpc service that read the QSFP EEPROM over I2C
+I2C_METHODS = frozenset(
+    [
+        "pltfm_mgr_qsfp_info_get",
+        "pltfm_mgr_qsfp_temperature_get",
+        "pltfm_mgr_qsfp_voltage_get",
+        "pltfm_mgr_qsfp_chan_count_get",
+        "pltfm_mgr_qsfp_chan_rx_pwr_get",
+        "pltfm_mgr_qsfp_chan_tx_pwr_get",
+        "pltfm_mgr_qsfp_thresholds_get",
+    ]
+)
+
+
+@dataclasses.dataclass(frozen=True)
+class Latency:
+    """
+    Distribution of the time taken to handle a call: a fixed ``delay``,
+    plus an exponentially distributed ``jitter`` with the given mean, both
+    in seconds.
+    """
+
+    delay: float = 0.0
+    jitter: float = 0.0
+
+    def sample(self, rng: random.Random) -> float:
+        """
+        Draw the duration of a call.
+        """
+        if not self.jitter:
+            return self.delay
+        return self.delay + rng.expovariate(1 / self.jitter)
+
+    @classmethod
+    def parse(cls, spec: str) -> "Latency":
+        """
+        Parse a ``DELAY_MS[:JITTER_MS]`` specification, in milliseconds.
+        """
+        delay, _, jitter = spec.partition(":")
+        return cls(float(delay) / 1e3, float(jitter or 0) / 1e3)
+
+
+@dataclasses.dataclass(frozen=True)
+class StandInConfig:
+    """
+    Model of the switch served by the stand-in server.
+    """
+
+    front_ports: int = 64
+    """Number of front panel ports, each with a QSFP cage."""
+
+    channels: int = 4
+    """Number of channels each front panel port is broken out into."""
+
+    qsfp_presence: float = 0.75
+    """Probability that a QSFP is plugged into a cage."""
+
+    seed: int = 0
+    """Seed of the random values of the model."""
+
+    latencies: tuple[tuple[str, Latency], ...] = ()
+    """
+    Time taken by each method, as ``(pattern, latency)`` pairs. The first
+    ``fnmatch`` pattern matching the name of a method applies to it.
+    """
+
+    i2c_latency: Latency = Latency()
+    """Additional time taken by each I2C read of a QSFP."""
+
+    i2c_buses: int = 0
+    """
+    Number of I2C buses the QSFP cages are spread over. Reads on the same
+    bus are handled one at a time. 0 to handle all reads concurrently.
+    """
+
+    slow_qsfps: frozenset[int] = frozenset()
+    """Cages whose I2C reads take :py:attr:`slow_i2c_latency` instead."""
+
+    slow_i2c_latency: Latency = Latency(0.05)
+
+    drop_rate: float = 0.0
+    """Probability that the connection is closed instead of replying."""
+
+
+class ConnectionDropped(Exception):
+    """
+    Raised by a handler to close the connection without replying.
+    """
+
+
+class PalHandler:
+    """
+    Handler of the stand-in ``pal`` service, modelling a switch with
+    ``front_ports`` front panel ports broken out into ``channels`` channels
+    each.
+
+    Each front panel port owns a block of 8 device ports, of which only the
+    first ``channels`` are valid, as on a Tofino switch. The counters of
+    ports that are up increase over time, each at its own rate.
+    """
+
+    def __init__(self, front_ports: int = 64, channels: int = 4, seed=0):
+        rng = random.Random(seed)
+        self._start = time.monotonic()
+        self._ports = {}
+        for front_port in range(1, front_ports + 1):
+            for channel in range(channels):
+                dev_port = (front_port - 1) * 8 + channel
+                up = rng.random() < 0.5
+                self._ports[dev_port] = (
+                    pal_thrift.pal_front_panel_port_t(front_port, channel),
+                    up,
+                    [
+                        rng.randrange(0, 2**40)
+                        for _ in range(pal_thrift.STAT_COUNT)
+                    ],
+                    [
+                        rng.uniform(0, 1e6) if up else 0.0
+                        for _ in range(pal_thrift.STAT_COUNT)
+                    ],
+                )
+        self._dev_ports = sorted(self._ports)
+
+    def _port(self, dev_port: int):
+        try:
+            return self._ports[dev_port]
+        except KeyError:
+            raise pal_thrift.InvalidPalOperation(code=1) from None
+
+    def pal_port_get_first(self, device: int) -> int:
+        # pylint: disable=missing-function-docstring,unused-argument
+        return self._dev_ports[0]
+
+    def pal_port_get_next(self, device: int, curr_port: int) -> int:
+        # pylint: disable=missing-function-docstring,unused-argument
+        index = self._dev_ports.index(curr_port) + 1
+        if index >= len(self._dev_ports):
+            raise pal_thrift.InvalidPalOperation(code=1)
+        return self._dev_ports[index]
+
+    def pal_port_is_valid(self, device: int, dev_port: int) -> int:
+        # pylint: disable=missing-function-docstring,unused-argument
+        return int(dev_port in self._ports)
+
+    def pal_port_dev_port_to_front_panel_port_get(
+        self, device: int, dev_port: int
+    ):
+        # pylint: disable=missing-function-docstring,unused-argument
+        return self._port(dev_port)[0]
+
+    def pal_port_oper_status_get(self, device: int, dev_port: int) -> int:
+        # pylint: disable=missing-function-docstring,unused-argument
+        return int(self._port(dev_port)[1])
+
+    def pal_port_all_stats_get(self, device: int, dev_port: int):
+        # pylint: disable=missing-function-docstring,unused-argument
+        _, _, base, rates = self._port(dev_port)
+        elapsed = time.monotonic() - self._start
+        entry = [
+            value + int(rate * elapsed) for value, rate in zip(base, rates)
+        ]
+        return pal_thrift.pal_port_stats_t(
+            entry=entry, entry_count=len(entry), status=0
+        )
+
+
+class PltfmMgrHandler:
+    """
+    Handler of the stand-in ``pltfm_mgr_rpc`` service, modelling a switch
+    with a QSFP cage per front panel port, of which a fraction
+    ``qsfp_presence`` hold a QSFP.
+
+    The identification of each QSFP is encoded in the hex dump of its
+    EEPROM at the offsets of the SFF-8636 upper page 00, and its readings
+    drift slightly from one call to the next.
+    """
+
+    def __init__(
+        self, front_ports: int = 64, qsfp_presence: float = 0.75, seed=0
+    ):
+        self._rng = random.Random(seed)
+        self._front_ports = front_ports
+        self._qsfps = {
+            cage: self._make_qsfp(cage)
+            for cage in range(1, front_ports + 1)
+            if self._rng.random() < qsfp_presence
+        }
+
+    def _make_qsfp(self, cage: int) -> dict:
+        eeprom = bytearray(b" " * 256)
+        for offset, value in [
+            (148, "STAND-IN OPTICS"),
+            (168, "QSFP28-100G-SR4"),
+            (184, "A0"),
+            (196, f"SI{cage:08d}"),
+            (212, "250101"),
+        ]:
+            eeprom[offset : offset + len(value)] = value.encode()
+
+        channels = 4
+        return {
+            "info": eeprom.hex(),
+            "temperature": self._rng.uniform(25, 45),
+            "voltage": self._rng.uniform(3.2, 3.4),
+            "channels": channels,
+            "rx_power": [self._rng.uniform(0.5, 1.5) for _ in range(channels)],
+            "tx_power": [self._rng.uniform(0.5, 1.5) for _ in range(channels)],
+        }
+
+    def _qsfp(self, port_num: int) -> dict:
+        try:
+            return self._qsfps[port_num]
+        except KeyError:
+            raise pltfm_mgr_thrift.InvalidPltfmMgrOperation(code=1) from None
+
+    def _drift(self, value: float) -> float:
+        return value * self._rng.uniform(0.99, 1.01)
+
+    def pltfm_mgr_sys_tmp_get(self):
+        # pylint: disable=missing-function-docstring
+        return pltfm_mgr_thrift.pltfm_mgr_sys_tmp_t(
+            *(self._drift(40.0) for _ in range(pltfm_mgr_thrift.SYS_TMP_COUNT))
+        )
+
+    def pltfm_mgr_qsfp_get_max_port(self) -> int:
+        # pylint: disable=missing-function-docstring
+        # Counts the cage of the CPU port, which the exporter skips
+        return self._front_ports + 1
+
+    def pltfm_mgr_qsfp_presence_get(self, port_num: int) -> bool:
+        # pylint: disable=missing-function-docstring
+        return port_num in self._qsfps
+
+    def pltfm_mgr_qsfp_info_get(self, port_num: int) -> str:
+        # pylint: disable=missing-function-docstring
+        return self._qsfp(port_num)["info"]
+
+    def pltfm_mgr_qsfp_temperature_get(self, port_num: int) -> float:
+        # pylint: disable=missing-function-docstring
+        return self._drift(self._qsfp(port_num)["temperature"])
+
+    def pltfm_mgr_qsfp_voltage_get(self, port_num: int) -> float:
+        # pylint: disable=missing-function-docstring
+        return self._drift(self._qsfp(port_num)["voltage"])
+
+    def pltfm_mgr_qsfp_chan_count_get(self, port_num: int) -> int:
+        # pylint: disable=missing-function-docstring
+        return self._qsfp(port_num)["channels"]
+
+    def pltfm_mgr_qsfp_chan_rx_pwr_get(self, port_num: int) -> list[float]:
+        # pylint: disable=missing-function-docstring
+        return [self._drift(p) for p in self._qsfp(port_num)["rx_power"]]
+
+    def pltfm_mgr_qsfp_chan_tx_pwr_get(self, port_num: int) -> list[float]:
+        # pylint: disable=missing-function-docstring
+        return [self._drift(p) for p in self._qsfp(port_num)["tx_power"]]
+
+    def pltfm_mgr_qsfp_thresholds_get(self, port_num: int):
+        # pylint: disable=missing-function-docstring
+        self._qsfp(port_num)
+        threshold = pltfm_mgr_thrift.pltfm_mgr_qsfp_threshold_t
+        return pltfm_mgr_thrift.pltfm_mgr_qsfp_thresholds_t(
+            temp_is_set=True,
+            temp=threshold(75.0, -5.0, 70.0, 0.0),
+            vcc_is_set=True,
+            vcc=threshold(3.63, 2.97, 3.47, 3.13),
+            rx_pwr_is_set=True,
+            rx_pwr=threshold(3.4, 0.05, 2.2, 0.1),
+            tx_pwr_is_set=False,
+        )
+
+
+class FaultInjector:
+    """
+    Proxy around a handler that delays each call and occasionally drops
+    the connection, as configured by a :py:class:`StandInConfig`.
+    """
+
+    def __init__(self, handler, config: StandInConfig):
+        self._handler = handler
+        self._config = config
+        self._rng = random.Random(config.seed)
+        self._rng_lock = threading.Lock()
+        self._i2c_locks = [
+            threading.Lock() for _ in range(config.i2c_buses)
+        ] or None
+
+    def __getattr__(self, name: str):
+        method = getattr(self._handler, name)
+        latency = next(
+            (
+                latency
+                for pattern, latency in self._config.latencies
+                if fnmatch.fnmatchcase(name, pattern)
+            ),
+            Latency(),
+        )
+
+        def call(*args):
+            with self._rng_lock:
+                delay = latency.sample(self._rng)
+                dropped = self._rng.random() < self._config.drop_rate
+            time.sleep(delay)
+            if dropped:
+                raise ConnectionDropped(name)
+            if name in I2C_METHODS:
+                self._read_i2c(args[0])
+            return method(*args)
+
+        setattr(self, name, call)
+        return call
+
+    def _read_i2c(self, cage: int):
+        latency = (
+            self._config.slow_i2c_latency
+            if cage in self._config.slow_qsfps
+            else self._config.i2c_latency
+        )
+        with self._rng_lock:
+            delay = latency.sample(self._rng)
+
+        if self._i2c_locks is None:
+            time.sleep(delay)
+            return
+        with self._i2c_locks[cage % len(self._i2c_locks)]:
+            time.sleep(delay)
+
+
+def make_processors(config: StandInConfig) -> dict[str, object]:
+    """
+    Create the processors of the stand-in services for the given model,
+    by the names the exporter multiplexes them under.
+    """
+    pal_handler = PalHandler(
+        front_ports=config.front_ports,
+        channels=config.channels,
+        seed=config.seed,
+    )
+    pltfm_mgr_handler = PltfmMgrHandler(
+        front_ports=config.front_ports,
+        qsfp_presence=config.qsfp_presence,
+        seed=config.seed,
+    )
+    return {
+        "pal": pal_thrift.Processor(FaultInjector(pal_handler, config)),
+        "pltfm_mgr_rpc": pltfm_mgr_thrift.Processor(
+            FaultInjector(pltfm_mgr_handler, config)
+        ),
+    }
+
+
+def install_sde_modules():
+    """
+    Make the stand-in modules importable as ``tofino.pal_rpc.pal`` and
+    ``pltfm_mgr_rpc.pltfm_mgr_rpc``, the way the exporter imports them from
+    the SDE.
+    """
+    tofino = types.ModuleType("tofino")
+    tofino.pal_rpc = types.ModuleType("tofino.pal_rpc")
+    tofino.pal_rpc.pal = pal_thrift
+    sys.modules.setdefault("tofino", tofino)
+    sys.modules.setdefault("tofino.pal_rpc", tofino.pal_rpc)
+
+    pltfm_mgr_rpc = types.ModuleType("pltfm_mgr_rpc")
+    pltfm_mgr_rpc.pltfm_mgr_rpc = pltfm_mgr_thrift
+    sys.modules.setdefault("pltfm_mgr_rpc", pltfm_mgr_rpc)
+
+
+class StandInServer:
+    """
+    Thrift server serving the given handlers as multiplexed services,
+    handling each connection in its own thread like ``bf_switchd`` does.
+    """
+
+    def __init__(
+        self,
+        services: dict[str, object],
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self._processor = TMultiplexedProcessor()
+        for name, processor in services.items():
+            self._processor.registerProcessor(name, processor)
+        self._server_socket = TSocket.TServerSocket(host=host, port=port)
+        self._stopped = threading.Event()
+        self.host = host
+        self.port = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def start(self):
+        """
+        Start listening, on a free port if none was given, see
+        :py:attr:`port`.
+        """
+        self._server_socket.listen()
+        self.port = self._server_socket.handle.getsockname()[1]
+        threading.Thread(target=self._serve, daemon=True).start()
+
+    def stop(self):
+        """
+        Stop accepting connections.
+        """
+        self._stopped.set()
+        self._server_socket.close()
+
+    def _serve(self):
+        while not self._stopped.is_set():
+            try:
+                client = self._server_socket.accept()
+            except (OSError, TTransport.TTransportException):
+                return
+            threading.Thread(
+                target=self._handle, args=(client,), daemon=True
+            ).start()
+
+    def _handle(self, client):
+        # Like the C++ Thrift server socket, reply without waiting for ACKs
+        client.handle.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        transport = TTransport.TBufferedTransport(client)
+        protocol = TBinaryProtocol.TBinaryProtocolAccelerated(transport)
+        try:
+            while not self._stopped.is_set():
+                self._processor.process(protocol, protocol)
+        except (
+            ConnectionDropped,
+            EOFError,
+            OSError,
+            TTransport.TTransportException,
+        ):
+            pass
+        finally:
+            transport.close()
+
+
+class LatencyProxy:
+    """
+    TCP proxy that delays all data by half the given round-trip time in
+    each direction.
+
+    Data is delayed, not serialized: data sent while earlier data is still
+    in flight arrives as much later as it was sent, like on a real network.
+    """
+
+    def __init__(
+        self,
+        target_port: int,
+        rtt: float,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self._target = (host, target_port)
+        self._delay = rtt / 2
+        self._listener = socket.create_server((host, port))
+        self.host = host
+        self.port = self._listener.getsockname()[1]
+
+    def __enter__(self):
+        threading.Thread(target=self._serve, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._listener.close()
+
+    def _serve(self):
+        while True:
+            try:
+                downstream, _ = self._listener.accept()
+            except OSError:
+                return
+            upstream = socket.create_connection(self._target)
+            for sock in [downstream, upstream]:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            self._pipe(downstream, upstream)
+            self._pipe(upstream, downstream)
+
+    def _pipe(self, source: socket.socket, destination: socket.socket):
+        in_flight = queue.Queue()
+
+        def receive():
+            while True:
+                try:
+                    data = source.recv(65536)
+                except OSError:
+                    data = b""
+                in_flight.put((time.monotonic() + self._delay, data))
+                if not data:
+                    return
+
+        def deliver():
+            while True:
+                deliver_at, data = in_flight.get()
+                time.sleep(max(deliver_at - time.monotonic(), 0))
+                try:
+                    if not data:
+                        destination.shutdown(socket.SHUT_WR)
+                        return
+                    destination.sendall(data)
+                except OSError:
+                    return
+
+        threading.Thread(target=receive, daemon=True).start()
+        threading.Thread(target=deliver, daemon=True).start()
+
+
+@contextlib.contextmanager
+def serve(
+    config: StandInConfig,
+    rtt: float = 0.0,
+    host: str = "127.0.0.1",
+    port: int = 0,
+):
+    """
+    Run a stand-in server for the given model, behind a
+    :py:class:`LatencyProxy` if a round-trip time is given, for the
+    duration of the context.
+
+    Yields the host and port to connect to.
+    """
+    with StandInServer(
+        make_processors(config), host=host, port=0 if rtt else port
+    ) as server:
+        if not rtt:
+            yield server.host, server.port
+            return
+        with LatencyProxy(server.port, rtt, host=host, port=port) as proxy:
+            yield proxy.host, proxy.port
+
+
+def _serve_until_closed(
+    connection, config: StandInConfig, rtt: float, port: int
+):
+    with serve(config, rtt, port=port) as address:
+        connection.send(address)
+        # Serve until the parent says so, or its end of the pipe is closed
+        try:
+            connection.recv()
+        except EOFError:
+            pass
+
+
+@contextlib.contextmanager
+def serve_in_subprocess(rtt: float = 0.0, port: int = 0, **config_kwargs):
+    """
+    Run a stand-in server behind a :py:class:`LatencyProxy` in a
+    subprocess, for the duration of the context.
+
+    Yields the host and port to connect to, which is a free port unless
+    one is given. The keyword arguments are passed on to
+    :py:class:`StandInConfig`.
+    """
+    config = StandInConfig(**config_kwargs)
+    parent, child = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=_serve_until_closed,
+        args=(child, config, rtt, port),
+        daemon=True,
+    )
+    process.start()
+    try:
+        yield parent.recv()
+    finally:
+        # The forked server holds a copy of the parent's end of the pipe as
+        # well, so it would not see it being closed
+        with contextlib.suppress(OSError):
+            parent.send(None)
+        parent.close()
+        process.join(timeout=5)
+        process.kill()
+
+
+def _parse_latencies(ctx, param, values):
+    # pylint: disable=unused-argument
+    latencies = []
+    for value in values:
+        pattern, separator, spec = value.partition("=")
+        if not separator:
+            raise click.BadParameter(f"expected PATTERN=DELAY_MS, got {value}")
+        latencies.append((pattern, _parse_latency(ctx, param, spec)))
+    return tuple(latencies)
+
+
+def _parse_latency(ctx, param, value):
+    # pylint: disable=unused-argument
+    try:
+        return Latency.parse(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc)) from exc
+
+
+@click.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on")
+@click.option("--port", type=int, default=9090, help="Port to listen on")
+@click.option(
+    "--front-ports",
+    type=click.IntRange(min=1),
+    default=64,
+    help="Number of front panel ports of the simulated switch",
+)
+@click.option(
+    "--channels",
+    type=click.IntRange(min=1, max=8),
+    default=4,
+    help="Number of channels per front panel port",
+)
+@click.option(
+    "--qsfp-presence",
+    type=click.FloatRange(min=0, max=1),
+    default=0.75,
+    help="Fraction of the QSFP cages holding a QSFP",
+)
+@click.option("--seed", type=int, default=0, help="Seed of the model")
+@click.option(
+    "--rtt-ms",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Round-trip time in milliseconds added to every exchange",
+)
+@click.option(
+    "--latency",
+    "latencies",
+    multiple=True,
+    callback=_parse_latencies,
+    help="Time taken by the methods matching a pattern, as"
+    " PATTERN=DELAY_MS[:JITTER_MS]. Can be repeated",
+)
+@click.option(
+    "--i2c-latency",
+    default="0",
+    callback=_parse_latency,
+    help="Time taken by each I2C read of a QSFP, as DELAY_MS[:JITTER_MS]",
+)
+@click.option(
+    "--i2c-buses",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Number of I2C buses on which reads are serialized,"
+    " 0 for no serialization",
+)
+@click.option(
+    "--slow-qsfp",
+    "slow_qsfps",
+    type=int,
+    multiple=True,
+    help="Cage whose I2C reads are slow. Can be repeated",
+)
+@click.option(
+    "--slow-i2c-latency",
+    default="50",
+    callback=_parse_latency,
+    help="Time taken by each I2C read of a slow QSFP,"
+    " as DELAY_MS[:JITTER_MS]",
+)
+@click.option(
+    "--drop-rate",
+    type=click.FloatRange(min=0, max=1),
+    default=0.0,
+    help="Probability that a connection is dropped instead of replying",
+)
+def main(host: str, port: int, rtt_ms: float, slow_qsfps, **config_kwargs):
+    """
+    Serve the stand-in pal and pltfm_mgr_rpc services until interrupted.
+    """
+    config = StandInConfig(slow_qsfps=frozenset(slow_qsfps), **config_kwargs)
+    with serve(config, rtt_ms / 1e3, host=host, port=port) as address:
+        click.echo(f"Serving on {address[0]}:{address[1]}")
+        try:
+            signal.pause()
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    main()  # pylint: disable=no-value-for-parameter
@@ -0,0 +1,208 @@
+# pylint: disable=invalid-name
+# pylint: disable=protected-access
+
+"""
+Helpers to build Thrift structs, clients and processors at runtime.
+
+The classes are built the same way ``thrift --gen py:dynamic`` builds them:
+structs are based on :py:class:`thrift.protocol.TBase.TBase`, which uses the
+Thrift C extension for encoding and decoding when it is available, and
+clients have the usual ``send_<method>`` and ``recv_<method>`` halves of
+each call.
+"""
+
+import dataclasses
+
+from thrift.protocol.TBase import TBase
+from thrift.Thrift import (
+    TApplicationException,
+    TMessageType,
+    TProcessor,
+    TType,
+)
+
+
+def struct(name: str, fields: list[tuple], base: type = TBase) -> type:
+    """
+    Create a Thrift struct class.
+
+    Each field is a ``(field_id, type, name, type_args)`` tuple, using the
+    same notation as the ``thrift_spec`` attribute of generated structs,
+    except that nested structs are given as just their class.
+    """
+    spec = [None] * (max((field[0] for field in fields), default=-1) + 1)
+    for field_id, field_type, field_name, type_args in fields:
+        if field_type == TType.STRUCT:
+            type_args = [type_args, type_args.thrift_spec]
+        spec[field_id] = (field_id, field_type, field_name, type_args, None)
+
+    slots = tuple(field[2] for field in fields)
+
+    def __init__(self, *args, **kwargs):
+        for slot in slots:
+            setattr(self, slot, None)
+        for slot, value in zip(slots, args):
+            setattr(self, slot, value)
+        for slot, value in kwargs.items():
+            setattr(self, slot, value)
+
+    cls = type(name, (base,), {"__slots__": slots, "__init__": __init__})
+    cls.thrift_spec = tuple(spec)
+    return cls
+
+
+@dataclasses.dataclass(frozen=True)
+class Method:
+    """
+    Definition of a method of a Thrift service.
+    """
+
+    name: str
+    args: list[tuple]
+    """Fields of the arguments, in the notation of :py:func:`struct`."""
+
+    result_type: int
+    result_type_args: object = None
+
+
+def service(methods: list[Method], exception: type) -> tuple[type, type]:
+    """
+    Create the client and processor classes of a Thrift service.
+
+    Every method may raise ``exception``, which is returned to the client
+    in the ``ouch`` field of the result, as in the SDE services.
+
+    Returns the client class and the processor class, along with the
+    argument and result structs of each method as ``<method>_args`` and
+    ``<method>_result`` attributes of the client class.
+    """
+    structs = {}
+    for method in methods:
+        structs[method.name] = (
+            struct(f"{method.name}_args", method.args),
+            struct(
+                f"{method.name}_result",
+                [
+                    (
+                        0,
+                        method.result_type,
+                        "success",
+                        method.result_type_args,
+                    ),
+                    (1, TType.STRUCT, "ouch", exception),
+                ],
+            ),
+        )
+
+    client_attrs = {"__init__": _client_init}
+    for method in methods:
+        args_cls, result_cls = structs[method.name]
+        client_attrs[f"{method.name}_args"] = args_cls
+        client_attrs[f"{method.name}_result"] = result_cls
+        client_attrs[f"send_{method.name}"] = _make_send(method.name, args_cls)
+        client_attrs[f"recv_{method.name}"] = _make_recv(
+            method.name, result_cls
+        )
+        client_attrs[method.name] = _make_call(method.name)
+
+    processor_attrs = {
+        "__init__": _processor_init,
+        "process": _make_process(structs, exception),
+    }
+
+    return (
+        type("Client", (), client_attrs),
+        type("Processor", (TProcessor,), processor_attrs),
+    )
+
+
+def _client_init(self, iprot, oprot=None):
+    self._iprot = self._oprot = iprot
+    if oprot is not None:
+        self._oprot = oprot
+    self._seqid = 0
+
+
+def _make_send(name: str, args_cls: type):
+    def send(self, *args):
+        self._oprot.writeMessageBegin(name, TMessageType.CALL, self._seqid)
+        args_cls(*args).write(self._oprot)
+        self._oprot.writeMessageEnd()
+        self._oprot.trans.flush()
+
+    send.__name__ = f"send_{name}"
+    return send
+
+
+def _make_recv(name: str, result_cls: type):
+    def recv(self):
+        iprot = self._iprot
+        _, message_type, _ = iprot.readMessageBegin()
+        if message_type == TMessageType.EXCEPTION:
+            error = TApplicationException()
+            error.read(iprot)
+            iprot.readMessageEnd()
+            raise error
+
+        result = result_cls()
+        result.read(iprot)
+        iprot.readMessageEnd()
+        if result.success is not None:
+            return result.success
+        if result.ouch is not None:
+            raise result.ouch
+        raise TApplicationException(
+            TApplicationException.MISSING_RESULT, f"{name} failed"
+        )
+
+    recv.__name__ = f"recv_{name}"
+    return recv
+
+
+def _make_call(name: str):
+    def call(self, *args):
+        getattr(self, f"send_{name}")(*args)
+        return getattr(self, f"recv_{name}")()
+
+    call.__name__ = name
+    return call
+
+
+def _processor_init(self, handler):
+    self._handler = handler
+
+
+def _make_process(structs: dict[str, tuple[type, type]], exception: type):
+    def process(self, iprot, oprot):
+        name, _, seqid = iprot.readMessageBegin()
+        if name not in structs:
+            iprot.skip(TType.STRUCT)
+            iprot.readMessageEnd()
+            error = TApplicationException(
+                TApplicationException.UNKNOWN_METHOD, f"Unknown method {name}"
+            )
+            oprot.writeMessageBegin(name, TMessageType.EXCEPTION, seqid)
+            error.write(oprot)
+            oprot.writeMessageEnd()
+            oprot.trans.flush()
+            return
+
+        args_cls, result_cls = structs[name]
+        args = args_cls()
+        args.read(iprot)
+        iprot.readMessageEnd()
+
+        result = result_cls()
+        try:
+            result.success = getattr(self._handler, name)(
+                *(getattr(args, slot) for slot in args_cls.__slots__)
+            )
+        except exception as exc:
+            result.ouch = exc
+
+        oprot.writeMessageBegin(name, TMessageType.REPLY, seqid)
+        result.write(oprot)
+        oprot.writeMessageEnd()
+        oprot.trans.flush()
+
+    return process
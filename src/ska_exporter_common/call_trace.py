@@ -0,0 +1,422 @@
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-branches
+# pylint: disable=too-many-positional-arguments
+
+"""
+Compact binary traces of the calls made by the collectors.
+
+A trace records, for each call, when it was made and how long it took, the
+method and its arguments, and the value it returned or the error it
+raised. Traces are written by :py:class:`TraceWriter` and read back with
+:py:func:`read_trace`, so that the calls of a production exporter can be
+replayed offline.
+
+A trace file starts with :py:data:`MAGIC`, followed by a zlib stream of
+length-prefixed records. Values are encoded with a one-byte tag followed by
+variable-length integers, so that small integers take only a few bytes,
+and the stream compresses the names that repeat from call to call.
+Objects and exceptions are recorded by type name and attributes; when read
+back, they are decoded as :py:class:`TraceObject` and
+:py:class:`TraceError`, so that a trace can be read without the modules of
+the recorded types.
+"""
+
+import dataclasses
+import struct
+import threading
+import time
+import zlib
+from collections.abc import Iterator
+from typing import Any, BinaryIO
+
+__all__ = [
+    "MAGIC",
+    "CallRecord",
+    "TraceError",
+    "TraceFormatError",
+    "TraceObject",
+    "TraceWriter",
+    "encode_value",
+    "read_trace",
+]
+
+MAGIC = b"SKATRACE\x01"
+
+_NONE = 0
+_TRUE = 1
+_FALSE = 2
+_INT = 3
+_FLOAT = 4
+_STR = 5
+_BYTES = 6
+_LIST = 7
+_DICT = 8
+_OBJECT = 9
+_ERROR = 10
+
+_FLOAT_FORMAT = struct.Struct("<d")
+
+
+class TraceFormatError(ValueError):
+    """
+    Error raised when a file is not a valid trace.
+    """
+
+
+class TraceObject:
+    """
+    Object read from a trace, with the attributes of the recorded object.
+    """
+
+    def __init__(self, type_name: str, attributes: dict[str, Any]):
+        self.__dict__.update(attributes)
+        self._type_name = type_name
+
+    def __eq__(self, other):
+        return isinstance(other, TraceObject) and vars(self) == vars(other)
+
+    def __repr__(self):
+        attributes = ", ".join(
+            f"{name}={value!r}" for name, value in _attributes(self).items()
+        )
+        return f"{self._type_name}({attributes})"
+
+
+@dataclasses.dataclass(frozen=True)
+class TraceError:
+    """
+    Error read from a trace, with the type name, arguments and attributes
+    of the recorded exception.
+    """
+
+    type_name: str
+    args: tuple
+    attributes: dict[str, Any]
+
+
+@dataclasses.dataclass(frozen=True)
+class CallRecord:
+    """
+    A call read from a trace.
+    """
+
+    timestamp: float
+    """Time at which the call started, in seconds since the trace started."""
+
+    duration: float
+    """Duration of the call in seconds."""
+
+    source: str
+    """What the call was made on, e.g. an RPC endpoint."""
+
+    method: str
+    args: tuple
+
+    value: Any
+    """Value returned by the call, or :py:class:`TraceError` it raised."""
+
+    @property
+    def error(self) -> bool:
+        """
+        Whether the call raised an error.
+        """
+        return isinstance(self.value, TraceError)
+
+
+class TraceWriter:
+    """
+    Writer of a trace file.
+
+    Records can be written from several threads. The compressed stream is
+    flushed to the file at most every ``flush_interval`` seconds, so that a
+    trace stays readable up to its last flush if the exporter is killed.
+    """
+
+    def __init__(
+        self,
+        file: BinaryIO,
+        flush_interval: float = 1.0,
+        clock=time.monotonic,
+    ):
+        self._file = file
+        self._flush_interval = flush_interval
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._compressor = zlib.compressobj()
+        self._start = clock()
+        self._flushed_at = self._start
+        self._file.write(MAGIC)
+
+    @classmethod
+    def open(cls, path, **kwargs) -> "TraceWriter":
+        """
+        Create a writer for a new trace file at the given path.
+        """
+        # pylint: disable-next=consider-using-with
+        return cls(open(path, "wb"), **kwargs)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def clock(self) -> float:
+        """
+        Read the clock used to timestamp calls.
+        """
+        return self._clock()
+
+    def record(
+        self,
+        source: str,
+        method: str,
+        args: tuple,
+        start: float,
+        duration: float,
+        value: Any,
+    ):
+        """
+        Write a call to the trace.
+
+        :param start: time at which the call started, read from
+            :py:meth:`clock`
+        :param value: value returned by the call, or exception it raised
+        """
+        payload = bytearray()
+        _write_uint(payload, max(round((start - self._start) * 1e6), 0))
+        _write_uint(payload, max(round(duration * 1e9), 0))
+        encode_value(source, payload)
+        encode_value(method, payload)
+        encode_value(list(args), payload)
+        encode_value(value, payload)
+
+        frame = bytearray()
+        _write_uint(frame, len(payload))
+        frame += payload
+
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(self._compressor.compress(bytes(frame)))
+            now = self._clock()
+            if now - self._flushed_at >= self._flush_interval:
+                self._flush(now)
+
+    def flush(self):
+        """
+        Flush the records written so far to the file.
+        """
+        with self._lock:
+            if not self._file.closed:
+                self._flush(self._clock())
+
+    def close(self):
+        """
+        Finish the trace and close the file.
+        """
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.write(self._compressor.flush())
+            self._file.close()
+
+    def _flush(self, now: float):
+        self._file.write(self._compressor.flush(zlib.Z_SYNC_FLUSH))
+        self._file.flush()
+        self._flushed_at = now
+
+
+def read_trace(path) -> Iterator[CallRecord]:
+    """
+    Read the calls of a trace file, in the order they were written.
+
+    A trace that was cut short, e.g. because the exporter was killed, is
+    read up to its last complete record.
+    """
+    with open(path, "rb") as file:
+        if file.read(len(MAGIC)) != MAGIC:
+            raise TraceFormatError(f"{path} is not a trace file")
+        decompressor = zlib.decompressobj()
+        try:
+            data = decompressor.decompress(file.read())
+        except zlib.error as exc:
+            raise TraceFormatError(f"{path} is corrupted: {exc}") from exc
+
+    view = memoryview(data)
+    position = 0
+    while position < len(view):
+        try:
+            length, start = _read_uint(view, position)
+        except IndexError:
+            return
+        if start + length > len(view):
+            return
+        position = start + length
+        yield _decode_record(view[start:position])
+
+
+def encode_value(value: Any, out: bytearray):
+    """
+    Append the encoding of a value to ``out``.
+    """
+    if value is None:
+        out.append(_NONE)
+    elif value is True:
+        out.append(_TRUE)
+    elif value is False:
+        out.append(_FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        # Zigzag encoding, so that small negative numbers stay small
+        _write_uint(out, value * 2 if value >= 0 else -value * 2 - 1)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _FLOAT_FORMAT.pack(value)
+    elif isinstance(value, str):
+        encoded = value.encode()
+        out.append(_STR)
+        _write_uint(out, len(encoded))
+        out += encoded
+    elif isinstance(value, (bytes, bytearray)):
+        out.append(_BYTES)
+        _write_uint(out, len(value))
+        out += value
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_uint(out, len(value))
+        for item in value:
+            encode_value(item, out)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_uint(out, len(value))
+        for key, item in value.items():
+            encode_value(key, out)
+            encode_value(item, out)
+    elif isinstance(value, (BaseException, TraceError)):
+        out.append(_ERROR)
+        if isinstance(value, TraceError):
+            type_name, args, attributes = dataclasses.astuple(value)
+        else:
+            type_name = type(value).__name__
+            args, attributes = value.args, _attributes(value)
+        encode_value(type_name, out)
+        encode_value(list(args), out)
+        encode_value(attributes, out)
+    else:
+        out.append(_OBJECT)
+        type_name = (
+            value._type_name  # pylint: disable=protected-access
+            if isinstance(value, TraceObject)
+            else type(value).__name__
+        )
+        encode_value(type_name, out)
+        encode_value(_attributes(value), out)
+
+
+def _attributes(value: Any) -> dict[str, Any]:
+    # Thrift structs keep their fields in slots, other objects in their
+    # dict, and may compute some of them with properties or default them
+    # with class attributes. The Thrift type description is left out, and
+    # so are the attributes of built-in types, such as exception arguments.
+    names = []
+    for cls in type(value).__mro__:
+        if cls.__module__ == "builtins":
+            continue
+        names.extend(getattr(cls, "__slots__", ()))
+        names.extend(
+            name
+            for name, member in vars(cls).items()
+            if isinstance(member, property)
+            or not (callable(member) or name == "thrift_spec")
+        )
+    attributes = {name: getattr(value, name, None) for name in names}
+    attributes.update(getattr(value, "__dict__", {}))
+    return {
+        name: attribute
+        for name, attribute in attributes.items()
+        if not name.startswith("_")
+    }
+
+
+def _write_uint(out: bytearray, value: int):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_uint(data: memoryview, position: int) -> tuple[int, int]:
+    value = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, position
+        shift += 7
+
+
+def _decode_record(data: memoryview) -> CallRecord:
+    timestamp, position = _read_uint(data, 0)
+    duration, position = _read_uint(data, position)
+    source, position = _decode_value(data, position)
+    method, position = _decode_value(data, position)
+    args, position = _decode_value(data, position)
+    value, position = _decode_value(data, position)
+    return CallRecord(
+        timestamp=timestamp / 1e6,
+        duration=duration / 1e9,
+        source=source,
+        method=method,
+        args=tuple(args),
+        value=value,
+    )
+
+
+def _decode_value(data: memoryview, position: int) -> tuple[Any, int]:
+    # pylint: disable=too-many-return-statements
+    tag = data[position]
+    position += 1
+    if tag == _NONE:
+        return None, position
+    if tag == _TRUE:
+        return True, position
+    if tag == _FALSE:
+        return False, position
+    if tag == _INT:
+        value, position = _read_uint(data, position)
+        return (value >> 1) ^ -(value & 1), position
+    if tag == _FLOAT:
+        end = position + _FLOAT_FORMAT.size
+        return _FLOAT_FORMAT.unpack(data[position:end])[0], end
+    if tag in (_STR, _BYTES):
+        length, position = _read_uint(data, position)
+        end = position + length
+        value = bytes(data[position:end])
+        return (value.decode() if tag == _STR else value), end
+    if tag == _LIST:
+        length, position = _read_uint(data, position)
+        items = []
+        for _ in range(length):
+            item, position = _decode_value(data, position)
+            items.append(item)
+        return items, position
+    if tag == _DICT:
+        length, position = _read_uint(data, position)
+        items = {}
+        for _ in range(length):
+            key, position = _decode_value(data, position)
+            items[key], position = _decode_value(data, position)
+        return items, position
+    if tag == _ERROR:
+        type_name, position = _decode_value(data, position)
+        args, position = _decode_value(data, position)
+        attributes, position = _decode_value(data, position)
+        return TraceError(type_name, tuple(args), attributes), position
+    if tag == _OBJECT:
+        type_name, position = _decode_value(data, position)
+        attributes, position = _decode_value(data, position)
+        return TraceObject(type_name, attributes), position
+    raise TraceFormatError(f"Unknown value tag {tag}")
@@ -0,0 +1,110 @@
+"""
+Deadlines that bound how long a scrape may take.
+
+The deadline of the scrape being served is tracked in a context variable,
+so that code deep down the call stack can check how much time is left
+without it having to be passed around explicitly.
+"""
+
+import contextlib
+import contextvars
+import math
+import time
+
+__all__ = [
+    "Deadline",
+    "DeadlineExceededError",
+    "current",
+    "scope",
+]
+
+
+class DeadlineExceededError(RuntimeError):
+    """
+    Error raised when work is abandoned because its deadline has passed.
+    """
+
+
+class Deadline:
+    """
+    Point in time by which some work has to be finished.
+
+    A deadline without a timeout never expires.
+    """
+
+    def __init__(self, timeout: float | None = None):
+        self._expires_at = (
+            math.inf if timeout is None else time.monotonic() + timeout
+        )
+
+    def __repr__(self):
+        return f"{self.__class__.__name__}(remaining={self.remaining()})"
+
+    @property
+    def bounded(self) -> bool:
+        """
+        Whether this deadline expires at all.
+        """
+        return self._expires_at != math.inf
+
+    def remaining(self) -> float:
+        """
+        Time in seconds until the deadline expires, never negative.
+        """
+        return max(self._expires_at - time.monotonic(), 0.0)
+
+    def expired(self) -> bool:
+        """
+        Whether the deadline has passed.
+        """
+        return time.monotonic() >= self._expires_at
+
+    def share(self, parts: int) -> "Deadline":
+        """
+        Create a deadline that expires after an equal share of the time
+        remaining, when that time is split into ``parts``.
+        """
+        if not self.bounded:
+            return Deadline()
+        return Deadline(self.remaining() / max(parts, 1))
+
+    def limit(self, timeout: float | None) -> "Deadline":
+        """
+        Create a deadline that expires after ``timeout`` seconds, or when
+        this deadline expires if that is sooner.
+        """
+        if timeout is None or self.remaining() <= timeout:
+            return self
+        return Deadline(timeout)
+
+    def check(self):
+        """
+        Raise a :py:class:`DeadlineExceededError` if the deadline has passed.
+        """
+        if self.expired():
+            raise DeadlineExceededError("Deadline exceeded")
+
+
+_current_deadline = contextvars.ContextVar(
+    "current_deadline", default=Deadline()
+)
+
+
+def current() -> Deadline:
+    """
+    Get the deadline of the work currently being done.
+    """
+    return _current_deadline.get()
+
+
+@contextlib.contextmanager
+def scope(deadline: Deadline):
+    """
+    Make the given deadline the current deadline for the duration of the
+    context.
+    """
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
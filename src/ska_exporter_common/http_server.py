@@ -0,0 +1,107 @@
+"""
+HTTP server exposing the metrics of a registry, bounding each scrape by the
+timeout requested by Prometheus.
+"""
+
+import logging
+import socket
+import threading
+from wsgiref.simple_server import WSGIRequestHandler, WSGIServer, make_server
+
+from prometheus_client import make_wsgi_app
+from prometheus_client.exposition import ThreadingWSGIServer
+from prometheus_client.registry import REGISTRY, CollectorRegistry
+
+from ska_exporter_common import deadline
+
+__all__ = [
+    "SCRAPE_TIMEOUT_HEADER",
+    "make_deadline_wsgi_app",
+    "start_http_server",
+]
+
+SCRAPE_TIMEOUT_HEADER = "HTTP_X_PROMETHEUS_SCRAPE_TIMEOUT_SECONDS"
+"""
+WSGI environment key of the header in which Prometheus sends the scrape
+timeout, in seconds.
+"""
+
+
+class _SilentHandler(WSGIRequestHandler):
+    """
+    Request handler that does not log requests.
+    """
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+
+def make_deadline_wsgi_app(
+    registry: CollectorRegistry = REGISTRY,
+    timeout_offset: float = 0.5,
+    logger: logging.Logger | None = None,
+):
+    """
+    Create a WSGI app serving the metrics of the registry.
+
+    Each scrape runs with a :py:class:`~ska_exporter_common.deadline.
+    Deadline` derived from the ``X-Prometheus-Scrape-Timeout-Seconds``
+    header, less ``timeout_offset`` seconds to leave time to send the
+    response. Scrapes without the header are not bounded.
+    """
+    logger = logger or logging.getLogger(__name__)
+    metrics_app = make_wsgi_app(registry)
+
+    def app(environ, start_response):
+        timeout = None
+        header = environ.get(SCRAPE_TIMEOUT_HEADER)
+        if header is not None:
+            try:
+                timeout = float(header)
+            except ValueError:
+                logger.warning("Ignoring invalid scrape timeout: %r", header)
+            else:
+                if timeout > timeout_offset:
+                    timeout -= timeout_offset
+
+        with deadline.scope(deadline.Deadline(timeout)):
+            return metrics_app(environ, start_response)
+
+    return app
+
+
+def start_http_server(
+    port: int,
+    addr: str = "0.0.0.0",
+    registry: CollectorRegistry = REGISTRY,
+    timeout_offset: float = 0.5,
+    logger: logging.Logger | None = None,
+) -> tuple[WSGIServer, threading.Thread]:
+    """
+    Start an HTTP server serving the metrics of the registry in a daemon
+    thread.
+
+    This is equivalent to :py:func:`prometheus_client.start_http_server`,
+    except that scrapes are bounded by the timeout requested by Prometheus,
+    see :py:func:`make_deadline_wsgi_app`.
+    """
+
+    class Server(ThreadingWSGIServer):
+        """
+        Server listening on the address family of the given address.
+        """
+
+        address_family = socket.getaddrinfo(
+            addr, port, type=socket.SOCK_STREAM, flags=socket.AI_PASSIVE
+        )[0][0]
+
+    server = make_server(
+        addr,
+        port,
+        make_deadline_wsgi_app(registry, timeout_offset, logger),
+        Server,
+        handler_class=_SilentHandler,
+    )
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
@@ -0,0 +1,88 @@
+"""
+Outcome of a collection, for collectors that return what they could
+collect instead of failing.
+
+A Prometheus collector can only return metrics, so a collector that gives
+up part of a collection, e.g. because its deadline passed, or all of it,
+e.g. because the hardware cannot be reached, reports so with
+:py:func:`report_partial` or :py:func:`report_failed`. Whoever runs the
+collector tracks the outcome of the collection with :py:func:`track`.
+
+The outcome is tracked in a context variable, so that it is reported by
+the worker threads of a collector as well, as long as they run in a copy
+of its context.
+"""
+
+import contextlib
+import contextvars
+import dataclasses
+
+__all__ = [
+    "Outcome",
+    "report_failed",
+    "report_partial",
+    "track",
+]
+
+
+@dataclasses.dataclass
+class Outcome:
+    """
+    Outcome of a collection.
+    """
+
+    partial: bool = False
+    """Whether part of the metrics could not be collected."""
+
+    failed: bool = False
+    """Whether none of the metrics could be collected."""
+
+    reasons: list[str] = dataclasses.field(default_factory=list)
+    """Why the collection is partial or failed."""
+
+    @property
+    def complete(self) -> bool:
+        """
+        Whether all metrics were collected.
+        """
+        return not (self.partial or self.failed)
+
+
+_current: contextvars.ContextVar[Outcome | None] = contextvars.ContextVar(
+    "outcome", default=None
+)
+
+
+@contextlib.contextmanager
+def track():
+    """
+    Track the outcome of the collection run within the context.
+    """
+    outcome = Outcome()
+    token = _current.set(outcome)
+    try:
+        yield outcome
+    finally:
+        _current.reset(token)
+
+
+def report_partial(reason: str):
+    """
+    Report that part of the metrics of the current collection could not be
+    collected.
+    """
+    outcome = _current.get()
+    if outcome is not None:
+        outcome.partial = True
+        outcome.reasons.append(reason)
+
+
+def report_failed(reason: str):
+    """
+    Report that none of the metrics of the current collection could be
+    collected.
+    """
+    outcome = _current.get()
+    if outcome is not None:
+        outcome.failed = True
+        outcome.reasons.append(reason)
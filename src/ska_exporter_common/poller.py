@@ -0,0 +1,191 @@
+"""
+Background polling of collectors, decoupling hardware reads from scrapes.
+"""
+
+import dataclasses
+import logging
+import threading
+import time
+
+from prometheus_client import Metric
+from prometheus_client.registry import Collector
+
+from ska_exporter_common import deadline, outcome
+
+__all__ = [
+    "PolledCollector",
+    "Poller",
+    "Snapshot",
+]
+
+
+@dataclasses.dataclass(frozen=True)
+class Snapshot:
+    """
+    Metrics collected by a poll of a collector.
+    """
+
+    metrics: tuple[Metric, ...]
+
+    timestamp: float
+    """Time at which the poll finished, in seconds since the epoch."""
+
+    duration: float
+    """Duration of the poll in seconds."""
+
+    complete: bool = True
+    """Whether the poll collected all metrics."""
+
+
+class PolledCollector(Collector):
+    """
+    Collector returning the latest snapshot of the metrics of another
+    collector, which is polled in the background by a :py:class:`Poller`.
+
+    The snapshot is replaced as a whole once a poll has finished, so
+    scrapes never wait for a poll and never see one in progress. Until the
+    first poll has finished, no metrics are returned.
+
+    A poll that fails, or that the collector reports as failed or partial
+    with :py:mod:`~ska_exporter_common.outcome`, does not replace the
+    snapshot, so its metrics and timestamp are those of the last complete
+    poll. Only while there is no complete snapshot yet is a partial poll
+    kept.
+    """
+
+    def __init__(
+        self,
+        collector: Collector,
+        interval: float,
+        timeout: float | None = None,
+        logger: logging.Logger | None = None,
+    ):
+        self.collector = collector
+        self.interval = interval
+        self.timeout = interval if timeout is None else timeout
+        self._logger = logger or logging.getLogger(__name__)
+        self._snapshot: Snapshot | None = None
+
+    @property
+    def name(self) -> str:
+        """
+        Name of the polled collector.
+        """
+        return self.collector.__class__.__name__
+
+    @property
+    def snapshot(self) -> Snapshot | None:
+        """
+        Latest snapshot, or ``None`` before the first poll has finished.
+        """
+        return self._snapshot
+
+    def poll(self):
+        """
+        Collect the metrics of the polled collector, bounded by the poll
+        timeout, and make them the latest snapshot.
+
+        If the collector fails, or collects only part of its metrics, the
+        previous snapshot is kept.
+        """
+        start = time.monotonic()
+        try:
+            with outcome.track() as result:
+                with deadline.scope(deadline.Deadline(self.timeout)):
+                    metrics = tuple(self.collector.collect())
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception("Polling %s failed", self.name)
+            return
+
+        duration = time.monotonic() - start
+        if not result.complete:
+            self._logger.warning(
+                "Polling %s returned %s results (%s)",
+                self.name,
+                "no" if result.failed else "partial",
+                "; ".join(result.reasons),
+            )
+            previous = self._snapshot
+            if result.failed or (previous is not None and previous.complete):
+                return
+        self._logger.debug("Polled %s in %.3f seconds", self.name, duration)
+        # Replacing the reference is atomic, readers see either snapshot
+        self._snapshot = Snapshot(
+            metrics, time.time(), duration, complete=result.complete
+        )
+
+    def collect(self):
+        snapshot = self._snapshot
+        if snapshot is not None:
+            yield from snapshot.metrics
+
+
+class Poller:
+    """
+    Scheduler polling collectors in the background, each on its own
+    interval.
+
+    Each collector is polled by a thread of its own, so that a slow
+    collector does not delay the others. A poll starts ``interval`` seconds
+    after the previous one started, or right after it finished if it took
+    longer than that, and is bounded by a deadline of ``timeout`` seconds,
+    the interval by default.
+
+    The :py:class:`PolledCollector` returned by :py:meth:`add` is to be
+    registered instead of the collector itself.
+    """
+
+    def __init__(self, logger: logging.Logger | None = None):
+        self._logger = logger or logging.getLogger(__name__)
+        self._collectors: list[PolledCollector] = []
+        self._threads: list[threading.Thread] = []
+        self._stopped = threading.Event()
+
+    def add(
+        self,
+        collector: Collector,
+        interval: float,
+        timeout: float | None = None,
+    ) -> PolledCollector:
+        """
+        Add a collector to poll every ``interval`` seconds.
+        """
+        polled = PolledCollector(
+            collector, interval, timeout=timeout, logger=self._logger
+        )
+        self._logger.info(
+            "Polling %s every %.3g seconds", polled.name, interval
+        )
+        self._collectors.append(polled)
+        return polled
+
+    def start(self):
+        """
+        Start polling all collectors, beginning with an immediate poll.
+        """
+        for polled in self._collectors:
+            thread = threading.Thread(
+                target=self._run,
+                args=(polled,),
+                name=f"Poller-{polled.name}",
+                daemon=True,
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop polling, waiting up to ``timeout`` seconds for the polls in
+        progress to finish.
+        """
+        self._stopped.set()
+        for thread in self._threads:
+            thread.join(timeout=timeout)
+        self._threads.clear()
+
+    def _run(self, polled: PolledCollector):
+        next_poll = time.monotonic()
+        while not self._stopped.is_set():
+            polled.poll()
+            next_poll = max(next_poll + polled.interval, time.monotonic())
+            self._stopped.wait(next_poll - time.monotonic())
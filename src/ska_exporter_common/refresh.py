@@ -0,0 +1,253 @@
+"""
+Refresh tiers, so that values that change slowly or not at all are not
+read from the hardware on every collection.
+
+Readings can also be refreshed adaptively: read often while they change
+quickly or are close to their warning and alarm thresholds, and less and
+less often while they stay flat.
+"""
+
+import dataclasses
+import enum
+import threading
+import time
+from collections.abc import Callable, Hashable, Sequence
+from typing import Any
+
+__all__ = [
+    "Reading",
+    "RefreshCache",
+    "RefreshIntervals",
+    "RefreshTier",
+]
+
+Reading = tuple[float, Sequence[float]]
+"""A reading, along with the warning and alarm thresholds that apply to it."""
+
+# Change between two readings, relative to their scale, from which a
+# reading is considered to be changing quickly
+_VOLATILE_CHANGE = 0.02
+
+# Distance to a threshold, relative to the scale of the reading, from which
+# a reading is considered to be close to it
+_NEAR_THRESHOLD = 0.1
+
+# Number of flat readings it takes to back off from the minimum to the
+# maximum adaptive interval
+_BACKOFF_STEPS = 4
+
+
+class RefreshTier(enum.Enum):
+    """
+    How often a value is read from the hardware.
+    """
+
+    FAST = "fast"
+    """Values that change all the time, such as counters."""
+
+    MEDIUM = "medium"
+    """Values that change slowly, such as temperatures."""
+
+    STATIC = "static"
+    """Values that only change when the hardware does, such as serials."""
+
+
+@dataclasses.dataclass(frozen=True)
+class RefreshIntervals:
+    """
+    Time in seconds after which the values of each tier are read again.
+
+    Fast and medium values with an interval of 0 are read on every
+    collection. Static values are read again whenever the trigger they
+    were read with changes, and, with an interval greater than 0, once
+    they are older than that as well.
+    """
+
+    fast: float = 0.0
+    medium: float = 0.0
+    static: float = 0.0
+
+    adaptive_min: float = 0.0
+    """Interval of adaptive readings that change or are close to a limit."""
+
+    adaptive_max: float = 0.0
+    """Interval of adaptive readings that stay flat, 0 to not adapt."""
+
+    def interval(self, tier: RefreshTier) -> float:
+        """
+        Get the interval of the given tier.
+        """
+        return getattr(self, tier.value)
+
+
+@dataclasses.dataclass(frozen=True)
+class _Entry:
+    value: Any
+    read_at: float
+    trigger: Hashable
+
+    interval: float | None = None
+    """Adapted interval, instead of the interval of the tier."""
+
+
+@dataclasses.dataclass(frozen=True)
+class _Adaptation:
+    read_at: float
+    values: tuple[float, ...]
+    interval: float
+
+
+class RefreshCache:
+    """
+    Cache of the values read from the hardware, each of which is read
+    again once it is older than the interval of its tier.
+
+    Without intervals, nothing is cached and every value is read on every
+    collection.
+
+    With adaptive intervals, the interval of a value the collector passes
+    the readings of to :py:meth:`adapt` is adapted to them instead: it
+    drops to the minimum adaptive interval as soon as a reading changes by
+    more than a few percent of its scale or comes close to one of its
+    thresholds, and grows back to the maximum over a few readings that
+    stay flat. The scale of a reading is the range between its lowest and
+    highest thresholds, or its magnitude without.
+    """
+
+    MISSING = object()
+    """Marker returned by :py:meth:`lookup` for values to read again."""
+
+    def __init__(
+        self,
+        intervals: RefreshIntervals | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.intervals = intervals
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._entries: dict[Hashable, _Entry] = {}
+        self._adaptations: dict[Hashable, _Adaptation] = {}
+
+    @property
+    def adaptive(self) -> bool:
+        """
+        Whether the intervals are adapted to the readings.
+        """
+        return self.intervals is not None and bool(self.intervals.adaptive_max)
+
+    def lookup(
+        self, key: Hashable, tier: RefreshTier, trigger: Hashable = None
+    ) -> Any:
+        """
+        Get the cached value of a key, or :py:attr:`MISSING` if it has to
+        be read again.
+        """
+        if self.intervals is None:
+            return self.MISSING
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.trigger != trigger:
+            return self.MISSING
+
+        interval = entry.interval
+        if interval is None:
+            interval = self.intervals.interval(tier)
+            if tier is RefreshTier.STATIC and not interval:
+                return entry.value
+        if self._clock() - entry.read_at >= interval:
+            return self.MISSING
+        return entry.value
+
+    def store(self, key: Hashable, value: Any, trigger: Hashable = None):
+        """
+        Cache the value read for a key, along with its trigger.
+        """
+        if self.intervals is None:
+            return
+        with self._lock:
+            self._entries[key] = _Entry(value, self._clock(), trigger)
+
+    def get(
+        self,
+        key: Hashable,
+        tier: RefreshTier,
+        read: Callable[[], Any],
+        trigger: Hashable = None,
+    ) -> Any:
+        """
+        Get the cached value of a key, calling ``read`` to read it again
+        if it is missing or out of date.
+        """
+        value = self.lookup(key, tier, trigger)
+        if value is self.MISSING:
+            value = read()
+            self.store(key, value, trigger)
+        return value
+
+    def adapt(self, key: Hashable, readings: Sequence[Reading]):
+        """
+        Adapt the interval of the cached value of a key to the readings it
+        was decoded to, unless they were adapted to already.
+        """
+        if not self.adaptive:
+            return
+        intervals = self.intervals
+        with self._lock:
+            entry = self._entries.get(key)
+            previous = self._adaptations.get(key)
+            if entry is None or (
+                previous is not None and previous.read_at == entry.read_at
+            ):
+                return
+
+            values = tuple(value for value, _ in readings)
+            interval = intervals.adaptive_min
+            if (
+                previous is not None
+                and len(previous.values) == len(values)
+                and not any(
+                    _volatile(reading, last)
+                    for reading, last in zip(readings, previous.values)
+                )
+            ):
+                interval = min(
+                    previous.interval
+                    + (intervals.adaptive_max - intervals.adaptive_min)
+                    / _BACKOFF_STEPS,
+                    intervals.adaptive_max,
+                )
+
+            self._adaptations[key] = _Adaptation(
+                entry.read_at, values, interval
+            )
+            self._entries[key] = dataclasses.replace(entry, interval=interval)
+
+    def invalidate(self, predicate: Callable[[Hashable], bool]):
+        """
+        Drop the cached values of the keys matching the predicate, so that
+        they are read again.
+        """
+        with self._lock:
+            for key in [key for key in self._entries if predicate(key)]:
+                del self._entries[key]
+            for key in [key for key in self._adaptations if predicate(key)]:
+                del self._adaptations[key]
+
+
+def _volatile(reading: Reading, last: float) -> bool:
+    """
+    Whether a reading changed quickly since the last one, or is close to
+    one of its thresholds.
+    """
+    value, thresholds = reading
+    low, high = min(thresholds, default=value), max(thresholds, default=value)
+    if high > low:
+        if not low < value < high:
+            return True
+        scale = high - low
+    else:
+        scale = max([abs(value), abs(last), *map(abs, thresholds)]) or 1.0
+    return abs(value - last) >= _VOLATILE_CHANGE * scale or any(
+        abs(value - threshold) <= _NEAR_THRESHOLD * scale
+        for threshold in thresholds
+    )
@@ -0,0 +1,448 @@
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-instance-attributes
+
+"""
+Prometheus collector registry used by the exporter.
+"""
+
+import contextvars
+import dataclasses
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
+from prometheus_client import Metric
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector, CollectorRegistry
+
+from ska_exporter_common import deadline, outcome
+from ska_exporter_common.poller import PolledCollector
+
+__all__ = [
+    "CoalescingRegistry",
+    "ExporterRegistry",
+    "ParallelRegistry",
+]
+
+
+class ExporterRegistry(CollectorRegistry):
+    """
+    Prometheus collector registry used by the exporter.
+
+    The time left until the deadline of a scrape is shared between the
+    collectors that still have to run: each collector gets an equal share,
+    and time a collector does not use is passed on to the next ones. Each
+    collector runs with its share as the current deadline, so that it can
+    stop in time and return what it collected so far.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        **kwargs,
+    ):
+        super().__init__(**kwargs)
+        self._logger = logger or logging.getLogger(__name__)
+        self._collectors_lock = threading.Lock()
+        self._collectors: list[Collector] = []
+
+    def register(self, collector: Collector):
+        super().register(collector)
+        with self._collectors_lock:
+            self._collectors.append(collector)
+
+    def unregister(self, collector: Collector):
+        super().unregister(collector)
+        with self._collectors_lock:
+            self._collectors.remove(collector)
+
+    def collect(self):
+        with self._collectors_lock:
+            collectors = list(self._collectors)
+
+        scrape_deadline = deadline.current()
+        for i, collector in enumerate(collectors):
+            collector_deadline = scrape_deadline.share(len(collectors) - i)
+            start = time.monotonic()
+            with deadline.scope(collector_deadline):
+                metrics = list(collector.collect())
+
+            if collector_deadline.expired():
+                self._logger.warning(
+                    "%s exceeded its deadline after %.3f seconds",
+                    collector.__class__.__name__,
+                    time.monotonic() - start,
+                )
+            yield from metrics
+
+
+class ParallelRegistry(ExporterRegistry):
+    """
+    Prometheus collector registry that runs its collectors concurrently,
+    so that a scrape takes as long as the slowest collector instead of
+    all of them together.
+
+    Each collector runs in a worker thread with the deadline of the scrape,
+    limited to ``collector_timeout`` seconds if given. A collector that has
+    not returned shortly after its deadline is not waited for, and neither
+    is it run again in later scrapes until it has returned. The metrics are
+    returned in the order the collectors were registered in, whatever order
+    they finish in.
+
+    When a collector is not waited for, raises an error, or reports its
+    collection as partial or failed with :py:mod:`~ska_exporter_common.
+    outcome`, the metrics of its last successful collection are returned
+    instead, so that a single slow or failing collector does not empty the
+    scrape. Failing that, the metrics of a partial collection are returned
+    as they are. How old the metrics of each collector are is exported
+    along with them.
+
+    The names of the metrics about the collectors start with
+    ``metric_prefix``, the name of the exporter.
+
+    Collectors registered with ``last`` run in the scrape thread once the
+    others have returned, so that collectors reporting on the calls made
+    by the others, such as the RPC connection pool, see all of them.
+    """
+
+    grace_period = 0.1
+    """
+    Time in seconds a collector is given past its deadline to return what
+    it collected until then.
+    """
+
+    def __init__(
+        self,
+        logger: logging.Logger | None = None,
+        collector_timeout: float | None = None,
+        max_workers: int = 8,
+        metric_prefix: str = "exporter",
+        **kwargs,
+    ):
+        super().__init__(logger=logger, **kwargs)
+        self._collector_timeout = collector_timeout
+        self._metric_prefix = metric_prefix
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=self.__class__.__name__,
+        )
+        self._running_lock = threading.Lock()
+        self._running: dict[int, Future] = {}
+        self._last: list[Collector] = []
+        self._successes_lock = threading.Lock()
+        self._successes: dict[Collector, _Success] = {}
+
+    def register(self, collector: Collector, last: bool = False):
+        """
+        Add a collector to the registry, to be run after all the others
+        if ``last`` is set.
+        """
+        super().register(collector)
+        if last:
+            with self._collectors_lock:
+                self._last.append(collector)
+
+    def unregister(self, collector: Collector):
+        super().unregister(collector)
+        with self._collectors_lock:
+            if collector in self._last:
+                self._last.remove(collector)
+        with self._successes_lock:
+            self._successes.pop(collector, None)
+
+    def collect(self):
+        with self._collectors_lock:
+            collectors = [
+                collector
+                for collector in self._collectors
+                if collector not in self._last
+            ]
+            last = list(self._last)
+
+        scrape_deadline = deadline.current()
+        collector_deadline = scrape_deadline.limit(self._collector_timeout)
+        futures = [
+            self._submit(collector, collector_deadline)
+            for collector in collectors
+        ]
+        for collector, future in zip(collectors, futures):
+            yield from self._wait(collector, future, collector_deadline)
+
+        for collector in last:
+            try:
+                with outcome.track() as result:
+                    with deadline.scope(scrape_deadline):
+                        metrics = list(collector.collect())
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception(
+                    "%s failed, serving its last result",
+                    _collector_name(collector),
+                )
+                metrics = self._last_success(collector)
+            else:
+                metrics = self._completed(collector, metrics, result)
+            yield from metrics
+
+        yield from self._staleness_metrics()
+
+    def close(self):
+        """
+        Stop the worker threads once the collectors still running return.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _submit(
+        self, collector: Collector, collector_deadline: deadline.Deadline
+    ) -> Future | None:
+        with self._running_lock:
+            running = self._running.get(id(collector))
+            if running is not None and not running.done():
+                self._logger.warning(
+                    "%s is still running since a previous scrape,"
+                    " serving its last result",
+                    _collector_name(collector),
+                )
+                return None
+
+            def run():
+                with outcome.track() as result:
+                    with deadline.scope(collector_deadline):
+                        return list(collector.collect()), result
+
+            future = self._executor.submit(contextvars.copy_context().run, run)
+            self._running[id(collector)] = future
+            return future
+
+    def _wait(
+        self,
+        collector: Collector,
+        future: Future | None,
+        collector_deadline: deadline.Deadline,
+    ) -> list[Metric]:
+        if future is None:
+            return self._last_success(collector)
+
+        timeout = (
+            collector_deadline.remaining() + self.grace_period
+            if collector_deadline.bounded
+            else None
+        )
+        try:
+            metrics, result = future.result(timeout=timeout)
+        except FutureTimeoutError:
+            self._logger.warning(
+                "%s did not return before its deadline,"
+                " serving its last result",
+                _collector_name(collector),
+            )
+            return self._last_success(collector)
+        except Exception:  # pylint: disable=broad-except
+            self._logger.exception(
+                "%s failed, serving its last result",
+                _collector_name(collector),
+            )
+            return self._last_success(collector)
+
+        return self._completed(collector, metrics, result)
+
+    def _completed(
+        self,
+        collector: Collector,
+        metrics: list[Metric],
+        result: outcome.Outcome,
+    ) -> list[Metric]:
+        """
+        Record the metrics of a collection that returned, and get those to
+        serve for it.
+        """
+        if result.complete:
+            self._succeeded(collector, metrics)
+            return metrics
+
+        with self._successes_lock:
+            success = self._successes.get(collector)
+        self._logger.warning(
+            "%s returned %s results (%s), serving %s",
+            _collector_name(collector),
+            "no" if result.failed else "partial",
+            "; ".join(result.reasons),
+            "its last result" if success is not None else "them",
+        )
+        return metrics if success is None else success.metrics
+
+    def _succeeded(self, collector: Collector, metrics: list[Metric]):
+        timestamp = time.time()
+        if isinstance(collector, PolledCollector):
+            # The metrics of a polled collector are as old as its last poll
+            snapshot = collector.snapshot
+            if snapshot is None or not snapshot.complete:
+                return
+            timestamp = snapshot.timestamp
+        with self._successes_lock:
+            self._successes[collector] = _Success(metrics, timestamp)
+
+    def _last_success(self, collector: Collector) -> list[Metric]:
+        with self._successes_lock:
+            success = self._successes.get(collector)
+        return [] if success is None else success.metrics
+
+    def _staleness_metrics(self) -> Iterable[Metric]:
+        with self._successes_lock:
+            successes = [
+                (_collector_name(collector), success.timestamp)
+                for collector, success in self._successes.items()
+            ]
+
+        now = time.time()
+        last_success = GaugeMetricFamily(
+            f"{self._metric_prefix}_collector_last_success_timestamp_seconds",
+            "Time of the last successful collection of each collector,"
+            " in seconds since the epoch",
+            labels=["collector"],
+        )
+        data_age = GaugeMetricFamily(
+            f"{self._metric_prefix}_collector_data_age_seconds",
+            "Age of the metrics served for each collector, in seconds",
+            labels=["collector"],
+        )
+        for name, timestamp in successes:
+            last_success.add_metric([name], timestamp)
+            data_age.add_metric([name], max(now - timestamp, 0.0))
+        yield last_success
+        yield data_age
+
+
+def _collector_name(collector: Collector) -> str:
+    if isinstance(collector, PolledCollector):
+        return collector.name
+    return collector.__class__.__name__
+
+
+@dataclasses.dataclass(frozen=True)
+class _Success:
+    metrics: list[Metric]
+
+    timestamp: float
+    """Time at which the metrics were collected, in seconds since the epoch."""
+
+
+class _Flight:
+    """
+    Collection in progress, shared by the scrapes waiting for its result.
+    """
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.metrics: tuple[Metric, ...] | None = None
+        self.error: BaseException | None = None
+
+
+class CoalescingRegistry:
+    """
+    Wrapper around a registry that coalesces concurrent scrapes.
+
+    A scrape that arrives while another one is collecting the metrics of
+    the registry waits for that collection and returns its result, instead
+    of starting a collection of its own. Results younger than ``ttl``
+    seconds are returned without collecting again.
+
+    A scrape waits for the collection in progress only until its own
+    deadline, after which it returns the previous result, if any.
+    """
+
+    def __init__(
+        self,
+        registry: CollectorRegistry,
+        ttl: float = 0.0,
+        logger: logging.Logger | None = None,
+    ):
+        self._registry = registry
+        self._ttl = ttl
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._flight: _Flight | None = None
+        self._metrics: tuple[Metric, ...] = ()
+        self._collected_at = -float("inf")
+
+    def collect(self) -> Iterable[Metric]:
+        """
+        Collect the metrics of the registry, or return those of the
+        collection in progress or of a recent one.
+        """
+        with self._lock:
+            if time.monotonic() - self._collected_at < self._ttl:
+                return iter(self._metrics)
+            flight = self._flight
+            leader = flight is None
+            if leader:
+                flight = self._flight = _Flight()
+
+        if leader:
+            return iter(self._lead(flight))
+        return iter(self._follow(flight))
+
+    def restricted_registry(self, names: Iterable[str]):
+        """
+        Create an object whose ``collect()`` only returns the samples with
+        the given names, like :py:meth:`CollectorRegistry.
+        restricted_registry`.
+        """
+        return _RestrictedRegistry(set(names), self)
+
+    def _lead(self, flight: _Flight) -> tuple[Metric, ...]:
+        try:
+            flight.metrics = tuple(self._registry.collect())
+        except BaseException as exc:
+            flight.error = exc
+            raise
+        finally:
+            with self._lock:
+                self._flight = None
+                if flight.metrics is not None:
+                    self._metrics = flight.metrics
+                    self._collected_at = time.monotonic()
+            flight.done.set()
+        return flight.metrics
+
+    def _follow(self, flight: _Flight) -> tuple[Metric, ...]:
+        scrape_deadline = deadline.current()
+        timeout = (
+            scrape_deadline.remaining() if scrape_deadline.bounded else None
+        )
+        self._logger.debug("Waiting for the collection in progress")
+        if not flight.done.wait(timeout):
+            self._logger.warning(
+                "Collection in progress did not finish before the deadline,"
+                " returning the previous result"
+            )
+            with self._lock:
+                return self._metrics
+        if flight.error is not None:
+            raise flight.error
+        return flight.metrics
+
+
+class _RestrictedRegistry:
+    def __init__(self, names: set[str], registry: CoalescingRegistry):
+        self._names = names
+        self._registry = registry
+
+    def collect(self) -> Iterable[Metric]:
+        """
+        Collect the samples with the given names.
+        """
+        for metric in self._registry.collect():
+            samples = [
+                sample
+                for sample in metric.samples
+                if sample.name in self._names
+            ]
+            if samples:
+                restricted = Metric(
+                    metric.name, metric.documentation, metric.type, metric.unit
+                )
+                restricted.samples = samples
+                yield restricted
@@ -1,17 +1,24 @@
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-positional-arguments
+
 """
 This is the main entrypoint of the application.
 """
 
 import logging
 import pathlib
+import re
 import signal
 import sys
 
 import click
-from prometheus_client import start_http_server
-from prometheus_client.core import CollectorRegistry
 from ska_ser_logging import configure_logging
 
+from ska_exporter_common import call_trace, http_server, poller, refresh
+from ska_exporter_common.registry import (
+    CoalescingRegistry,
+    ParallelRegistry,
+)
 from ska_p4_switch_exporter import exporter_info_collector, release
 
 
@@ -45,12 +52,286 @@ from ska_p4_switch_exporter import exporter_info_collector, release
     default=9090,
     help="Port number of the Barefoot RPC server",
 )
+@click.option(
+    "--rpc-timeout",
+    type=click.IntRange(min=1),
+    default=5000,
+    help="Timeout in milliseconds for calls to the Barefoot RPC server",
+)
+@click.option(
+    "--rpc-protocol",
+    type=click.Choice(["accelerated", "binary"], case_sensitive=False),
+    default="accelerated",
+    help="Thrift protocol used to talk to the Barefoot RPC server."
+    " The accelerated protocol falls back to the binary protocol"
+    " if the Thrift C extension is not available",
+)
+@click.option(
+    "--rpc-read-buffer-size",
+    type=click.IntRange(min=1),
+    default=4096,
+    help="Size in bytes of the read buffer of the RPC transport",
+)
+@click.option(
+    "--rpc-socket-buffer-size",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Size in bytes of the kernel send and receive buffers of the"
+    " RPC socket, 0 to use the system default",
+)
+@click.option(
+    "--rpc-tcp-nodelay/--no-rpc-tcp-nodelay",
+    default=True,
+    help="Whether to disable Nagle's algorithm on the RPC socket",
+)
+@click.option(
+    "--rpc-tcp-keepalive/--no-rpc-tcp-keepalive",
+    default=True,
+    help="Whether to enable TCP keepalive on the RPC socket",
+)
+@click.option(
+    "--rpc-failure-threshold",
+    type=click.IntRange(min=1),
+    default=3,
+    help="Number of consecutive failed attempts to reach the Barefoot RPC"
+    " server after which further attempts are rejected immediately",
+)
+@click.option(
+    "--rpc-backoff-initial",
+    type=click.FloatRange(min=0),
+    default=1.0,
+    help="Time in seconds after which the Barefoot RPC server is probed"
+    " again once it was found to be unreachable",
+)
+@click.option(
+    "--rpc-backoff-max",
+    type=click.FloatRange(min=0),
+    default=60.0,
+    help="Maximum time in seconds between probes of an unreachable"
+    " Barefoot RPC server",
+)
+@click.option(
+    "--rpc-pipeline-depth",
+    type=click.IntRange(min=0),
+    default=0,
+    help="Maximum number of requests to the Barefoot RPC server written"
+    " before reading their replies when collecting port metrics,"
+    " 0 to wait for each reply before sending the next request",
+)
+@click.option(
+    "--rpc-concurrency",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of connections to the Barefoot RPC server over which the"
+    " port and QSFP metrics are collected in parallel",
+)
+@click.option(
+    "--max-devices",
+    type=click.IntRange(min=1),
+    default=1,
+    help="Number of devices of bf_switchd to collect the ports of, by"
+    " device ID from 0. The devices are collected in parallel, each over"
+    " connections of its own, and devices without ports are skipped",
+)
+@click.option(
+    "--rpc-instrumentation/--no-rpc-instrumentation",
+    "instrument_rpc",
+    default=True,
+    help="Whether to export the duration, outcome and size of each call"
+    " to the Barefoot RPC server",
+)
+@click.option(
+    "--rpc-record",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="Path of a trace file to which all calls to the Barefoot RPC"
+    " server are written, with their results, so that they can be replayed"
+    " offline",
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Interval in seconds at which the switch is polled in the"
+    " background, with scrapes served from the latest poll, or 0 to read"
+    " the switch on every scrape. Each collector can be polled at an"
+    " interval of its own with the options below",
+)
+@click.option(
+    "--system-poll-interval",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Interval in seconds at which the system temperatures are polled,"
+    " or 0 to read them on every scrape. Defaults to --poll-interval",
+)
+@click.option(
+    "--qsfp-poll-interval",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Interval in seconds at which the QSFPs are polled, or 0 to read"
+    " them on every scrape. Defaults to --poll-interval",
+)
+@click.option(
+    "--port-poll-interval",
+    type=click.FloatRange(min=0),
+    default=None,
+    help="Interval in seconds at which the ports are polled, or 0 to read"
+    " them on every scrape. Defaults to --poll-interval",
+)
+@click.option(
+    "--refresh-tiers/--no-refresh-tiers",
+    default=False,
+    help="Whether to read the values that change slowly or not at all less"
+    " often than the others, according to the refresh intervals below."
+    " Without, every value is read on every collection and the refresh"
+    " intervals are ignored",
+)
+@click.option(
+    "--fast-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the status and statistics of the"
+    " ports and the presence of the QSFPs are read again, or 0 to read"
+    " them on every collection",
+)
+@click.option(
+    "--medium-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    help="Time in seconds after which the QSFP and system temperature,"
+    " voltage and power readings are read again, or 0 to read them on"
+    " every collection",
+)
+@click.option(
+    "--static-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=300.0,
+    help="Time in seconds after which the QSFP information and the ports"
+    " and their front panel ports are read again, or 0 to read them again"
+    " only when a QSFP is plugged in or the ports change. The QSFP"
+    " thresholds are only read again when a QSFP is plugged in or its"
+    " serial number changes, so a swapped QSFP is noticed within this"
+    " interval",
+)
+@click.option(
+    "--adaptive-refresh-min-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the QSFP temperature, voltage and"
+    " power readings are read again while they change quickly or are close"
+    " to their thresholds, when adaptive refresh is enabled",
+)
+@click.option(
+    "--adaptive-refresh-max-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds up to which the interval of these readings"
+    " grows while they stay flat, or 0 to disable adaptive refresh."
+    " Requires --refresh-tiers",
+)
+@click.option(
+    "--port-stats-include",
+    multiple=True,
+    metavar="PATTERN",
+    help="Wildcard pattern of the names of the port statistics metrics to"
+    " export instead of the default ones, e.g. 'p4_switch_port_stats_*pause*'."
+    " Can be given several times",
+)
+@click.option(
+    "--port-stats-exclude",
+    multiple=True,
+    metavar="PATTERN",
+    help="Wildcard pattern of the names of the port statistics metrics not"
+    " to export. Can be given several times",
+)
+@click.option(
+    "--port-include",
+    multiple=True,
+    metavar="REGEX",
+    help="Regular expression matching the front panel ports to collect,"
+    " written as PORT/CHANNEL, e.g. '1/0' or '(1|2)/.*', instead of all of"
+    " them. Can be given several times",
+)
+@click.option(
+    "--port-exclude",
+    multiple=True,
+    metavar="REGEX",
+    help="Regular expression matching the front panel ports not to"
+    " collect, written as PORT/CHANNEL. Can be given several times",
+)
+@click.option(
+    "--down-port-stats-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the statistics of the ports that are"
+    " down are read again, the last ones being exported in between, or 0 to"
+    " read them on every collection like those of the ports that are up",
+)
+@click.option(
+    "--port-rates/--no-port-rates",
+    default=False,
+    help="Whether to export the byte, frame and error rates of the ports,"
+    " computed from the statistics of the previous collection, along with"
+    " the counters",
+)
+@click.option(
+    "--port-stat-matrix/--no-port-stat-matrix",
+    default=False,
+    help="Whether to derive the port statistics metrics and rates of all"
+    " ports at once with NumPy, which takes less CPU on switches with many"
+    " ports, if NumPy is installed",
+)
+@click.option(
+    "--port-sampling-port",
+    "port_sampling_ports",
+    multiple=True,
+    metavar="PORT/CHANNEL",
+    help="Front panel port whose byte and frame counters are sampled every"
+    " --port-sampling-interval seconds, to export their highest and 99th"
+    " percentile rates. Can be given several times",
+)
+@click.option(
+    "--port-sampling-interval",
+    type=click.FloatRange(min=0.01),
+    default=0.1,
+    help="Time in seconds between samples of the sampled ports",
+)
+@click.option(
+    "--port-sampling-window",
+    type=click.FloatRange(min=0, min_open=True),
+    default=15.0,
+    help="Time in seconds over which the highest and 99th percentile rates"
+    " of the sampled ports are computed, normally the scrape interval",
+)
 @click.option(
     "--web-port",
     type=int,
     default=9102,
     help="Port number on which to expose metrics",
 )
+@click.option(
+    "--scrape-timeout-offset",
+    type=click.FloatRange(min=0),
+    default=0.5,
+    help="Time in seconds subtracted from the scrape timeout requested by"
+    " Prometheus, to leave time to send the response",
+)
+@click.option(
+    "--collector-timeout",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which a scrape serves the last result of a"
+    " collector still running, or 0 to wait for it until the scrape timeout."
+    " Collectors run concurrently",
+)
+@click.option(
+    "--scrape-cache-ttl",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds for which the result of a scrape is returned to"
+    " further scrapes. Scrapes that arrive while another one is in"
+    " progress always wait for its result",
+)
 @click.option(
     "--log-level",
     type=click.Choice(
@@ -59,11 +340,48 @@ from ska_p4_switch_exporter import exporter_info_collector, release
     default="INFO",
     help="Logging level used to configure the Python logger",
 )
-def run(  # pylint: disable=too-many-locals
+def run(  # pylint: disable=too-many-locals,too-many-statements
     sde_install_path: pathlib.Path,
     rpc_host: str,
     rpc_port: int,
+    rpc_timeout: int,
+    rpc_protocol: str,
+    rpc_read_buffer_size: int,
+    rpc_socket_buffer_size: int,
+    rpc_tcp_nodelay: bool,
+    rpc_tcp_keepalive: bool,
+    rpc_failure_threshold: int,
+    rpc_backoff_initial: float,
+    rpc_backoff_max: float,
+    rpc_pipeline_depth: int,
+    rpc_concurrency: int,
+    max_devices: int,
+    instrument_rpc: bool,
+    rpc_record: pathlib.Path | None,
+    poll_interval: float,
+    system_poll_interval: float | None,
+    qsfp_poll_interval: float | None,
+    port_poll_interval: float | None,
+    refresh_tiers: bool,
+    fast_refresh_interval: float,
+    medium_refresh_interval: float,
+    static_refresh_interval: float,
+    adaptive_refresh_min_interval: float,
+    adaptive_refresh_max_interval: float,
+    port_stats_include: tuple[str, ...],
+    port_stats_exclude: tuple[str, ...],
+    port_include: tuple[str, ...],
+    port_exclude: tuple[str, ...],
+    down_port_stats_interval: float,
+    port_rates: bool,
+    port_stat_matrix: bool,
+    port_sampling_ports: tuple[str, ...],
+    port_sampling_interval: float,
+    port_sampling_window: float,
     web_port: int,
+    scrape_timeout_offset: float,
+    collector_timeout: float,
+    scrape_cache_ttl: float,
     log_level: str,
 ):
     """
@@ -89,39 +407,198 @@ def run(  # pylint: disable=too-many-locals
     # pylint: disable-next=import-outside-toplevel
     from ska_p4_switch_exporter import (
         port_collector,
+        port_policy,
+        port_sampler,
+        port_stats,
         qsfp_collector,
+        rpc_circuit_breaker,
+        rpc_connection_pool,
+        rpc_instrumentation,
+        rpc_transport,
         system_collector,
     )
 
-    registry = CollectorRegistry()
+    transport_factory = rpc_transport.RpcTransportFactory(
+        protocol=rpc_protocol.lower(),
+        timeout_ms=rpc_timeout,
+        read_buffer_size=rpc_read_buffer_size,
+        socket_buffer_size=rpc_socket_buffer_size,
+        tcp_nodelay=rpc_tcp_nodelay,
+        tcp_keepalive=rpc_tcp_keepalive,
+    )
+    logger.info(
+        "Using %s Thrift binary protocol",
+        "accelerated" if transport_factory.accelerated else "pure Python",
+    )
+
+    registry = ParallelRegistry(
+        logger=logger,
+        collector_timeout=collector_timeout or None,
+        metric_prefix="p4_switch_exporter",
+    )
     exporter_info_collector.ExporterInfoCollector(
         sde_install_path=sde_install_path,
         logger=logger,
         registry=registry,
     )
-    system_collector.SystemCollector(
-        rpc_host=rpc_host,
-        rpc_port=rpc_port,
-        logger=logger,
-        registry=registry,
+    instrumentation = (
+        rpc_instrumentation.RpcInstrumentation(logger=logger)
+        if instrument_rpc
+        else None
     )
-    qsfp_collector.QSFPCollector(
-        rpc_host=rpc_host,
-        rpc_port=rpc_port,
-        logger=logger,
-        registry=registry,
+    recorder = None
+    if rpc_record is not None:
+        logger.info("Recording RPC calls to %s", rpc_record)
+        recorder = call_trace.TraceWriter.open(rpc_record)
+
+    def create_connection_pool(max_connections: int):
+        return rpc_connection_pool.RpcConnectionPool(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            transport_factory=transport_factory,
+            max_connections=max_connections,
+            circuit_breaker=rpc_circuit_breaker.CircuitBreaker(
+                failure_threshold=rpc_failure_threshold,
+                backoff_initial=rpc_backoff_initial,
+                backoff_max=rpc_backoff_max,
+            ),
+            instrumentation=instrumentation,
+            logger=logger,
+            recorder=recorder,
+        )
+
+    # The collectors run at the same time, each over connections of its
+    # own: one for the system, up to --rpc-concurrency for the QSFPs, and
+    # as many for each device for the ports
+    connection_pool = create_connection_pool(
+        1 + rpc_concurrency + rpc_concurrency * max_devices
     )
-    port_collector.PortCollector(
-        rpc_host=rpc_host,
-        rpc_port=rpc_port,
-        logger=logger,
-        registry=registry,
+    refresh_intervals = (
+        refresh.RefreshIntervals(
+            fast=fast_refresh_interval,
+            medium=medium_refresh_interval,
+            static=static_refresh_interval,
+            adaptive_min=adaptive_refresh_min_interval,
+            adaptive_max=adaptive_refresh_max_interval,
+        )
+        if refresh_tiers
+        else None
+    )
+    try:
+        policy = port_policy.PortPolicy(
+            include=port_include,
+            exclude=port_exclude,
+            down_interval=down_port_stats_interval,
+        )
+    except re.error as exc:
+        raise click.BadParameter(
+            f"Invalid port pattern: {exc}",
+            param_hint="--port-include/--port-exclude",
+        ) from exc
+    rpc_collectors = [
+        system_collector.SystemCollector(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            logger=logger,
+            registry=None,
+            connection_pool=connection_pool,
+            refresh_intervals=refresh_intervals,
+        ),
+        qsfp_collector.QSFPCollector(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            logger=logger,
+            registry=None,
+            connection_pool=connection_pool,
+            concurrency=rpc_concurrency,
+            refresh_intervals=refresh_intervals,
+        ),
+        port_collector.PortCollector(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            logger=logger,
+            registry=None,
+            connection_pool=connection_pool,
+            pipeline_depth=rpc_pipeline_depth,
+            concurrency=rpc_concurrency,
+            refresh_intervals=refresh_intervals,
+            stat_metrics=port_stats.select_port_stat_metrics(
+                include=port_stats_include, exclude=port_stats_exclude
+            ),
+            rates=port_rates,
+            stat_matrix=port_stat_matrix,
+            policy=policy,
+            max_devices=max_devices,
+        ),
+    ]
+
+    # When polling, scrapes are served from the latest poll of each
+    # collector instead of reading the switch on every scrape
+    poll_intervals = [
+        poll_interval if interval is None else interval
+        for interval in [
+            system_poll_interval,
+            qsfp_poll_interval,
+            port_poll_interval,
+        ]
+    ]
+    background_poller = (
+        poller.Poller(logger=logger) if any(poll_intervals) else None
     )
+    for collector, interval in zip(rpc_collectors, poll_intervals):
+        logger.info("Registering %s", collector.__class__.__name__)
+        if interval:
+            registry.register(background_poller.add(collector, interval))
+        else:
+            registry.register(collector)
+
+    # The pool and instrumentation run after the other collectors, so that
+    # what they report reflects the calls made in the same scrape
+    logger.info("Registering %s", connection_pool.__class__.__name__)
+    registry.register(connection_pool, last=True)
+    if instrumentation is not None:
+        logger.info("Registering %s", instrumentation.__class__.__name__)
+        registry.register(instrumentation, last=True)
+
+    if background_poller is not None:
+        background_poller.start()
+
+    sampler = None
+    sampler_pool = None
+    if port_sampling_ports:
+        try:
+            sampled_ports = [
+                port_sampler.parse_front_panel_port(port)
+                for port in port_sampling_ports
+            ]
+        except ValueError as exc:
+            raise click.BadParameter(
+                str(exc), param_hint="--port-sampling-port"
+            ) from exc
+        # The sampled ports are read over a connection of their own, so
+        # that the collectors neither delay the rounds nor wait for them
+        sampler_pool = create_connection_pool(1)
+        sampler = port_sampler.PortSampler(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            ports=sampled_ports,
+            interval=port_sampling_interval,
+            window=port_sampling_window,
+            logger=logger,
+            registry=registry,
+            connection_pool=sampler_pool,
+            pipeline_depth=rpc_pipeline_depth,
+        )
+        sampler.start()
 
     logger.info("Starting HTTP server on port %d", web_port)
-    server, server_thread = start_http_server(
+    server, server_thread = http_server.start_http_server(
         web_port,
-        registry=registry,
+        registry=CoalescingRegistry(
+            registry, ttl=scrape_cache_ttl, logger=logger
+        ),
+        timeout_offset=scrape_timeout_offset,
+        logger=logger,
     )
 
     def shutdown(*args, **kwargs):  # pylint: disable=unused-argument
@@ -129,6 +606,24 @@ def run(  # pylint: disable=too-many-locals
         server.shutdown()
         server_thread.join(timeout=10)
 
+        if background_poller is not None:
+            logger.info("Stopping background polling")
+            background_poller.stop(timeout=10)
+
+        if sampler is not None:
+            logger.info("Stopping port sampling")
+            sampler.stop(timeout=10)
+
+        logger.info("Closing RPC connections")
+        connection_pool.close()
+        if sampler_pool is not None:
+            sampler_pool.close()
+
+        if recorder is not None:
+            logger.info("Closing trace file")
+            recorder.close()
+
+        registry.close()
         logger.info("Shutdown complete")
 
     shutdown_signals = [signal.SIGINT, signal.SIGTERM]
@@ -1,161 +1,182 @@
 # pylint: disable=import-error
 # pylint: disable=too-few-public-methods
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-locals
+# pylint: disable=too-many-lines
+# pylint: disable=too-many-positional-arguments
 
 """
 Custom Prometheus collector that collects front-panel port metrics
 using the Barefoot PAL RPC.
 """
 
-import enum
+import contextvars
+import dataclasses
 import logging
+import threading
+import time
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
 
-from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.core import GaugeMetricFamily
 from prometheus_client.registry import REGISTRY, CollectorRegistry
 from tofino.pal_rpc import pal
 
+from ska_exporter_common import outcome
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_exporter_common.refresh import (
+    RefreshCache,
+    RefreshIntervals,
+    RefreshTier,
+)
+from ska_p4_switch_exporter import port_matrix
+from ska_p4_switch_exporter.port_policy import PortPolicy
+from ska_p4_switch_exporter.port_stats import (
+    PORT_RATE_METRICS,
+    PalStat,
+    PortStatMetric,
+    evaluate,
+    increase,
+    select_port_stat_metrics,
+)
+from ska_p4_switch_exporter.rpc_client import CONNECTION_ERRORS
 from ska_p4_switch_exporter.rpc_collector_base import RpcCollectorBase
+from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
 
 __all__ = [
+    "PalStat",
     "PortCollector",
 ]
 
+# Labels of the metrics of a port
+_PORT_LABELS = ["device", "port", "channel"]
 
-class PalStat(enum.IntEnum):
+
+@dataclasses.dataclass(frozen=True)
+class _PortTopology:
+    """
+    Valid ports of a device of the switch, with the labels of their device
+    and front panel port.
     """
-    Identifiers for the port statistics returned by the PAL RPC.
 
-    Note: these values are taken from the PAL RPC thrift definition.
+    device: int
+    """Device the ports belong to."""
+
+    first: int
+    """First port enumerated, valid or not."""
+
+    last: int
+    """Last port enumerated, valid or not."""
+
+    ports: tuple[int, ...]
+    labels: dict[int, list[str]]
+
+    invalid: tuple[int, ...] = ()
+    """Ports enumerated that were not valid."""
+
+    enumerated_at: float = 0.0
+    """Time at which the ports were enumerated, from the monotonic clock."""
+
+
+@dataclasses.dataclass(frozen=True)
+class _PortRead:
+    """
+    Operational status and statistics of a port, as last read.
+    """
+
+    oper_status: int
+    stats: object
+    read_at: float
+
+
+@dataclasses.dataclass(frozen=True)
+class _PortSample:
+    """
+    Statistics of a port, as last read, to compute its rates from.
     """
 
-    # pylint: disable=invalid-name
-
-    FramesReceivedOK = 0
-    FramesReceivedAll = 1
-    FramesReceivedwithFCSError = 2
-    FrameswithanyError = 3
-    OctetsReceivedinGoodFrames = 4
-    OctetsReceived = 5
-    FramesReceivedwithUnicastAddresses = 6
-    FramesReceivedwithMulticastAddresses = 7
-    FramesReceivedwithBroadcastAddresses = 8
-    FramesReceivedoftypePAUSE = 9
-    FramesReceivedwithLengthError = 10
-    FramesReceivedUndersized = 11
-    FramesReceivedOversized = 12
-    FragmentsReceived = 13
-    JabberReceived = 14
-    PriorityPauseFrames = 15
-    CRCErrorStomped = 16
-    FrameTooLong = 17
-    RxVLANFramesGood = 18
-    FramesDroppedBufferFull = 19
-    FramesReceivedLength_lt_64 = 20
-    FramesReceivedLength_eq_64 = 21
-    FramesReceivedLength_65_127 = 22
-    FramesReceivedLength_128_255 = 23
-    FramesReceivedLength_256_511 = 24
-    FramesReceivedLength_512_1023 = 25
-    FramesReceivedLength_1024_1518 = 26
-    FramesReceivedLength_1519_2047 = 27
-    FramesReceivedLength_2048_4095 = 28
-    FramesReceivedLength_4096_8191 = 29
-    FramesReceivedLength_8192_9215 = 30
-    FramesReceivedLength_9216 = 31
-    FramesTransmittedOK = 32
-    FramesTransmittedAll = 33
-    FramesTransmittedwithError = 34
-    OctetsTransmittedwithouterror = 35
-    OctetsTransmittedTotal = 36
-    FramesTransmittedUnicast = 37
-    FramesTransmittedMulticast = 38
-    FramesTransmittedBroadcast = 39
-    FramesTransmittedPause = 40
-    FramesTransmittedPriPause = 41
-    FramesTransmittedVLAN = 42
-    FramesTransmittedLength_lt_64 = 43
-    FramesTransmittedLength_eq_64 = 44
-    FramesTransmittedLength_65_127 = 45
-    FramesTransmittedLength_128_255 = 46
-    FramesTransmittedLength_256_511 = 47
-    FramesTransmittedLength_512_1023 = 48
-    FramesTransmittedLength_1024_1518 = 49
-    FramesTransmittedLength_1519_2047 = 50
-    FramesTransmittedLength_2048_4095 = 51
-    FramesTransmittedLength_4096_8191 = 52
-    FramesTransmittedLength_8192_9215 = 53
-    FramesTransmittedLength_9216 = 54
-    Pri0FramesTransmitted = 55
-    Pri1FramesTransmitted = 56
-    Pri2FramesTransmitted = 57
-    Pri3FramesTransmitted = 58
-    Pri4FramesTransmitted = 59
-    Pri5FramesTransmitted = 60
-    Pri6FramesTransmitted = 61
-    Pri7FramesTransmitted = 62
-    Pri0FramesReceived = 63
-    Pri1FramesReceived = 64
-    Pri2FramesReceived = 65
-    Pri3FramesReceived = 66
-    Pri4FramesReceived = 67
-    Pri5FramesReceived = 68
-    Pri6FramesReceived = 69
-    Pri7FramesReceived = 70
-    TransmitPri0Pause1USCount = 71
-    TransmitPri1Pause1USCount = 72
-    TransmitPri2Pause1USCount = 73
-    TransmitPri3Pause1USCount = 74
-    TransmitPri4Pause1USCount = 75
-    TransmitPri5Pause1USCount = 76
-    TransmitPri6Pause1USCount = 77
-    TransmitPri7Pause1USCount = 78
-    ReceivePri0Pause1USCount = 79
-    ReceivePri1Pause1USCount = 80
-    ReceivePri2Pause1USCount = 81
-    ReceivePri3Pause1USCount = 82
-    ReceivePri4Pause1USCount = 83
-    ReceivePri5Pause1USCount = 84
-    ReceivePri6Pause1USCount = 85
-    ReceivePri7Pause1USCount = 86
-    ReceiveStandardPause1USCount = 87
-    FramesTruncated = 88
+    stats: object
+    """Statistics returned by the RPC call."""
+
+    read_at: float
+    """Monotonic time at which the statistics were read."""
+
+    values: tuple[float, ...]
+    """Values of the expressions of the rates."""
+
+    rates: tuple[float, ...] | None
+    """Rates computed from the previous sample, if any."""
 
 
 class PortCollector(RpcCollectorBase):
     """
     Custom Prometheus collector that collects front-panel port metrics
     using the Barefoot PAL RPC.
+
+    By default, each RPC call waits for the reply of the previous one. With
+    a ``pipeline_depth`` greater than 0, the per-port calls are pipelined
+    instead: up to ``pipeline_depth`` requests are written before their
+    replies are read, so that a batch of ports costs a single round trip.
+
+    With a ``concurrency`` greater than 1, the ports are enumerated on one
+    connection, then their metrics are retrieved over up to
+    ``concurrency`` connections in parallel, one batch of ports at a time.
+    The metrics are exported in port order either way.
+
+    The operational status and statistics of the ports are in the fast
+    refresh tier. The valid ports and their front panel ports are in the
+    static tier: they are only enumerated again when the first or last
+    port changes or a port that was not valid becomes valid, which takes
+    three calls and one per invalid port to check, pipelined if enabled,
+    instead of about four per port. Ports that appear in the middle of the
+    enumeration are only found by enumerating them again, which is done
+    every ``topology_interval`` seconds, or every static refresh interval
+    if shorter.
+
+    The metrics exported from the statistics of each port are those of
+    ``stat_metrics``, selected from
+    :py:data:`~ska_p4_switch_exporter.port_stats.PORT_STAT_METRICS`, or
+    the metrics exported by default if not given.
+
+    With ``rates``, the byte, frame and error rates of each port are
+    exported as well, computed from the statistics of the previous
+    collection, so that dashboards do not have to. A counter that is lower
+    than in the previous collection was reset, e.g. because ``bf_switchd``
+    restarted, and is assumed to have increased from 0 since, as
+    Prometheus does. The rates of a port are only exported once it has
+    been read twice with the same front panel port.
+
+    With ``stat_matrix``, the statistics of all ports are stored in a
+    :py:class:`~ska_p4_switch_exporter.port_matrix.PortStatMatrix`, and
+    the metrics and rates are derived from it for all ports at once with
+    NumPy, which takes less CPU on switches with many ports. Without NumPy,
+    they are derived one port at a time as usual.
+
+    With a ``max_devices`` greater than 1, the ports of the devices with
+    IDs below ``max_devices`` are collected, each device in a thread of its
+    own with connections of its own, so that a collection takes as long as
+    that of the slowest device. A device without ports is skipped. The
+    metrics have a ``device`` label either way.
+
+    The ``policy`` selects the ports to collect, all of them by default,
+    and can have the statistics of the ports that are down read less often,
+    see :py:class:`~ska_p4_switch_exporter.port_policy.PortPolicy`.
     """
 
-    rx_frame_length_buckets = {
-        "<64": PalStat.FramesReceivedLength_lt_64,
-        "64": PalStat.FramesReceivedLength_eq_64,
-        "65-127": PalStat.FramesReceivedLength_65_127,
-        "128-255": PalStat.FramesReceivedLength_128_255,
-        "256-511": PalStat.FramesReceivedLength_256_511,
-        "512-1023": PalStat.FramesReceivedLength_512_1023,
-        "1024-1518": PalStat.FramesReceivedLength_1024_1518,
-        "1519-2047": PalStat.FramesReceivedLength_1519_2047,
-        "2048-4095": PalStat.FramesReceivedLength_2048_4095,
-        "4096-8191": PalStat.FramesReceivedLength_4096_8191,
-        "8192-9215": PalStat.FramesReceivedLength_8192_9215,
-        "9216": PalStat.FramesReceivedLength_9216,
+    refresh_tiers = {
+        "pal_port_oper_status_get": RefreshTier.FAST,
+        "pal_port_all_stats_get": RefreshTier.FAST,
     }
 
-    tx_frame_length_buckets = {
-        "<64": PalStat.FramesTransmittedLength_lt_64,
-        "64": PalStat.FramesTransmittedLength_eq_64,
-        "65-127": PalStat.FramesTransmittedLength_65_127,
-        "128-255": PalStat.FramesTransmittedLength_128_255,
-        "256-511": PalStat.FramesTransmittedLength_256_511,
-        "512-1023": PalStat.FramesTransmittedLength_512_1023,
-        "1024-1518": PalStat.FramesTransmittedLength_1024_1518,
-        "1519-2047": PalStat.FramesTransmittedLength_1519_2047,
-        "2048-4095": PalStat.FramesTransmittedLength_2048_4095,
-        "4096-8191": PalStat.FramesTransmittedLength_4096_8191,
-        "8192-9215": PalStat.FramesTransmittedLength_8192_9215,
-        "9216": PalStat.FramesTransmittedLength_9216,
-    }
+    # Calls made for each port on every collection
+    _port_info_methods = [
+        "pal_port_oper_status_get",
+        "pal_port_all_stats_get",
+    ]
+
+    # Key of the port topology in the refresh cache
+    _topology_key = "port_topology"
 
     def __init__(
         self,
@@ -163,6 +184,16 @@ class PortCollector(RpcCollectorBase):
         rpc_port: int,
         logger: logging.Logger | None = None,
         registry: CollectorRegistry | None = REGISTRY,
+        connection_pool: RpcConnectionPool | None = None,
+        pipeline_depth: int = 0,
+        concurrency: int = 1,
+        refresh_intervals: RefreshIntervals | None = None,
+        stat_metrics: Sequence[PortStatMetric] | None = None,
+        rates: bool = False,
+        stat_matrix: bool = False,
+        policy: PortPolicy | None = None,
+        max_devices: int = 1,
+        topology_interval: float = 300.0,
     ):
         logger = logger or logging.getLogger(__name__)
         super().__init__(
@@ -171,194 +202,643 @@ class PortCollector(RpcCollectorBase):
             rpc_endpoint="pal",
             rpc_module=pal,
             logger=logger,
+            # Each device has connections of its own
+            connection_pool=connection_pool
+            or RpcConnectionPool(
+                rpc_host=rpc_host,
+                rpc_port=rpc_port,
+                max_connections=concurrency * max_devices,
+                logger=logger,
+            ),
+            concurrency=concurrency * max_devices if concurrency > 1 else 1,
+            refresh_intervals=refresh_intervals,
+        )
+        self._max_devices = max_devices
+        self._topology_interval = topology_interval
+        self._device_executor = (
+            ThreadPoolExecutor(
+                max_workers=max_devices,
+                thread_name_prefix=f"{self.__class__.__name__}Device",
+            )
+            if max_devices > 1
+            else None
+        )
+        self._pipeline_depth = pipeline_depth
+        self._stat_metrics = (
+            select_port_stat_metrics()
+            if stat_metrics is None
+            else stat_metrics
+        )
+        self._rates = rates
+        self._stat_matrix = stat_matrix and port_matrix.AVAILABLE
+        self._sample_labels = port_matrix.SampleLabels()
+        self._policy = policy or PortPolicy()
+        self._selected: dict[int, tuple[_PortTopology, list[tuple]]] = {}
+        self._reads_lock = threading.Lock()
+        self._reads: dict[tuple[int, int], _PortRead] = {}
+        if stat_matrix and not port_matrix.AVAILABLE:
+            logger.warning(
+                "NumPy is not available, deriving the port statistics"
+                " one port at a time"
+            )
+        self._samples_lock = threading.Lock()
+        self._samples: dict[
+            tuple[tuple[int, int], tuple[str, ...]], _PortSample
+        ] = {}
+        self._ports_per_batch = (
+            max(pipeline_depth // len(self._port_info_methods), 1)
+            if pipeline_depth
+            else 1
         )
 
         if registry:
             logger.info("Registering %s", self.__class__.__name__)
             registry.register(self)
 
-    def collect(self):
+    def _collect(self):
         port_up = GaugeMetricFamily(
             "p4_switch_port_up",
             "Operational status of the port",
-            labels=["port", "channel"],
-        )
-        port_stats_rx_bytes = CounterMetricFamily(
-            "p4_switch_port_stats_rx_bytes",
-            "Number of bytes received on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_tx_bytes = CounterMetricFamily(
-            "p4_switch_port_stats_tx_bytes",
-            "Number of bytes received on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_rx_frames_by_length = CounterMetricFamily(
-            "p4_switch_port_stats_rx_frames",
-            "Number of frames received on the port,"
-            " grouped by frame length in bytes",
-            labels=["port", "channel", "length"],
-        )
-        port_stats_tx_frames_by_length = CounterMetricFamily(
-            "p4_switch_port_stats_tx_frames",
-            "Number of frames transmitted on the port,"
-            " grouped by frame length in bytes",
-            labels=["port", "channel", "length"],
-        )
-        port_stats_rx_errors = CounterMetricFamily(
-            "p4_switch_port_stats_rx_errors",
-            "The total number of receive errors on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_tx_errors = CounterMetricFamily(
-            "p4_switch_port_stats_tx_errors",
-            "The total number of transmit errors on the port",
-            labels=["port", "channel"],
+            labels=_PORT_LABELS,
         )
-        port_stats_rx_frame_unicast = CounterMetricFamily(
-            "p4_switch_port_stats_rx_unicast_frames",
-            "The total number of unicast frames received on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_rx_frame_multicast = CounterMetricFamily(
-            "p4_switch_port_stats_rx_multicast_frames",
-            "The total number of multicast frames received on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_rx_frame_broadcast = CounterMetricFamily(
-            "p4_switch_port_stats_rx_broadcast_frames",
-            "The total number of broadcast frames received on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_tx_frame_unicast = CounterMetricFamily(
-            "p4_switch_port_stats_tx_unicast_frames",
-            "The total number of unicast frames transmitted on the port",
-            labels=["port", "channel"],
-        )
-        port_stats_tx_frame_multicast = CounterMetricFamily(
-            "p4_switch_port_stats_tx_multicast_frames",
-            "The total number of multicast frames transmitted on the port",
-            labels=["port", "channel"],
+        stat_families = [
+            metric.family(
+                metric.name,
+                metric.documentation,
+                labels=[*_PORT_LABELS, *metric.labels],
+            )
+            for metric in self._stat_metrics
+        ]
+        rate_families = [
+            GaugeMetricFamily(
+                metric.name, metric.documentation, labels=_PORT_LABELS
+            )
+            for metric in (PORT_RATE_METRICS if self._rates else ())
+        ]
+
+        devices = range(self._max_devices)
+        if self._device_executor is None:
+            collected = [self._collect_device(device) for device in devices]
+        else:
+            # Each device runs in its own copy of the context, for the
+            # deadline
+            futures = [
+                self._device_executor.submit(
+                    contextvars.copy_context().run,
+                    self._collect_device,
+                    device,
+                )
+                for device in devices
+            ]
+            try:
+                collected = [future.result() for future in futures]
+            finally:
+                for future in futures:
+                    future.cancel()
+        topologies = {
+            topology.device: topology
+            for topology, _ in collected
+            if topology is not None
+        }
+        results = [result for _, results in collected for result in results]
+
+        port_labels = [
+            topologies[device].labels[port] for (device, port), *_ in results
+        ]
+        for labels, (_, oper_status, _, _) in zip(port_labels, results):
+            port_up.add_metric(labels, float(oper_status))
+
+        rate_values = self._add_stat_samples(
+            results, port_labels, stat_families
         )
-        port_stats_tx_frame_broadcast = CounterMetricFamily(
-            "p4_switch_port_stats_tx_broadcast_frames",
-            "The total number of broadcast frames transmitted on the port",
-            labels=["port", "channel"],
+        if self._rates:
+            for labels, rates in zip(
+                port_labels,
+                self._update_rates(results, port_labels, rate_values),
+            ):
+                for family, rate in zip(rate_families, rates or ()):
+                    family.add_metric(labels, rate)
+            self._forget_samples(topologies)
+
+        yield port_up
+        yield from stat_families
+        yield from rate_families
+
+    def _collect_device(
+        self, device: int
+    ) -> tuple[_PortTopology | None, list[tuple]]:
+        """
+        Collect the ports of a device, returning its topology along with
+        the results of its ports, or no topology if it has no ports.
+        """
+        topology = None
+        try:
+            with self._get_rpc_client() as client:
+                topology = self._get_topology(client, device)
+        except DeadlineExceededError:
+            if self._device_executor is None:
+                raise
+            # Not even connected in time, no need to warn for each device
+            self._logger.debug(
+                "%s skipping device %d: deadline exceeded",
+                self.__class__.__name__,
+                device,
+            )
+            outcome.report_partial("Deadline exceeded")
+        if topology is None:
+            return None, []
+
+        try:
+            results = self._fan_out(
+                self._get_port_info,
+                list(
+                    _batched(
+                        self._select_ports(topology), self._ports_per_batch
+                    )
+                ),
+            )
+        except pal.InvalidPalOperation:
+            # A port is gone, enumerate them again on the next collection
+            self._refresh_cache.invalidate(
+                lambda key: key == (self._topology_key, device)
+            )
+            raise
+        return topology, results
+
+    def _select_ports(self, topology: _PortTopology) -> list[tuple[int, int]]:
+        """
+        Get the ports of the topology selected by the policy, along with
+        their device.
+        """
+        selected_topology, ports = self._selected.get(
+            topology.device, (None, [])
         )
+        if selected_topology is not topology:
+            ports = [
+                (topology.device, port)
+                for port in topology.ports
+                # The policy selects front panel ports, on every device
+                if self._policy.selects(topology.labels[port][1:])
+            ]
+            self._selected[topology.device] = (topology, ports)
+            with self._reads_lock:
+                self._reads = {
+                    (device, port): read
+                    for (device, port), read in self._reads.items()
+                    if device != topology.device or port in topology.labels
+                }
+        return ports
 
-        with self._get_rpc_client() as client:
-            for port in self._iter_ports(client):
-                fp_port = client.pal_port_dev_port_to_front_panel_port_get(
-                    0, port
+    def _add_stat_samples(
+        self,
+        results: list[tuple],
+        port_labels: list[list[str]],
+        stat_families: list,
+    ) -> list[list[float]]:
+        """
+        Add the samples of the statistics metrics of each port to their
+        families, returning the values of the expressions of the rates of
+        each port if enabled.
+        """
+        rate_expressions = [
+            metric.expression for metric in PORT_RATE_METRICS if self._rates
+        ]
+        if self._stat_matrix:
+            matrix = port_matrix.PortStatMatrix(
+                [stats.entry for _, _, stats, _ in results]
+            )
+            self._sample_labels.update(port_labels)
+            for metric, family in zip(self._stat_metrics, stat_families):
+                matrix.add_samples(
+                    family, metric, self._sample_labels.get(metric)
                 )
+            return matrix.evaluate(rate_expressions).tolist()
+
+        for labels, (_, _, stats, _) in zip(port_labels, results):
+            for metric, family in zip(self._stat_metrics, stat_families):
+                for label_values, expression in metric.samples.items():
+                    family.add_metric(
+                        [*labels, *label_values],
+                        metric.value(expression, stats.entry),
+                    )
+        return [
+            [
+                evaluate(expression, stats.entry)
+                for expression in rate_expressions
+            ]
+            for _, _, stats, _ in results
+        ]
+
+    def _update_rates(
+        self,
+        results: list[tuple],
+        port_labels: list[list[str]],
+        values: list[list[float]],
+    ) -> list[tuple[float, ...] | None]:
+        """
+        Compute the rates of each port from its previous sample and make
+        the statistics its sample, with ``None`` for the ports without a
+        previous one.
+
+        Statistics served from the refresh cache were not read again, so
+        the rates computed when they were read are returned.
+        """
+        with self._samples_lock:
+            keys = [
+                (port, tuple(labels))
+                for (port, *_), labels in zip(results, port_labels)
+            ]
+            previous = [self._samples.get(key) for key in keys]
+            rates = [
+                (
+                    last.rates
+                    if last is not None and last.stats is stats
+                    else None
+                )
+                for last, (_, _, stats, _) in zip(previous, results)
+            ]
+            pending = [
+                i
+                for i, (last, (_, _, stats, read_at)) in enumerate(
+                    zip(previous, results)
+                )
+                if last is not None
+                and last.stats is not stats
+                and read_at > last.read_at
+            ]
+            computed = (port_matrix.rates if self._stat_matrix else _rates)(
+                [values[i] for i in pending],
+                [previous[i].values for i in pending],
+                [results[i][3] - previous[i].read_at for i in pending],
+            )
+            for i, port_rates in zip(pending, computed):
+                rates[i] = port_rates
+
+            for i, (key, last, (_, _, stats, read_at)) in enumerate(
+                zip(keys, previous, results)
+            ):
+                if last is None or last.stats is not stats:
+                    self._samples[key] = _PortSample(
+                        stats, read_at, tuple(values[i]), rates[i]
+                    )
+            return rates
+
+    def _forget_samples(self, topologies: dict[int, _PortTopology]):
+        """
+        Drop the samples of the ports that are no longer valid, or no longer
+        correspond to the same front panel port.
+        """
+        valid = {
+            ((device, port), tuple(topology.labels[port]))
+            for device, topology in topologies.items()
+            for port in topology.ports
+        }
+        with self._samples_lock:
+            for key in [key for key in self._samples if key not in valid]:
+                del self._samples[key]
+
+    def _get_topology(self, client, device: int) -> _PortTopology | None:
+        """
+        Get the valid ports of a device and their front panel ports,
+        enumerating them again unless the cached ones are still valid, or
+        ``None`` if the device has no ports.
+        """
+        key = (self._topology_key, device)
+        topology = self._refresh_cache.lookup(key, RefreshTier.STATIC)
+        if topology is not RefreshCache.MISSING:
+            if (
+                time.monotonic() - topology.enumerated_at
+                >= self._topology_interval
+            ):
                 self._logger.debug(
-                    "Port %d corresponds to front panel port %d/%d",
-                    port,
-                    fp_port.pal_front_port,
-                    fp_port.pal_front_chnl,
+                    "Ports of device %d are due to be enumerated again",
+                    device,
+                )
+            elif self._topology_unchanged(client, topology):
+                return topology
+            else:
+                self._logger.info(
+                    "Ports of device %d changed, enumerating them again",
+                    device,
                 )
 
-                labels = [
+        enumerated_at = time.monotonic()
+        try:
+            first, last, candidates = self._walk_ports(client, device)
+        except pal.InvalidPalOperation:
+            self._logger.debug(
+                "Device %d has no ports, skipping", device, exc_info=True
+            )
+            self._refresh_cache.invalidate(lambda cached: cached == key)
+            return None
+        ports, invalid = self._validate_ports(client, device, candidates)
+        topology = _PortTopology(
+            device=device,
+            first=first,
+            last=last,
+            ports=tuple(ports),
+            invalid=tuple(invalid),
+            enumerated_at=enumerated_at,
+            labels={
+                port: [
+                    str(device),
                     str(fp_port.pal_front_port),
                     str(fp_port.pal_front_chnl),
                 ]
-
-                port_up.add_metric(
-                    labels,
-                    float(client.pal_port_oper_status_get(0, port)),
+                for port, fp_port in zip(
+                    ports, self._get_front_panel_ports(client, device, ports)
                 )
+            },
+        )
+        self._refresh_cache.store(key, topology)
+        return topology
 
-                stats = client.pal_port_all_stats_get(0, port)
+    def _topology_unchanged(self, client, topology: _PortTopology) -> bool:
+        """
+        Check whether the ports are likely to be the same as when they were
+        enumerated: the first port is the same, the last valid port is
+        still valid, no port comes after the last one, and none of the
+        ports that were not valid has become valid.
+        """
+        device = topology.device
+        calls = [
+            ("pal_port_get_first", (device,)),
+            (
+                "pal_port_is_valid",
+                (device, topology.ports[-1] if topology.ports else 0),
+            ),
+            ("pal_port_get_next", (device, topology.last)),
+            *[
+                ("pal_port_is_valid", (device, port))
+                for port in topology.invalid
+            ],
+        ]
+        if self._pipeline_depth:
+            results = [
+                result
+                for batch in _batched(calls, self._pipeline_depth)
+                for result in client.pipeline(batch)
+            ]
+        else:
+            results = [
+                _call_or_error(client, method, *args) for method, args in calls
+            ]
+        first, valid, after_last, *invalid = results
 
-                port_stats_rx_bytes.add_metric(
-                    labels, float(stats.entry[PalStat.OctetsReceived])
-                )
-                port_stats_tx_bytes.add_metric(
-                    labels, float(stats.entry[PalStat.OctetsTransmittedTotal])
-                )
+        for result in [first, valid, *invalid]:
+            if isinstance(result, Exception):
+                if isinstance(result, pal.InvalidPalOperation):
+                    return False
+                raise result
+        if isinstance(after_last, Exception) and not isinstance(
+            after_last, pal.InvalidPalOperation
+        ):
+            raise after_last
 
-                for length, stat in self.rx_frame_length_buckets.items():
-                    port_stats_rx_frames_by_length.add_metric(
-                        [*labels, length], float(stats.entry[stat])
-                    )
+        return (
+            first == topology.first
+            and (bool(valid) or not topology.ports)
+            and isinstance(after_last, pal.InvalidPalOperation)
+            and not any(invalid)
+        )
 
-                for length, stat in self.tx_frame_length_buckets.items():
-                    port_stats_tx_frames_by_length.add_metric(
-                        [*labels, length], float(stats.entry[stat])
-                    )
+    def _walk_ports(self, client, device: int) -> tuple[int, int, list[int]]:
+        """
+        Enumerate all ports of a device, valid or not, returning the first
+        and last ports along with all of them.
 
-                port_stats_rx_errors.add_metric(
-                    labels,
-                    float(
-                        stats.entry[PalStat.FramesReceivedAll]
-                        - stats.entry[PalStat.FramesReceivedOK]
-                    ),
-                )
+        Each call to ``pal_port_get_next`` depends on the result of the
+        previous one, so the ports are always enumerated one call at a
+        time.
+        """
+        port = client.pal_port_get_first(device)
+        first = port
+        candidates = []
+        try:
+            while True:
+                candidates.append(port)
+                port = client.pal_port_get_next(device, port)
+        except pal.InvalidPalOperation:
+            self._logger.debug(
+                "No more ports after port %d of device %d",
+                port,
+                device,
+                exc_info=True,
+            )
+        return first, port, candidates
 
-                port_stats_tx_errors.add_metric(
-                    labels,
-                    float(
-                        stats.entry[PalStat.FramesTransmittedAll]
-                        - stats.entry[PalStat.FramesTransmittedOK]
-                    ),
+    def _validate_ports(
+        self, client, device: int, candidates: list[int]
+    ) -> tuple[list[int], list[int]]:
+        """
+        Get the valid ports among the enumerated ones, and those that are
+        not valid, pipelining the calls in batches if enabled.
+        """
+        valid_ports = []
+        invalid_ports = []
+        for batch in _batched(candidates, self._pipeline_depth or 1):
+            if self._pipeline_depth:
+                results = client.pipeline(
+                    [("pal_port_is_valid", (device, port)) for port in batch]
                 )
+            else:
+                results = [
+                    _call_or_error(client, "pal_port_is_valid", device, port)
+                    for port in batch
+                ]
+            for port, valid in zip(batch, results):
+                if isinstance(valid, pal.InvalidPalOperation):
+                    self._logger.debug(
+                        "Error while validating port %d of device %d,"
+                        " assuming no more ports are available",
+                        port,
+                        device,
+                    )
+                    return valid_ports, invalid_ports
+                if isinstance(valid, Exception):
+                    raise valid
 
-                port_stats_rx_frame_unicast.add_metric(
-                    labels,
-                    stats.entry[PalStat.FramesReceivedwithUnicastAddresses],
-                )
-                port_stats_rx_frame_multicast.add_metric(
-                    labels,
-                    stats.entry[PalStat.FramesReceivedwithMulticastAddresses],
-                )
-                port_stats_rx_frame_broadcast.add_metric(
-                    labels,
-                    stats.entry[PalStat.FramesReceivedwithBroadcastAddresses],
+                if valid:
+                    valid_ports.append(port)
+                else:
+                    self._logger.debug(
+                        "Port %d of device %d is not valid, skipping",
+                        port,
+                        device,
+                    )
+                    invalid_ports.append(port)
+        return valid_ports, invalid_ports
+
+    def _get_front_panel_ports(
+        self, client, device: int, ports: list[int]
+    ) -> list:
+        """
+        Get the front panel port of each port, pipelining the calls in
+        batches if enabled.
+        """
+        fp_ports = []
+        for batch in _batched(ports, self._pipeline_depth or 1):
+            calls = [
+                (
+                    "pal_port_dev_port_to_front_panel_port_get",
+                    (device, port),
                 )
-                port_stats_tx_frame_unicast.add_metric(
-                    labels, stats.entry[PalStat.FramesTransmittedUnicast]
+                for port in batch
+            ]
+            if self._pipeline_depth:
+                results = client.pipeline(calls)
+            else:
+                results = [
+                    _call_or_error(client, method, *args)
+                    for method, args in calls
+                ]
+            for port, fp_port in zip(batch, results):
+                if isinstance(fp_port, Exception):
+                    raise fp_port
+                self._logger.debug(
+                    "Port %d of device %d corresponds to front panel port"
+                    " %d/%d",
+                    port,
+                    device,
+                    fp_port.pal_front_port,
+                    fp_port.pal_front_chnl,
                 )
-                port_stats_tx_frame_multicast.add_metric(
-                    labels, stats.entry[PalStat.FramesTransmittedMulticast]
+                fp_ports.append(fp_port)
+        return fp_ports
+
+    def _get_port_info(
+        self, client, batch: list[tuple[int, int]], results: list
+    ):
+        """
+        Append the operational status and statistics of each port of the
+        batch to ``results``, along with the time at which they were read,
+        pipelining the calls for the whole batch if enabled.
+
+        The statistics of the ports that were down are reused instead of
+        read if the policy allows, unless the ports turn out to be up.
+        """
+        now = time.monotonic()
+        with self._reads_lock:
+            reused = {
+                port: read
+                for port in batch
+                if (read := self._reads.get(port)) is not None
+                and self._policy.reuses_stats(
+                    read.oper_status, now - read.read_at
                 )
-                port_stats_tx_frame_broadcast.add_metric(
-                    labels, stats.entry[PalStat.FramesTransmittedBroadcast]
+            }
+
+        if not self._pipeline_depth:
+            for port in batch:
+                oper_status = self._read(
+                    client, "pal_port_oper_status_get", *port
                 )
+                if port in reused and not oper_status:
+                    stats, read_at = reused[port].stats, reused[port].read_at
+                else:
+                    stats = self._read(client, "pal_port_all_stats_get", *port)
+                    read_at = time.monotonic()
+                    self._store_read(port, oper_status, stats, read_at)
+                results.append((port, oper_status, stats, read_at))
+            return
 
-        yield from [
-            port_up,
-            port_stats_rx_bytes,
-            port_stats_tx_bytes,
-            port_stats_rx_frames_by_length,
-            port_stats_tx_frames_by_length,
-            port_stats_rx_errors,
-            port_stats_tx_errors,
-            port_stats_rx_frame_unicast,
-            port_stats_rx_frame_multicast,
-            port_stats_rx_frame_broadcast,
-            port_stats_tx_frame_unicast,
-            port_stats_tx_frame_multicast,
-            port_stats_tx_frame_broadcast,
+        calls = [
+            (method, port)
+            for port in batch
+            for method in (
+                ["pal_port_oper_status_get"]
+                if port in reused
+                else self._port_info_methods
+            )
         ]
+        replies = iter(self._raise_errors(self._read_pipelined(client, calls)))
+        read_at = time.monotonic()
+        port_info = {}
+        for port in batch:
+            oper_status = next(replies)
+            if port in reused:
+                port_info[port] = (oper_status, reused[port].stats)
+            else:
+                port_info[port] = (oper_status, next(replies))
 
-    def _iter_ports(self, client: pal.Client):
-        port = client.pal_port_get_first(0)
-        while True:
-            self._logger.debug("Processing port %d", port)
-            try:
-                if not client.pal_port_is_valid(0, port):
-                    self._logger.debug("Port %d is not valid, skipping", port)
-                    port = client.pal_port_get_next(0, port)
-                    continue
-
-                yield port
-                self._logger.debug("Retrieving next port")
-                port = client.pal_port_get_next(0, port)
-            except pal.InvalidPalOperation:
-                self._logger.debug(
-                    "Error while processing port %d,"
-                    " assuming no more ports are available",
-                    port,
-                    exc_info=True,
+        # Ports that came up are read right away
+        came_up = [port for port in reused if port_info[port][0]]
+        if came_up:
+            stats = self._raise_errors(
+                self._read_pipelined(
+                    client,
+                    [("pal_port_all_stats_get", port) for port in came_up],
+                )
+            )
+            read_at = time.monotonic()
+            for port, port_stats in zip(came_up, stats):
+                port_info[port] = (port_info[port][0], port_stats)
+            reused = {
+                port: read
+                for port, read in reused.items()
+                if port not in came_up
+            }
+
+        for port in batch:
+            oper_status, stats = port_info[port]
+            if port in reused:
+                results.append(
+                    (port, oper_status, stats, reused[port].read_at)
                 )
-                break
+            else:
+                self._store_read(port, oper_status, stats, read_at)
+                results.append((port, oper_status, stats, read_at))
+
+    def _store_read(
+        self, port: tuple[int, int], oper_status: int, stats, read_at: float
+    ):
+        if not self._policy.down_interval:
+            return
+        with self._reads_lock:
+            self._reads[port] = _PortRead(oper_status, stats, read_at)
+
+    @staticmethod
+    def _raise_errors(replies: list) -> list:
+        """
+        Raise the first error among the replies of pipelined calls.
+        """
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        return replies
+
+
+def _call_or_error(client, method: str, *args):
+    """
+    Call a method, returning the error it raises instead of raising it, as
+    pipelined calls do. Errors that leave the connection in an unknown
+    state are raised, so that the connection is discarded.
+    """
+    try:
+        return getattr(client, method)(*args)
+    except CONNECTION_ERRORS:
+        raise
+    except Exception as exc:  # pylint: disable=broad-except
+        return exc
+
+
+def _rates(
+    values: list[list[float]],
+    last: list[tuple[float, ...]],
+    elapsed: list[float],
+) -> list[tuple[float, ...]]:
+    """
+    Compute the rates of several ports, one port at a time.
+    """
+    return [
+        tuple(
+            increase(value, last_value) / port_elapsed
+            for value, last_value in zip(port_values, port_last)
+        )
+        for port_values, port_last, port_elapsed in zip(values, last, elapsed)
+    ]
+
+
+def _batched(items: list, size: int):
+    for i in range(0, len(items), size):
+        yield items[i : i + size]
@@ -0,0 +1,176 @@
+"""
+Columnar store of the statistics of the ports, from which the metrics and
+rates are derived for all ports at once with NumPy.
+
+NumPy is optional. Without it, :py:data:`AVAILABLE` is false and the
+statistics are derived one port at a time instead.
+"""
+
+import itertools
+import threading
+from collections.abc import Sequence
+
+from prometheus_client import Metric
+from prometheus_client.samples import Sample
+
+from ska_p4_switch_exporter.port_stats import (
+    PalStat,
+    PortStatMetric,
+    StatDifference,
+    StatExpression,
+)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+__all__ = [
+    "AVAILABLE",
+    "PortStatMatrix",
+    "SampleLabels",
+    "rates",
+]
+
+AVAILABLE = numpy is not None
+"""Whether NumPy is available."""
+
+
+class PortStatMatrix:
+    """
+    Statistics of a set of ports, as a matrix with a row per port and a
+    column per statistic.
+
+    The counters are stored as 64-bit signed integers, the type they are
+    sent as by the RPC server, so that differences between them are exact
+    and equal to those computed with Python integers.
+    """
+
+    def __init__(self, entries: Sequence[Sequence[int]]):
+        self.counters = (
+            numpy.array(entries, dtype=numpy.int64)
+            if entries
+            else numpy.zeros((0, len(PalStat)), dtype=numpy.int64)
+        )
+
+    def evaluate(self, expressions: Sequence[StatExpression]):
+        """
+        Evaluate expressions against the statistics of every port,
+        returning a matrix with a row per port and a column per expression.
+        """
+        minuends = [
+            (
+                expression.minuend
+                if isinstance(expression, StatDifference)
+                else expression
+            )
+            for expression in expressions
+        ]
+        differences = [
+            i
+            for i, expression in enumerate(expressions)
+            if isinstance(expression, StatDifference)
+        ]
+        values = self.counters[:, minuends]
+        if differences:
+            values[:, differences] -= self.counters[
+                :, [expressions[i].subtrahend for i in differences]
+            ]
+        return values.astype(numpy.float64)
+
+    def add_samples(
+        self,
+        family: Metric,
+        metric: PortStatMetric,
+        labels: Sequence[dict[str, str]],
+    ):
+        """
+        Add the samples of a metric for every port to its family, in bulk
+        instead of with one call to ``add_metric`` per sample.
+
+        :param labels: labels of each sample, as returned by
+            :py:meth:`SampleLabels.get`
+        """
+        name = family.name + ("_total" if family.type == "counter" else "")
+        values = self.evaluate(list(metric.samples.values())).ravel()
+        family.samples.extend(
+            map(
+                Sample,
+                itertools.repeat(name),
+                labels,
+                values.tolist(),
+                itertools.repeat(None),
+                itertools.repeat(None),
+            )
+        )
+
+
+class SampleLabels:
+    """
+    Labels of the samples of each metric for every port, in the order of
+    the values of :py:meth:`PortStatMatrix.evaluate`.
+
+    Building the labels of each sample takes longer than deriving its
+    value, so they are kept from one collection to the next for as long as
+    the ports stay the same, as they normally do. The labels are shared by
+    the samples of successive collections and must not be modified.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ports: tuple[tuple[str, ...], ...] = ()
+        self._labels: dict[str, list[dict[str, str]]] = {}
+
+    def update(self, port_labels: Sequence[Sequence[str]]):
+        """
+        Set the labels of the ports, dropping the labels of the samples if
+        they changed.
+        """
+        ports = tuple(tuple(labels) for labels in port_labels)
+        with self._lock:
+            if ports != self._ports:
+                self._ports = ports
+                self._labels = {}
+
+    def get(self, metric: PortStatMetric) -> list[dict[str, str]]:
+        """
+        Get the labels of the samples of a metric, port by port.
+        """
+        with self._lock:
+            labels = self._labels.get(metric.name)
+            if labels is None:
+                names = ["device", "port", "channel", *metric.labels]
+                labels = self._labels[metric.name] = [
+                    dict(zip(names, (*port, *label_values)))
+                    for port in self._ports
+                    for label_values in metric.samples
+                ]
+            return labels
+
+
+def rates(
+    values: Sequence[Sequence[float]],
+    last: Sequence[Sequence[float]],
+    elapsed: Sequence[float],
+) -> list[tuple[float, ...]]:
+    """
+    Compute the rates of several ports at once, from the values of their
+    rate expressions, their last values and the time elapsed since.
+
+    A counter lower than its last value was reset, e.g. because
+    ``bf_switchd`` restarted, and is assumed to have increased from 0
+    since, as :py:func:`~ska_p4_switch_exporter.port_stats.increase` does.
+    """
+    if not values:
+        return []
+    values = numpy.asarray(values, dtype=numpy.float64)
+    last = numpy.asarray(last, dtype=numpy.float64)
+    increases = numpy.maximum(
+        numpy.where(values >= last, values - last, values), 0.0
+    )
+    return [
+        tuple(row)
+        for row in (
+            increases / numpy.asarray(elapsed, dtype=numpy.float64)[:, None]
+        ).tolist()
+    ]
@@ -0,0 +1,65 @@
+"""
+Policy deciding which ports the ``PortCollector`` collects, and how often
+the statistics of the ports that are down are read.
+"""
+
+import dataclasses
+import re
+from collections.abc import Sequence
+
+__all__ = [
+    "PortPolicy",
+]
+
+
+@dataclasses.dataclass(frozen=True)
+class PortPolicy:
+    """
+    Which ports are collected, and how often the statistics of the ports
+    that are down are read.
+
+    A port is collected if its front panel port, written as
+    ``PORT/CHANNEL``, matches one of the ``include`` regular expressions,
+    or if there are none, and matches none of the ``exclude`` ones. Plain
+    front panel ports are regular expressions matching only themselves, so
+    that ``include`` is an allowlist as well, e.g. ``["1/0", "2/.*"]``.
+
+    The counters of a port that is down do not change, so with a
+    ``down_interval`` greater than 0, they are only read every
+    ``down_interval`` seconds while it stays down, and the last ones are
+    exported in between. They are read again as soon as the port comes up.
+    """
+
+    include: Sequence[str] = ()
+    exclude: Sequence[str] = ()
+
+    down_interval: float = 0.0
+    """Time after which the statistics of a port that is down are read."""
+
+    def __post_init__(self):
+        for pattern in [*self.include, *self.exclude]:
+            re.compile(pattern)
+
+    def selects(self, labels: Sequence[str]) -> bool:
+        """
+        Check whether a port is collected, given the labels of its front
+        panel port and channel.
+        """
+        name = "/".join(labels)
+        if self.include and not any(
+            re.fullmatch(pattern, name) for pattern in self.include
+        ):
+            return False
+        return not any(re.fullmatch(pattern, name) for pattern in self.exclude)
+
+    def reuses_stats(self, oper_status: int, age: float) -> bool:
+        """
+        Check whether the statistics of a port can be exported again
+        instead of being read, given its last operational status and the
+        time in seconds since they were read.
+        """
+        return (
+            bool(self.down_interval)
+            and not oper_status
+            and age < self.down_interval
+        )
@@ -0,0 +1,353 @@
+# pylint: disable=import-error
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# pylint: disable=too-many-positional-arguments
+
+"""
+High-frequency sampling of the byte and frame counters of a few ports, to
+detect the microbursts that the rates over a whole scrape average away.
+"""
+
+import collections
+import dataclasses
+import logging
+import math
+import threading
+import time
+from collections.abc import Sequence
+
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import REGISTRY, CollectorRegistry
+from tofino.pal_rpc import pal
+
+from ska_exporter_common import deadline
+from ska_p4_switch_exporter.port_stats import (
+    PalStat,
+    StatExpression,
+    evaluate,
+    increase,
+)
+from ska_p4_switch_exporter.rpc_collector_base import RpcCollectorBase
+from ska_p4_switch_exporter.rpc_connection_pool import (
+    RpcConnectionPool,
+    RpcUnavailableError,
+)
+
+__all__ = [
+    "PortSampler",
+    "parse_front_panel_port",
+]
+
+
+@dataclasses.dataclass(frozen=True)
+class _SampledRate:
+    name: str
+    documentation: str
+    expression: StatExpression
+
+    scale: float = 1.0
+    """Factor the increase of the expression is multiplied by."""
+
+
+_SAMPLED_RATES = (
+    _SampledRate(
+        "p4_switch_port_rx_bits_per_second",
+        "bits received on the port per second",
+        PalStat.OctetsReceived,
+        scale=8.0,
+    ),
+    _SampledRate(
+        "p4_switch_port_tx_bits_per_second",
+        "bits transmitted on the port per second",
+        PalStat.OctetsTransmittedTotal,
+        scale=8.0,
+    ),
+    _SampledRate(
+        "p4_switch_port_rx_frames_per_second",
+        "frames received on the port per second",
+        PalStat.FramesReceivedAll,
+    ),
+    _SampledRate(
+        "p4_switch_port_tx_frames_per_second",
+        "frames transmitted on the port per second",
+        PalStat.FramesTransmittedAll,
+    ),
+)
+
+# Quantile exported along with the maximum of the sampled rates
+_QUANTILE = 0.99
+
+
+@dataclasses.dataclass(frozen=True)
+class _Sample:
+    read_at: float
+    """Monotonic time at which the statistics were read."""
+
+    values: tuple[float, ...]
+    """Values of the expressions of the sampled rates."""
+
+
+def parse_front_panel_port(value: str) -> tuple[int, int]:
+    """
+    Parse a front panel port and channel written as ``PORT/CHANNEL``.
+    """
+    try:
+        port, channel = (int(part) for part in value.split("/"))
+    except ValueError as exc:
+        raise ValueError(
+            f"{value!r} is not a front panel port as PORT/CHANNEL"
+        ) from exc
+    return port, channel
+
+
+class PortSampler(RpcCollectorBase):
+    """
+    Collector sampling the byte and frame counters of a few front panel
+    ports every ``interval`` seconds, in a thread of its own, and exporting
+    the highest and 99th percentile rates between consecutive samples over
+    the last ``window`` seconds, normally the scrape interval.
+
+    The rates of each port are kept in a ring buffer just large enough for
+    the window, so memory stays bounded however long the exporter runs. A
+    counter lower than in the previous sample was reset, e.g. because
+    ``bf_switchd`` restarted, and is assumed to have increased from 0
+    since.
+
+    Sampling starts with :py:meth:`start`, and each round of samples is
+    bounded by a deadline of ``interval`` seconds, so that a slow RPC
+    server delays the next round instead of piling them up. The sampler
+    should have a connection pool of its own, the private one it opens if
+    none is given, so that its rounds neither wait for the connections of
+    the other collectors nor hold them up.
+
+    The front panel ports are those of ``device``, which the metrics are
+    labelled with, like those of the
+    :py:class:`~ska_p4_switch_exporter.port_collector.PortCollector`.
+    """
+
+    def __init__(
+        self,
+        rpc_host: str,
+        rpc_port: int,
+        ports: Sequence[tuple[int, int]],
+        interval: float = 0.1,
+        window: float = 15.0,
+        logger: logging.Logger | None = None,
+        registry: CollectorRegistry | None = REGISTRY,
+        connection_pool: RpcConnectionPool | None = None,
+        pipeline_depth: int = 0,
+        device: int = 0,
+    ):
+        logger = logger or logging.getLogger(__name__)
+        super().__init__(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            rpc_endpoint="pal",
+            rpc_module=pal,
+            logger=logger,
+            connection_pool=connection_pool,
+        )
+        self.ports = tuple(ports)
+        self.device = device
+        self.interval = interval
+        self.window = window
+        self._pipeline_depth = pipeline_depth
+        self._capacity = math.ceil(window / interval) + 1
+
+        self._lock = threading.Lock()
+        # Device port of each front panel port, resolved on the first round
+        self._dev_ports: dict[tuple[int, int], int] | None = None
+        self._samples: dict[tuple[int, int], _Sample] = {}
+        self._rates: dict[tuple[int, int], collections.deque] = {
+            port: collections.deque(maxlen=self._capacity)
+            for port in self.ports
+        }
+        self._stopped = threading.Event()
+        self._thread: threading.Thread | None = None
+
+        if registry:
+            logger.info("Registering %s", self.__class__.__name__)
+            registry.register(self)
+
+    def start(self):
+        """
+        Start sampling in the background.
+        """
+        self._logger.info(
+            "Sampling %d ports every %.3g seconds",
+            len(self.ports),
+            self.interval,
+        )
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name=self.__class__.__name__, daemon=True
+        )
+        self._thread.start()
+
+    def stop(self, timeout: float | None = None):
+        """
+        Stop sampling, waiting up to ``timeout`` seconds for the round in
+        progress to finish.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def sample(self):
+        """
+        Read the counters of the sampled ports once, adding the rates since
+        the previous round to their ring buffers.
+        """
+        ports, results, read_at = [], [], 0.0
+        with self._get_rpc_client() as client:
+            if self._dev_ports is None:
+                self._dev_ports = self._resolve_ports(client)
+            ports = list(self._dev_ports.items())
+            results = self._read_stats(client, [dev for _, dev in ports])
+            read_at = time.monotonic()
+
+        for (port, _), stats in zip(ports, results):
+            if isinstance(stats, pal.InvalidPalOperation):
+                # The port is gone, resolve the ports again on the next round
+                self._dev_ports = None
+                raise stats
+            if isinstance(stats, Exception):
+                raise stats
+            self._add_sample(
+                port,
+                _Sample(
+                    read_at,
+                    tuple(
+                        evaluate(rate.expression, stats.entry)
+                        for rate in _SAMPLED_RATES
+                    ),
+                ),
+            )
+
+    def _run(self):
+        next_round = time.monotonic()
+        while not self._stopped.is_set():
+            try:
+                with deadline.scope(deadline.Deadline(self.interval)):
+                    self.sample()
+            except (
+                RpcUnavailableError,
+                deadline.DeadlineExceededError,
+            ) as exc:
+                self._logger.debug("Skipping port sampling: %s", exc)
+            except Exception:  # pylint: disable=broad-except
+                self._logger.exception("Port sampling failed")
+            next_round = max(next_round + self.interval, time.monotonic())
+            self._stopped.wait(next_round - time.monotonic())
+
+    def _resolve_ports(self, client) -> dict[tuple[int, int], int]:
+        """
+        Get the device port of each sampled front panel port, leaving out
+        the ones that do not exist.
+        """
+        dev_ports = {}
+        for port, channel in self.ports:
+            try:
+                dev_ports[(port, channel)] = (
+                    client.pal_port_front_panel_port_to_dev_port_get(
+                        self.device, port, channel
+                    )
+                )
+            except pal.InvalidPalOperation:
+                self._logger.warning(
+                    "Front panel port %d/%d does not exist, not sampling it",
+                    port,
+                    channel,
+                )
+        return dev_ports
+
+    def _read_stats(self, client, dev_ports: list[int]) -> list:
+        """
+        Read the statistics of the given ports, pipelining the calls in
+        batches if enabled, and returning the errors they raise instead of
+        raising them, as pipelined calls do.
+        """
+        if not self._pipeline_depth:
+            results = []
+            for dev_port in dev_ports:
+                try:
+                    results.append(
+                        client.pal_port_all_stats_get(self.device, dev_port)
+                    )
+                except pal.InvalidPalOperation as exc:
+                    results.append(exc)
+            return results
+
+        results = []
+        for i in range(0, len(dev_ports), self._pipeline_depth):
+            results.extend(
+                client.pipeline(
+                    [
+                        ("pal_port_all_stats_get", (self.device, dev_port))
+                        for dev_port in dev_ports[i : i + self._pipeline_depth]
+                    ]
+                )
+            )
+        return results
+
+    def _add_sample(self, port: tuple[int, int], sample: _Sample):
+        with self._lock:
+            previous = self._samples.get(port)
+            self._samples[port] = sample
+            if previous is None or sample.read_at <= previous.read_at:
+                return
+            elapsed = sample.read_at - previous.read_at
+            self._rates[port].append(
+                (
+                    sample.read_at,
+                    tuple(
+                        increase(value, last) * rate.scale / elapsed
+                        for rate, value, last in zip(
+                            _SAMPLED_RATES, sample.values, previous.values
+                        )
+                    ),
+                )
+            )
+
+    def _collect(self):
+        families = [
+            (
+                GaugeMetricFamily(
+                    f"{rate.name}_max",
+                    f"Highest number of {rate.documentation}, between"
+                    " samples over the sampling window",
+                    labels=["device", "port", "channel"],
+                ),
+                GaugeMetricFamily(
+                    f"{rate.name}_p99",
+                    f"99th percentile of the number of {rate.documentation},"
+                    " between samples over the sampling window",
+                    labels=["device", "port", "channel"],
+                ),
+            )
+            for rate in _SAMPLED_RATES
+        ]
+
+        since = time.monotonic() - self.window
+        with self._lock:
+            windows = {
+                port: [rates for read_at, rates in buffer if read_at >= since]
+                for port, buffer in self._rates.items()
+            }
+
+        for (port, channel), rates in windows.items():
+            if not rates:
+                continue
+            labels = [str(self.device), str(port), str(channel)]
+            for (maximum, quantile), values in zip(families, zip(*rates)):
+                values = sorted(values)
+                maximum.add_metric(labels, values[-1])
+                quantile.add_metric(
+                    labels,
+                    values[max(math.ceil(_QUANTILE * len(values)) - 1, 0)],
+                )
+
+        for maximum, quantile in families:
+            yield maximum
+            yield quantile
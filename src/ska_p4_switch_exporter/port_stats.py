@@ -0,0 +1,555 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Table of the metrics exported from the statistics of each port, as
+returned by the PAL RPC.
+
+The table maps each metric to the statistics its samples are taken from,
+so that which counters are exported is a matter of selecting entries of
+the table, without any extra RPCs. A second table maps the rates that can
+be computed by the exporter to the statistics they are computed from.
+"""
+
+import dataclasses
+import enum
+import fnmatch
+from collections.abc import Sequence
+
+from prometheus_client.core import CounterMetricFamily
+from prometheus_client.metrics_core import Metric
+
+__all__ = [
+    "PORT_RATE_METRICS",
+    "PORT_STAT_METRICS",
+    "PalStat",
+    "PortRateMetric",
+    "PortStatMetric",
+    "StatDifference",
+    "evaluate",
+    "increase",
+    "select_port_stat_metrics",
+]
+
+
+class PalStat(enum.IntEnum):
+    """
+    Identifiers for the port statistics returned by the PAL RPC.
+
+    Note: these values are taken from the PAL RPC thrift definition.
+    """
+
+    # pylint: disable=invalid-name
+
+    FramesReceivedOK = 0
+    FramesReceivedAll = 1
+    FramesReceivedwithFCSError = 2
+    FrameswithanyError = 3
+    OctetsReceivedinGoodFrames = 4
+    OctetsReceived = 5
+    FramesReceivedwithUnicastAddresses = 6
+    FramesReceivedwithMulticastAddresses = 7
+    FramesReceivedwithBroadcastAddresses = 8
+    FramesReceivedoftypePAUSE = 9
+    FramesReceivedwithLengthError = 10
+    FramesReceivedUndersized = 11
+    FramesReceivedOversized = 12
+    FragmentsReceived = 13
+    JabberReceived = 14
+    PriorityPauseFrames = 15
+    CRCErrorStomped = 16
+    FrameTooLong = 17
+    RxVLANFramesGood = 18
+    FramesDroppedBufferFull = 19
+    FramesReceivedLength_lt_64 = 20
+    FramesReceivedLength_eq_64 = 21
+    FramesReceivedLength_65_127 = 22
+    FramesReceivedLength_128_255 = 23
+    FramesReceivedLength_256_511 = 24
+    FramesReceivedLength_512_1023 = 25
+    FramesReceivedLength_1024_1518 = 26
+    FramesReceivedLength_1519_2047 = 27
+    FramesReceivedLength_2048_4095 = 28
+    FramesReceivedLength_4096_8191 = 29
+    FramesReceivedLength_8192_9215 = 30
+    FramesReceivedLength_9216 = 31
+    FramesTransmittedOK = 32
+    FramesTransmittedAll = 33
+    FramesTransmittedwithError = 34
+    OctetsTransmittedwithouterror = 35
+    OctetsTransmittedTotal = 36
+    FramesTransmittedUnicast = 37
+    FramesTransmittedMulticast = 38
+    FramesTransmittedBroadcast = 39
+    FramesTransmittedPause = 40
+    FramesTransmittedPriPause = 41
+    FramesTransmittedVLAN = 42
+    FramesTransmittedLength_lt_64 = 43
+    FramesTransmittedLength_eq_64 = 44
+    FramesTransmittedLength_65_127 = 45
+    FramesTransmittedLength_128_255 = 46
+    FramesTransmittedLength_256_511 = 47
+    FramesTransmittedLength_512_1023 = 48
+    FramesTransmittedLength_1024_1518 = 49
+    FramesTransmittedLength_1519_2047 = 50
+    FramesTransmittedLength_2048_4095 = 51
+    FramesTransmittedLength_4096_8191 = 52
+    FramesTransmittedLength_8192_9215 = 53
+    FramesTransmittedLength_9216 = 54
+    Pri0FramesTransmitted = 55
+    Pri1FramesTransmitted = 56
+    Pri2FramesTransmitted = 57
+    Pri3FramesTransmitted = 58
+    Pri4FramesTransmitted = 59
+    Pri5FramesTransmitted = 60
+    Pri6FramesTransmitted = 61
+    Pri7FramesTransmitted = 62
+    Pri0FramesReceived = 63
+    Pri1FramesReceived = 64
+    Pri2FramesReceived = 65
+    Pri3FramesReceived = 66
+    Pri4FramesReceived = 67
+    Pri5FramesReceived = 68
+    Pri6FramesReceived = 69
+    Pri7FramesReceived = 70
+    TransmitPri0Pause1USCount = 71
+    TransmitPri1Pause1USCount = 72
+    TransmitPri2Pause1USCount = 73
+    TransmitPri3Pause1USCount = 74
+    TransmitPri4Pause1USCount = 75
+    TransmitPri5Pause1USCount = 76
+    TransmitPri6Pause1USCount = 77
+    TransmitPri7Pause1USCount = 78
+    ReceivePri0Pause1USCount = 79
+    ReceivePri1Pause1USCount = 80
+    ReceivePri2Pause1USCount = 81
+    ReceivePri3Pause1USCount = 82
+    ReceivePri4Pause1USCount = 83
+    ReceivePri5Pause1USCount = 84
+    ReceivePri6Pause1USCount = 85
+    ReceivePri7Pause1USCount = 86
+    ReceiveStandardPause1USCount = 87
+    FramesTruncated = 88
+
+
+@dataclasses.dataclass(frozen=True)
+class StatDifference:
+    """
+    Difference between two port statistics, e.g. the frames received with
+    errors as all frames received less those received OK.
+    """
+
+    minuend: PalStat
+    subtrahend: PalStat
+
+
+StatExpression = PalStat | StatDifference
+"""A port statistic, or an expression derived from several of them."""
+
+
+def evaluate(expression: StatExpression, entry: Sequence[int]) -> float:
+    """
+    Evaluate an expression against the statistics of a port.
+    """
+    if isinstance(expression, StatDifference):
+        return float(entry[expression.minuend] - entry[expression.subtrahend])
+    return float(entry[expression])
+
+
+def increase(value: float, last: float) -> float:
+    """
+    Get how much a counter increased since its last value.
+
+    A counter lower than its last value was reset, e.g. because
+    ``bf_switchd`` restarted, and is assumed to have increased from 0
+    since, as Prometheus does.
+    """
+    return max(value - last if value >= last else value, 0.0)
+
+
+@dataclasses.dataclass(frozen=True)
+class PortStatMetric:
+    """
+    Metric exported from the statistics of each port.
+
+    Each port gets one sample per entry of ``samples``, keyed by the values
+    of the ``labels`` the metric has besides the port and channel.
+    """
+
+    name: str
+    documentation: str
+    samples: dict[tuple[str, ...], StatExpression]
+    labels: tuple[str, ...] = ()
+
+    family: type[Metric] = CounterMetricFamily
+    """Type of the metric family, a counter unless specified otherwise."""
+
+    default: bool = True
+    """Whether the metric is exported unless selected otherwise."""
+
+    def value(self, expression: StatExpression, entry: Sequence[int]) -> float:
+        """
+        Evaluate one of the expressions of the samples against the
+        statistics of a port.
+        """
+        return evaluate(expression, entry)
+
+
+def _counter(
+    name: str, documentation: str, stat: StatExpression, default: bool = True
+) -> PortStatMetric:
+    return PortStatMetric(
+        f"p4_switch_port_stats_{name}",
+        documentation,
+        {(): stat},
+        default=default,
+    )
+
+
+def _per_priority(name: str, documentation: str, stat: str) -> PortStatMetric:
+    return PortStatMetric(
+        f"p4_switch_port_stats_{name}",
+        documentation,
+        {
+            (str(priority),): PalStat[stat.format(priority=priority)]
+            for priority in range(8)
+        },
+        labels=("priority",),
+        default=False,
+    )
+
+
+_LENGTHS = [
+    ("<64", "lt_64"),
+    ("64", "eq_64"),
+    ("65-127", "65_127"),
+    ("128-255", "128_255"),
+    ("256-511", "256_511"),
+    ("512-1023", "512_1023"),
+    ("1024-1518", "1024_1518"),
+    ("1519-2047", "1519_2047"),
+    ("2048-4095", "2048_4095"),
+    ("4096-8191", "4096_8191"),
+    ("8192-9215", "8192_9215"),
+    ("9216", "9216"),
+]
+
+PORT_STAT_METRICS: tuple[PortStatMetric, ...] = (
+    _counter(
+        "rx_bytes",
+        "Number of bytes received on the port",
+        PalStat.OctetsReceived,
+    ),
+    _counter(
+        "tx_bytes",
+        "Number of bytes received on the port",
+        PalStat.OctetsTransmittedTotal,
+    ),
+    PortStatMetric(
+        "p4_switch_port_stats_rx_frames",
+        "Number of frames received on the port,"
+        " grouped by frame length in bytes",
+        {
+            (length,): PalStat[f"FramesReceivedLength_{suffix}"]
+            for length, suffix in _LENGTHS
+        },
+        labels=("length",),
+    ),
+    PortStatMetric(
+        "p4_switch_port_stats_tx_frames",
+        "Number of frames transmitted on the port,"
+        " grouped by frame length in bytes",
+        {
+            (length,): PalStat[f"FramesTransmittedLength_{suffix}"]
+            for length, suffix in _LENGTHS
+        },
+        labels=("length",),
+    ),
+    _counter(
+        "rx_errors",
+        "The total number of receive errors on the port",
+        StatDifference(PalStat.FramesReceivedAll, PalStat.FramesReceivedOK),
+    ),
+    _counter(
+        "tx_errors",
+        "The total number of transmit errors on the port",
+        StatDifference(
+            PalStat.FramesTransmittedAll, PalStat.FramesTransmittedOK
+        ),
+    ),
+    _counter(
+        "rx_unicast_frames",
+        "The total number of unicast frames received on the port",
+        PalStat.FramesReceivedwithUnicastAddresses,
+    ),
+    _counter(
+        "rx_multicast_frames",
+        "The total number of multicast frames received on the port",
+        PalStat.FramesReceivedwithMulticastAddresses,
+    ),
+    _counter(
+        "rx_broadcast_frames",
+        "The total number of broadcast frames received on the port",
+        PalStat.FramesReceivedwithBroadcastAddresses,
+    ),
+    _counter(
+        "tx_unicast_frames",
+        "The total number of unicast frames transmitted on the port",
+        PalStat.FramesTransmittedUnicast,
+    ),
+    _counter(
+        "tx_multicast_frames",
+        "The total number of multicast frames transmitted on the port",
+        PalStat.FramesTransmittedMulticast,
+    ),
+    _counter(
+        "tx_broadcast_frames",
+        "The total number of broadcast frames transmitted on the port",
+        PalStat.FramesTransmittedBroadcast,
+    ),
+    _counter(
+        "rx_ok_frames",
+        "The total number of frames received OK on the port",
+        PalStat.FramesReceivedOK,
+        default=False,
+    ),
+    _counter(
+        "tx_ok_frames",
+        "The total number of frames transmitted OK on the port",
+        PalStat.FramesTransmittedOK,
+        default=False,
+    ),
+    _counter(
+        "rx_good_bytes",
+        "Number of bytes received in good frames on the port",
+        PalStat.OctetsReceivedinGoodFrames,
+        default=False,
+    ),
+    _counter(
+        "tx_good_bytes",
+        "Number of bytes transmitted without error on the port",
+        PalStat.OctetsTransmittedwithouterror,
+        default=False,
+    ),
+    _counter(
+        "rx_fcs_error_frames",
+        "The total number of frames received with an FCS error on the port",
+        PalStat.FramesReceivedwithFCSError,
+        default=False,
+    ),
+    _counter(
+        "rx_any_error_frames",
+        "The total number of frames received with any error on the port",
+        PalStat.FrameswithanyError,
+        default=False,
+    ),
+    _counter(
+        "tx_error_frames",
+        "The total number of frames transmitted with an error on the port",
+        PalStat.FramesTransmittedwithError,
+        default=False,
+    ),
+    _counter(
+        "rx_length_error_frames",
+        "The total number of frames received with a length error on the port",
+        PalStat.FramesReceivedwithLengthError,
+        default=False,
+    ),
+    _counter(
+        "rx_undersized_frames",
+        "The total number of undersized frames received on the port",
+        PalStat.FramesReceivedUndersized,
+        default=False,
+    ),
+    _counter(
+        "rx_oversized_frames",
+        "The total number of oversized frames received on the port",
+        PalStat.FramesReceivedOversized,
+        default=False,
+    ),
+    _counter(
+        "rx_too_long_frames",
+        "The total number of frames too long received on the port",
+        PalStat.FrameTooLong,
+        default=False,
+    ),
+    _counter(
+        "rx_fragments",
+        "The total number of fragments received on the port",
+        PalStat.FragmentsReceived,
+        default=False,
+    ),
+    _counter(
+        "rx_jabber_frames",
+        "The total number of jabber frames received on the port",
+        PalStat.JabberReceived,
+        default=False,
+    ),
+    _counter(
+        "rx_crc_stomped_frames",
+        "The total number of frames received with a stomped CRC on the port",
+        PalStat.CRCErrorStomped,
+        default=False,
+    ),
+    _counter(
+        "rx_truncated_frames",
+        "The total number of truncated frames received on the port",
+        PalStat.FramesTruncated,
+        default=False,
+    ),
+    _counter(
+        "rx_dropped_frames",
+        "The total number of frames received on the port"
+        " and dropped because the buffer was full",
+        PalStat.FramesDroppedBufferFull,
+        default=False,
+    ),
+    _counter(
+        "rx_vlan_frames",
+        "The total number of good VLAN frames received on the port",
+        PalStat.RxVLANFramesGood,
+        default=False,
+    ),
+    _counter(
+        "tx_vlan_frames",
+        "The total number of VLAN frames transmitted on the port",
+        PalStat.FramesTransmittedVLAN,
+        default=False,
+    ),
+    _counter(
+        "rx_pause_frames",
+        "The total number of pause frames received on the port",
+        PalStat.FramesReceivedoftypePAUSE,
+        default=False,
+    ),
+    _counter(
+        "tx_pause_frames",
+        "The total number of pause frames transmitted on the port",
+        PalStat.FramesTransmittedPause,
+        default=False,
+    ),
+    _counter(
+        "rx_priority_pause_frames",
+        "The total number of priority flow control pause frames received"
+        " on the port",
+        PalStat.PriorityPauseFrames,
+        default=False,
+    ),
+    _counter(
+        "tx_priority_pause_frames",
+        "The total number of priority flow control pause frames transmitted"
+        " on the port",
+        PalStat.FramesTransmittedPriPause,
+        default=False,
+    ),
+    _counter(
+        "rx_pause_microseconds",
+        "Time in microseconds during which the port was paused"
+        " by standard pause frames received on it",
+        PalStat.ReceiveStandardPause1USCount,
+        default=False,
+    ),
+    _per_priority(
+        "rx_priority_frames",
+        "The total number of frames received on the port, by priority",
+        "Pri{priority}FramesReceived",
+    ),
+    _per_priority(
+        "tx_priority_frames",
+        "The total number of frames transmitted on the port, by priority",
+        "Pri{priority}FramesTransmitted",
+    ),
+    _per_priority(
+        "rx_priority_pause_microseconds",
+        "Time in microseconds during which each priority of the port was"
+        " paused by priority flow control frames received on it",
+        "ReceivePri{priority}Pause1USCount",
+    ),
+    _per_priority(
+        "tx_priority_pause_microseconds",
+        "Time in microseconds during which each priority of the port was"
+        " paused by priority flow control frames transmitted on it",
+        "TransmitPri{priority}Pause1USCount",
+    ),
+    PortStatMetric(
+        "p4_switch_port_stats_pal",
+        "Value of each statistic of the port, as returned by the PAL RPC",
+        {(stat.name,): stat for stat in PalStat},
+        labels=("stat",),
+        default=False,
+    ),
+)
+"""Metrics exported from the statistics of each port."""
+
+
+@dataclasses.dataclass(frozen=True)
+class PortRateMetric:
+    """
+    Gauge of the rate at which an expression of the statistics of each port
+    increases, per second.
+    """
+
+    name: str
+    documentation: str
+    expression: StatExpression
+
+
+PORT_RATE_METRICS: tuple[PortRateMetric, ...] = (
+    PortRateMetric(
+        "p4_switch_port_rx_bytes_per_second",
+        "Number of bytes received on the port per second",
+        PalStat.OctetsReceived,
+    ),
+    PortRateMetric(
+        "p4_switch_port_tx_bytes_per_second",
+        "Number of bytes transmitted on the port per second",
+        PalStat.OctetsTransmittedTotal,
+    ),
+    PortRateMetric(
+        "p4_switch_port_rx_frames_per_second",
+        "Number of frames received on the port per second",
+        PalStat.FramesReceivedAll,
+    ),
+    PortRateMetric(
+        "p4_switch_port_tx_frames_per_second",
+        "Number of frames transmitted on the port per second",
+        PalStat.FramesTransmittedAll,
+    ),
+    PortRateMetric(
+        "p4_switch_port_rx_errors_per_second",
+        "Number of receive errors on the port per second",
+        StatDifference(PalStat.FramesReceivedAll, PalStat.FramesReceivedOK),
+    ),
+    PortRateMetric(
+        "p4_switch_port_tx_errors_per_second",
+        "Number of transmit errors on the port per second",
+        StatDifference(
+            PalStat.FramesTransmittedAll, PalStat.FramesTransmittedOK
+        ),
+    ),
+)
+"""Rates computed from the statistics of each port."""
+
+
+def select_port_stat_metrics(
+    include: Sequence[str] = (), exclude: Sequence[str] = ()
+) -> tuple[PortStatMetric, ...]:
+    """
+    Select the metrics to export from :py:data:`PORT_STAT_METRICS`, by
+    shell-style wildcard patterns matched against their names.
+
+    Without ``include`` patterns, the metrics exported by default are
+    selected. The metrics matching an ``exclude`` pattern are left out
+    either way.
+    """
+
+    def matches(metric: PortStatMetric, patterns: Sequence[str]) -> bool:
+        return any(
+            fnmatch.fnmatchcase(metric.name, pattern) for pattern in patterns
+        )
+
+    return tuple(
+        metric
+        for metric in PORT_STAT_METRICS
+        if (matches(metric, include) if include else metric.default)
+        and not matches(metric, exclude)
+    )
@@ -1,6 +1,8 @@
 # pylint: disable=import-error
 # pylint: disable=too-few-public-methods
+# pylint: disable=too-many-arguments
 # pylint: disable=too-many-locals
+# pylint: disable=too-many-positional-arguments
 # pylint: disable=too-many-statements
 
 """
@@ -8,25 +10,91 @@ Custom Prometheus collector that collects QSFP metrics
 using the Barefoot platform manager RPC.
 """
 
+import dataclasses
 import logging
 
 from pltfm_mgr_rpc import pltfm_mgr_rpc
 from prometheus_client.core import GaugeMetricFamily, InfoMetricFamily
 from prometheus_client.registry import REGISTRY, CollectorRegistry
 
+from ska_exporter_common.refresh import (
+    RefreshCache,
+    RefreshIntervals,
+    RefreshTier,
+)
 from ska_p4_switch_exporter.rpc_collector_base import RpcCollectorBase
+from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
 
 __all__ = [
     "QSFPCollector",
 ]
 
 
+@dataclasses.dataclass(frozen=True)
+class _QSFPModule:
+    """
+    Static values of the module plugged into a QSFP cage, which only
+    change when another module is plugged in.
+    """
+
+    labels: dict[str, str] | None
+    """Labels decoded from the information, if it could be decoded."""
+
+    channel_count: int
+    thresholds: object
+
+
+@dataclasses.dataclass
+class _QSFPReadings:
+    """
+    Values read from a present QSFP.
+    """
+
+    module: _QSFPModule
+    temperature: float
+    voltage: float
+    channel_rx_power: list[float]
+    channel_tx_power: list[float]
+
+
 class QSFPCollector(RpcCollectorBase):
     """
     Custom Prometheus collector that collects QSFP metrics
     using the Barefoot platform manager RPC.
+
+    With a ``concurrency`` greater than 1, the QSFPs are read over up to
+    ``concurrency`` connections in parallel, so that a QSFP that is slow to
+    read only holds up the connection it is read on. The metrics are
+    exported in port order either way.
+
+    The presence of the QSFPs is in the fast refresh tier, their
+    temperature, voltage and channel power readings in the medium tier,
+    and their information in the static tier. Everything is read again
+    when a QSFP is unplugged and plugged back in.
+
+    The labels decoded from the information of a module, its channel count
+    and its thresholds are cached for as long as the same module is
+    plugged in: they are only read again when a QSFP is plugged in, or
+    when the serial number in its information changes once the information
+    is read again after the static refresh interval. A module swapped
+    between two collections is thus noticed within the static refresh
+    interval, if set, and its readings are read again as well.
+
+    With adaptive refresh intervals, the readings of the medium tier are
+    read more often while they change quickly or are close to the warning
+    and alarm thresholds of the QSFP, and less often while they stay flat.
     """
 
+    refresh_tiers = {
+        "pltfm_mgr_qsfp_get_max_port": RefreshTier.STATIC,
+        "pltfm_mgr_qsfp_presence_get": RefreshTier.FAST,
+        "pltfm_mgr_qsfp_info_get": RefreshTier.STATIC,
+        "pltfm_mgr_qsfp_temperature_get": RefreshTier.MEDIUM,
+        "pltfm_mgr_qsfp_voltage_get": RefreshTier.MEDIUM,
+        "pltfm_mgr_qsfp_chan_rx_pwr_get": RefreshTier.MEDIUM,
+        "pltfm_mgr_qsfp_chan_tx_pwr_get": RefreshTier.MEDIUM,
+    }
+
     qsfp_info_byte_offsets = {
         "date_code": (424, 16),
         "part_number": (336, 32),
@@ -41,6 +109,9 @@ class QSFPCollector(RpcCollectorBase):
         rpc_port: int,
         logger: logging.Logger | None = None,
         registry: CollectorRegistry | None = REGISTRY,
+        connection_pool: RpcConnectionPool | None = None,
+        concurrency: int = 1,
+        refresh_intervals: RefreshIntervals | None = None,
     ):
         logger = logger or logging.getLogger(__name__)
         super().__init__(
@@ -49,13 +120,20 @@ class QSFPCollector(RpcCollectorBase):
             rpc_endpoint="pltfm_mgr_rpc",
             rpc_module=pltfm_mgr_rpc,
             logger=logger,
+            connection_pool=connection_pool,
+            concurrency=concurrency,
+            refresh_intervals=refresh_intervals,
+        )
+        # The modules are only read again when their serial number changes
+        self._modules = RefreshCache(
+            None if refresh_intervals is None else RefreshIntervals()
         )
 
         if registry:
             logger.info("Registering %s", self.__class__.__name__)
             registry.register(self)
 
-    def collect(self):
+    def _collect(self):
         qsfp_info = InfoMetricFamily(
             "p4_switch_qsfp",
             "QSFP information",
@@ -198,118 +276,101 @@ class QSFPCollector(RpcCollectorBase):
             labels=["port"],
         )
 
+        ports = []
         with self._get_rpc_client() as client:
-            for port in range(1, client.pltfm_mgr_qsfp_get_max_port()):
-                port_label = str(port)
-                connected = client.pltfm_mgr_qsfp_presence_get(port)
-                self._logger.debug("Port %d connected: %s", port, connected)
-                qsfp_connected.add_metric([port_label], 1 if connected else 0)
-
-                if not connected:
-                    continue
-
-                info = client.pltfm_mgr_qsfp_info_get(port)
-                try:
-                    qsfp_info.add_metric(
-                        [port_label],
-                        {
-                            key: bytes.fromhex(info[offset : offset + length])
-                            .decode()
-                            .strip()
-                            for (
-                                key,
-                                (offset, length),
-                            ) in self.qsfp_info_byte_offsets.items()
-                        },
-                    )
-                except (UnicodeDecodeError, ValueError):
-                    self._logger.debug(
-                        "Unable to decode QSFP serial number "
-                        "from hex string: %s",
-                        info,
-                    )
-
-                qsfp_temperature.add_metric(
-                    [port_label], client.pltfm_mgr_qsfp_temperature_get(port)
+            max_port = self._read(client, "pltfm_mgr_qsfp_get_max_port")
+            ports = list(range(1, max_port))
+
+        for port, readings in self._fan_out(
+            self._read_qsfps, [[port] for port in ports]
+        ):
+            port_label = str(port)
+            qsfp_connected.add_metric(
+                [port_label], 0 if readings is None else 1
+            )
+
+            if readings is None:
+                continue
+
+            module = readings.module
+            if module.labels is not None:
+                qsfp_info.add_metric([port_label], module.labels)
+
+            qsfp_temperature.add_metric([port_label], readings.temperature)
+            qsfp_voltage.add_metric([port_label], readings.voltage)
+            qsfp_channel_count.add_metric([port_label], module.channel_count)
+
+            thresholds = module.thresholds
+
+            if thresholds.temp_is_set:
+                qsfp_temperature_alarm_max.add_metric(
+                    [port_label], thresholds.temp.highalarm
+                )
+                qsfp_temperature_alarm_min.add_metric(
+                    [port_label], thresholds.temp.lowalarm
+                )
+                qsfp_temperature_warning_max.add_metric(
+                    [port_label], thresholds.temp.highwarning
+                )
+                qsfp_temperature_warning_min.add_metric(
+                    [port_label], thresholds.temp.lowwarning
                 )
-                qsfp_voltage.add_metric(
-                    [port_label], client.pltfm_mgr_qsfp_voltage_get(port)
+
+            if thresholds.vcc_is_set:
+                qsfp_voltage_alarm_max.add_metric(
+                    [port_label], thresholds.vcc.highalarm
+                )
+                qsfp_voltage_alarm_min.add_metric(
+                    [port_label], thresholds.vcc.lowalarm
+                )
+                qsfp_voltage_warning_max.add_metric(
+                    [port_label], thresholds.vcc.highwarning
+                )
+                qsfp_voltage_warning_min.add_metric(
+                    [port_label], thresholds.vcc.lowwarning
+                )
+
+            if thresholds.rx_pwr_is_set:
+                qsfp_rx_power_alarm_max.add_metric(
+                    [port_label], thresholds.rx_pwr.highalarm
+                )
+                qsfp_rx_power_alarm_min.add_metric(
+                    [port_label], thresholds.rx_pwr.lowalarm
                 )
-                qsfp_channel_count.add_metric(
-                    [port_label], client.pltfm_mgr_qsfp_chan_count_get(port)
+                qsfp_rx_power_warning_max.add_metric(
+                    [port_label], thresholds.rx_pwr.highwarning
+                )
+                qsfp_rx_power_warning_min.add_metric(
+                    [port_label], thresholds.rx_pwr.lowwarning
                 )
 
-                thresholds = client.pltfm_mgr_qsfp_thresholds_get(port)
-
-                if thresholds.temp_is_set:
-                    qsfp_temperature_alarm_max.add_metric(
-                        [port_label], thresholds.temp.highalarm
-                    )
-                    qsfp_temperature_alarm_min.add_metric(
-                        [port_label], thresholds.temp.lowalarm
-                    )
-                    qsfp_temperature_warning_max.add_metric(
-                        [port_label], thresholds.temp.highwarning
-                    )
-                    qsfp_temperature_warning_min.add_metric(
-                        [port_label], thresholds.temp.lowwarning
-                    )
-
-                if thresholds.vcc_is_set:
-                    qsfp_voltage_alarm_max.add_metric(
-                        [port_label], thresholds.vcc.highalarm
-                    )
-                    qsfp_voltage_alarm_min.add_metric(
-                        [port_label], thresholds.vcc.lowalarm
-                    )
-                    qsfp_voltage_warning_max.add_metric(
-                        [port_label], thresholds.vcc.highwarning
-                    )
-                    qsfp_voltage_warning_min.add_metric(
-                        [port_label], thresholds.vcc.lowwarning
-                    )
-
-                if thresholds.rx_pwr_is_set:
-                    qsfp_rx_power_alarm_max.add_metric(
-                        [port_label], thresholds.rx_pwr.highalarm
-                    )
-                    qsfp_rx_power_alarm_min.add_metric(
-                        [port_label], thresholds.rx_pwr.lowalarm
-                    )
-                    qsfp_rx_power_warning_max.add_metric(
-                        [port_label], thresholds.rx_pwr.highwarning
-                    )
-                    qsfp_rx_power_warning_min.add_metric(
-                        [port_label], thresholds.rx_pwr.lowwarning
-                    )
-
-                if thresholds.tx_pwr_is_set:
-                    qsfp_tx_power_alarm_max.add_metric(
-                        [port_label], thresholds.tx_pwr.highalarm
-                    )
-                    qsfp_tx_power_alarm_min.add_metric(
-                        [port_label], thresholds.tx_pwr.lowalarm
-                    )
-                    qsfp_tx_power_warning_max.add_metric(
-                        [port_label], thresholds.tx_pwr.highwarning
-                    )
-                    qsfp_tx_power_warning_min.add_metric(
-                        [port_label], thresholds.tx_pwr.lowwarning
-                    )
-
-                for channel, channel_rx_power in enumerate(
-                    client.pltfm_mgr_qsfp_chan_rx_pwr_get(port)
-                ):
-                    qsfp_channel_rx_power.add_metric(
-                        [port_label, str(channel + 1)], channel_rx_power
-                    )
-
-                for channel, channel_tx_power in enumerate(
-                    client.pltfm_mgr_qsfp_chan_tx_pwr_get(port)
-                ):
-                    qsfp_channel_tx_power.add_metric(
-                        [port_label, str(channel + 1)], channel_tx_power
-                    )
+            if thresholds.tx_pwr_is_set:
+                qsfp_tx_power_alarm_max.add_metric(
+                    [port_label], thresholds.tx_pwr.highalarm
+                )
+                qsfp_tx_power_alarm_min.add_metric(
+                    [port_label], thresholds.tx_pwr.lowalarm
+                )
+                qsfp_tx_power_warning_max.add_metric(
+                    [port_label], thresholds.tx_pwr.highwarning
+                )
+                qsfp_tx_power_warning_min.add_metric(
+                    [port_label], thresholds.tx_pwr.lowwarning
+                )
+
+            for channel, channel_rx_power in enumerate(
+                readings.channel_rx_power
+            ):
+                qsfp_channel_rx_power.add_metric(
+                    [port_label, str(channel + 1)], channel_rx_power
+                )
+
+            for channel, channel_tx_power in enumerate(
+                readings.channel_tx_power
+            ):
+                qsfp_channel_tx_power.add_metric(
+                    [port_label, str(channel + 1)], channel_tx_power
+                )
 
         yield from [
             qsfp_connected,
@@ -336,3 +397,121 @@ class QSFPCollector(RpcCollectorBase):
             qsfp_voltage_warning_max,
             qsfp_voltage_warning_min,
         ]
+
+    def _read_qsfps(self, client, ports: list[int], results: list):
+        """
+        Append the readings of the QSFP of each port to ``results``, or
+        ``None`` if no QSFP is present.
+        """
+        for port in ports:
+            connected = self._read(client, "pltfm_mgr_qsfp_presence_get", port)
+            self._logger.debug("Port %d connected: %s", port, connected)
+            if not connected:
+                # Read everything again once a QSFP is plugged in
+                self._refresh_cache.invalidate(
+                    lambda key, port=port: key[1:] == (port,)
+                    and key[0] != "pltfm_mgr_qsfp_presence_get"
+                )
+                self._modules.invalidate(lambda key, port=port: key == port)
+                results.append((port, None))
+                continue
+
+            def read(method: str, port=port):
+                return self._read(client, method, port)
+
+            readings = _QSFPReadings(
+                module=self._read_module(
+                    client, port, read("pltfm_mgr_qsfp_info_get")
+                ),
+                temperature=read("pltfm_mgr_qsfp_temperature_get"),
+                voltage=read("pltfm_mgr_qsfp_voltage_get"),
+                channel_rx_power=read("pltfm_mgr_qsfp_chan_rx_pwr_get"),
+                channel_tx_power=read("pltfm_mgr_qsfp_chan_tx_pwr_get"),
+            )
+            self._adapt(port, readings)
+            results.append((port, readings))
+
+    def _read_module(self, client, port: int, info: str) -> _QSFPModule:
+        """
+        Get the static values of the module plugged into the QSFP cage of a
+        port, reading them again if its serial number changed.
+        """
+        offset, length = self.qsfp_info_byte_offsets["serial"]
+
+        def read_module() -> _QSFPModule:
+            # Another module, whose readings are not those cached
+            self._refresh_cache.invalidate(
+                lambda key: key[1:] == (port,)
+                and key[0]
+                not in [
+                    "pltfm_mgr_qsfp_presence_get",
+                    "pltfm_mgr_qsfp_info_get",
+                ]
+            )
+            return _QSFPModule(
+                labels=self._decode_info(info),
+                channel_count=client.pltfm_mgr_qsfp_chan_count_get(port),
+                thresholds=client.pltfm_mgr_qsfp_thresholds_get(port),
+            )
+
+        return self._modules.get(
+            port,
+            RefreshTier.STATIC,
+            read_module,
+            trigger=info[offset : offset + length],
+        )
+
+    def _decode_info(self, info: str) -> dict[str, str] | None:
+        """
+        Decode the labels of the information metric from the hex-encoded
+        information of a QSFP, or ``None`` if it cannot be decoded.
+        """
+        try:
+            return {
+                key: bytes.fromhex(info[offset : offset + length])
+                .decode()
+                .strip()
+                for key, (
+                    offset,
+                    length,
+                ) in self.qsfp_info_byte_offsets.items()
+            }
+        except (UnicodeDecodeError, ValueError):
+            self._logger.debug(
+                "Unable to decode QSFP serial number from hex string: %s",
+                info,
+            )
+            return None
+
+    def _adapt(self, port: int, readings: _QSFPReadings):
+        """
+        Adapt the refresh intervals of the readings of a QSFP to how they
+        change and how close they are to their thresholds.
+        """
+        for method, name, values in [
+            ("pltfm_mgr_qsfp_temperature_get", "temp", [readings.temperature]),
+            ("pltfm_mgr_qsfp_voltage_get", "vcc", [readings.voltage]),
+            (
+                "pltfm_mgr_qsfp_chan_rx_pwr_get",
+                "rx_pwr",
+                readings.channel_rx_power,
+            ),
+            (
+                "pltfm_mgr_qsfp_chan_tx_pwr_get",
+                "tx_pwr",
+                readings.channel_tx_power,
+            ),
+        ]:
+            thresholds = ()
+            if getattr(readings.module.thresholds, f"{name}_is_set"):
+                levels = getattr(readings.module.thresholds, name)
+                thresholds = (
+                    levels.lowalarm,
+                    levels.lowwarning,
+                    levels.highwarning,
+                    levels.highalarm,
+                )
+            self._refresh_cache.adapt(
+                (method, port),
+                [(value, thresholds) for value in values],
+            )
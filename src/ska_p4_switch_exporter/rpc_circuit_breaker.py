@@ -0,0 +1,143 @@
+# pylint: disable=too-many-instance-attributes
+
+"""
+Circuit breaker that stops calls to the Barefoot RPC server while it is
+unreachable.
+"""
+
+import enum
+import random
+import threading
+import time
+from typing import Callable
+
+__all__ = [
+    "CircuitBreaker",
+    "CircuitState",
+]
+
+
+class CircuitState(enum.Enum):
+    """
+    States of a :py:class:`CircuitBreaker`.
+    """
+
+    CLOSED = "closed"
+    """Calls are allowed."""
+
+    OPEN = "open"
+    """Calls are rejected until the backoff delay has passed."""
+
+    HALF_OPEN = "half_open"
+    """A single probing call is allowed to test whether the server is back."""
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker that stops calls to the Barefoot RPC server while it is
+    unreachable.
+
+    The breaker opens after ``failure_threshold`` consecutive failures.
+    While open, calls are rejected immediately. After a backoff delay, a
+    single probing call is let through: if it succeeds the breaker closes,
+    otherwise it opens again with twice the delay, up to ``backoff_max``.
+    Each delay is randomized by up to ``jitter`` (as a fraction of the
+    delay) so that several exporters do not probe in lockstep.
+    """
+
+    def __init__(
+        self,
+        failure_threshold: int = 3,
+        backoff_initial: float = 1.0,
+        backoff_max: float = 60.0,
+        jitter: float = 0.2,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._failure_threshold = failure_threshold
+        self._backoff_initial = backoff_initial
+        self._backoff_max = backoff_max
+        self._jitter = jitter
+        self._clock = clock
+
+        self._lock = threading.Lock()
+        self._state = CircuitState.CLOSED
+        self._consecutive_failures = 0
+        self._backoff = backoff_initial
+        self._retry_at = 0.0
+
+    @property
+    def state(self) -> CircuitState:
+        """
+        The current state of the breaker.
+        """
+        with self._lock:
+            return self._state
+
+    @property
+    def consecutive_failures(self) -> int:
+        """
+        The number of failures since the last successful call.
+        """
+        with self._lock:
+            return self._consecutive_failures
+
+    def allow(self) -> bool:
+        """
+        Check whether a call may be made.
+
+        When the backoff delay of an open breaker has passed, this moves
+        the breaker to half-open and allows exactly one call.
+        """
+        with self._lock:
+            if self._state is CircuitState.CLOSED:
+                return True
+
+            if (
+                self._state is CircuitState.OPEN
+                and self._clock() >= self._retry_at
+            ):
+                self._state = CircuitState.HALF_OPEN
+                return True
+
+            return False
+
+    def record_success(self):
+        """
+        Record a successful call, closing the breaker.
+        """
+        with self._lock:
+            self._state = CircuitState.CLOSED
+            self._consecutive_failures = 0
+            self._backoff = self._backoff_initial
+
+    def record_cancelled(self):
+        """
+        Record a call that was abandoned before its outcome was known.
+
+        This says nothing about the state of the server, so it leaves the
+        failure count alone. If the call was the probe of a half-open
+        breaker, the breaker reverts to open but allows the next call to
+        probe again right away.
+        """
+        with self._lock:
+            if self._state is CircuitState.HALF_OPEN:
+                self._state = CircuitState.OPEN
+                self._retry_at = self._clock()
+
+    def record_failure(self):
+        """
+        Record a failed call, opening the breaker if needed.
+        """
+        with self._lock:
+            self._consecutive_failures += 1
+
+            if self._state is CircuitState.HALF_OPEN:
+                self._backoff = min(self._backoff * 2, self._backoff_max)
+            elif self._consecutive_failures < self._failure_threshold:
+                return
+
+            self._state = CircuitState.OPEN
+            delay = self._backoff * random.uniform(
+                1 - self._jitter, 1 + self._jitter
+            )
+            self._retry_at = self._clock() + delay
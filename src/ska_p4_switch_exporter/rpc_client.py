@@ -0,0 +1,289 @@
+# pylint: disable=import-error
+
+"""
+Proxy around a generated Barefoot RPC client.
+"""
+
+import contextlib
+import functools
+import time
+from dataclasses import astuple
+
+from thrift.transport import TTransport
+
+from ska_exporter_common import deadline
+from ska_exporter_common.call_trace import TraceWriter
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_p4_switch_exporter.rpc_instrumentation import RpcInstrumentation
+
+__all__ = [
+    "CONNECTION_ERRORS",
+    "RpcClient",
+    "RpcSequenceError",
+]
+
+
+class RpcSequenceError(OSError):
+    """
+    Error raised when a reply does not belong to the request it is read
+    for, which means the connection can no longer be used.
+    """
+
+
+# Errors that leave the connection in an unknown state, as opposed to errors
+# reported by the RPC server after which the connection can still be used
+CONNECTION_ERRORS = (
+    TTransport.TTransportException,
+    OSError,
+    EOFError,
+    DeadlineExceededError,
+)
+
+
+class _ReplyTracker:
+    """
+    Protocol decorator that remembers the sequence id of the last message
+    read.
+    """
+
+    def __init__(self, protocol):
+        self._protocol = protocol
+        self.seqid = None
+
+    def __getattr__(self, name: str):
+        return getattr(self._protocol, name)
+
+    def readMessageBegin(self):  # pylint: disable=invalid-name
+        """
+        Read the header of a message, remembering its sequence id.
+        """
+        name, message_type, seqid = self._protocol.readMessageBegin()
+        self.seqid = seqid
+        return name, message_type, seqid
+
+
+class RpcClient:
+    """
+    Proxy around a generated Barefoot RPC client.
+
+    Calls are forwarded to the wrapped client, bounded by the current
+    :py:mod:`deadline <ska_exporter_common.deadline>`: no call is made
+    once the deadline has passed, and the socket timeout of each call is
+    lowered to the time remaining. A call that fails because the deadline
+    passed while it was in progress raises a
+    :py:class:`DeadlineExceededError` instead of a transport error, and
+    closes the connection, since its reply may still arrive later.
+
+    Several calls can be made in a single round trip with
+    :py:meth:`pipeline`.
+
+    If an :py:class:`RpcInstrumentation` is given, the duration, outcome
+    and size on the wire of each call are recorded with it. If a
+    :py:class:`TraceWriter` is given, each call is written to its trace,
+    along with its arguments and result.
+    """
+
+    def __init__(
+        self,
+        client,
+        connection,
+        endpoint: str,
+        instrumentation: RpcInstrumentation | None = None,
+        recorder: TraceWriter | None = None,
+    ):
+        self._client = client
+        self._connection = connection
+        self._endpoint = endpoint
+        self._instrumentation = instrumentation
+        self._recorder = recorder
+
+    def __getattr__(self, name: str):
+        method = getattr(self._client, name)
+        if not callable(method):
+            return method
+
+        @functools.wraps(method)
+        def call(*args, **kwargs):
+            with self._bounded_by_deadline(name):
+                return method(*args, **kwargs)
+
+        if self._recorder is not None:
+            call = self._record(name, call)
+        if self._instrumentation is not None:
+            call = self._instrument(name, call)
+
+        # Cache the wrapper, so that this method is only called once per name
+        setattr(self, name, call)
+        return call
+
+    def pipeline(self, calls: list[tuple[str, tuple]]) -> list:
+        """
+        Make several calls in a single round trip.
+
+        All requests are written before any reply is read, each with its
+        own increasing sequence id. The replies are then read in the same
+        order, and checked against the sequence ids of the requests. This
+        relies on the server handling the requests of a connection in
+        order, which Thrift servers do.
+
+        Returns the result of each call, in order. An error reported by
+        the RPC server for an individual call is returned in place of its
+        result, so that one failing call does not lose the results of the
+        others. If the wrapped client cannot split calls into requests and
+        replies, the calls are made one after the other.
+
+        :param calls: ``(method, args)`` tuples of the calls to make
+        """
+        if len(calls) < 2 or not all(
+            hasattr(self._client, f"send_{name}") for name, _ in calls
+        ):
+            return [self._call_capturing_errors(*call) for call in calls]
+
+        counter = self._connection.byte_counter
+        sent, received = (0, 0) if counter is None else astuple(counter)
+        start = time.perf_counter()
+        recorded_start = (
+            None if self._recorder is None else self._recorder.clock()
+        )
+
+        with self._bounded_by_deadline(f"pipeline of {len(calls)} calls"):
+            results = self._pipeline(calls)
+
+        # Calls in a batch overlap on the wire, so their cost is shared
+        share = 1 / len(calls)
+        if self._recorder is not None:
+            duration = (self._recorder.clock() - recorded_start) * share
+            for (name, args), result in zip(calls, results):
+                self._recorder.record(
+                    self._endpoint,
+                    name,
+                    args,
+                    recorded_start,
+                    duration,
+                    result,
+                )
+        if self._instrumentation is not None:
+            duration = (time.perf_counter() - start) * share
+            for (name, _), result in zip(calls, results):
+                self._instrumentation.record_call(
+                    self._endpoint,
+                    name,
+                    duration,
+                    isinstance(result, Exception),
+                    int((counter.sent - sent) * share),
+                    int((counter.received - received) * share),
+                )
+        return results
+
+    def _pipeline(self, calls: list[tuple[str, tuple]]) -> list:
+        # pylint: disable=protected-access
+        client = self._client
+        iprot = getattr(client, "_iprot", None)
+        tracker = None if iprot is None else _ReplyTracker(iprot)
+
+        try:
+            for seqid, (name, args) in enumerate(calls):
+                client._seqid = seqid
+                getattr(client, f"send_{name}")(*args)
+
+            if tracker is not None:
+                client._iprot = tracker
+
+            results = []
+            for seqid, (name, _) in enumerate(calls):
+                try:
+                    result = getattr(client, f"recv_{name}")()
+                except CONNECTION_ERRORS:
+                    raise
+                except Exception as exc:  # pylint: disable=broad-except
+                    result = exc
+
+                if tracker is not None and tracker.seqid != seqid:
+                    raise RpcSequenceError(
+                        f"Expected reply {seqid} for {name},"
+                        f" got reply {tracker.seqid}"
+                    )
+                results.append(result)
+            return results
+        finally:
+            client._seqid = 0
+            if tracker is not None:
+                client._iprot = iprot
+
+    def _call_capturing_errors(self, name: str, args: tuple):
+        try:
+            return getattr(self, name)(*args)
+        except CONNECTION_ERRORS:
+            raise
+        except Exception as exc:  # pylint: disable=broad-except
+            return exc
+
+    @contextlib.contextmanager
+    def _bounded_by_deadline(self, description: str):
+        call_deadline = deadline.current()
+        call_deadline.check()
+        self._connection.apply_deadline(call_deadline)
+        try:
+            yield
+        except (TTransport.TTransportException, OSError) as exc:
+            if call_deadline.expired():
+                self._connection.close()
+                raise DeadlineExceededError(
+                    f"Deadline exceeded during {description}"
+                ) from exc
+            raise
+
+    def _record(self, name: str, call):
+        recorder = self._recorder
+
+        @functools.wraps(call)
+        def recorded_call(*args):
+            start = recorder.clock()
+            try:
+                value = call(*args)
+            except Exception as exc:
+                recorder.record(
+                    self._endpoint,
+                    name,
+                    args,
+                    start,
+                    recorder.clock() - start,
+                    exc,
+                )
+                raise
+            recorder.record(
+                self._endpoint,
+                name,
+                args,
+                start,
+                recorder.clock() - start,
+                value,
+            )
+            return value
+
+        return recorded_call
+
+    def _instrument(self, name: str, call):
+        instrumentation = self._instrumentation
+        counter = self._connection.byte_counter
+
+        @functools.wraps(call)
+        def instrumented_call(*args, **kwargs):
+            sent, received = counter.sent, counter.received
+            start = time.perf_counter()
+            error = True
+            try:
+                result = call(*args, **kwargs)
+                error = False
+                return result
+            finally:
+                instrumentation.record_call(
+                    self._endpoint,
+                    name,
+                    time.perf_counter() - start,
+                    error,
+                    counter.sent - sent,
+                    counter.received - received,
+                )
+
+        return instrumented_call
@@ -1,6 +1,7 @@
 # pylint: disable=import-error
 # pylint: disable=too-few-public-methods
 # pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
 # pylint: disable=too-many-positional-arguments
 
 """
@@ -10,12 +11,24 @@ Barefoot RPC client.
 
 import abc
 import contextlib
+import contextvars
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from types import ModuleType
 
 from prometheus_client.registry import Collector
-from thrift.protocol import TBinaryProtocol, TMultiplexedProtocol
-from thrift.transport import TSocket, TTransport
+
+from ska_exporter_common import outcome
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_exporter_common.refresh import (
+    RefreshCache,
+    RefreshIntervals,
+    RefreshTier,
+)
+from ska_p4_switch_exporter.rpc_connection_pool import (
+    RpcConnectionPool,
+    RpcUnavailableError,
+)
 
 __all__ = [
     "RpcCollectorBase",
@@ -26,8 +39,34 @@ class RpcCollectorBase(Collector, abc.ABC):
     """
     Abstract base class for collectors exporting metrics using a
     Barefoot RPC client.
+
+    Connections to the RPC server are borrowed from a
+    :py:class:`RpcConnectionPool`, so they are kept open between scrapes.
+    If no pool is given, the collector creates a private one.
+
+    Subclasses implement :py:meth:`_collect`. If the RPC server cannot be
+    reached, the collector yields no metrics instead of failing the scrape;
+    the pool reports the state of the RPC server separately. If the
+    deadline of the scrape passes while the RPC client is in use, the
+    remaining calls are abandoned and the collector yields the metrics
+    collected until then. Either way, the collection is reported as failed
+    or partial with :py:mod:`ska_exporter_common.outcome`.
+
+    With a ``concurrency`` greater than 1, subclasses can spread their
+    calls over that many connections and worker threads with
+    :py:meth:`_fan_out`. The pool should then allow at least as many
+    connections; a private pool is sized accordingly.
+
+    Subclasses assign the RPC methods they call to a
+    :py:class:`RefreshTier` in :py:attr:`refresh_tiers`, and call them
+    with :py:meth:`_read`. Given ``refresh_intervals``, the results of
+    these calls are then reused until they are older than the interval of
+    their tier. Without, every call is made on every collection.
     """
 
+    refresh_tiers: dict[str, RefreshTier] = {}
+    """Refresh tier of each RPC method, fast if not listed."""
+
     def __init__(
         self,
         rpc_host: str,
@@ -35,42 +74,154 @@ class RpcCollectorBase(Collector, abc.ABC):
         rpc_endpoint: str,
         rpc_module: ModuleType,
         logger: logging.Logger,
+        connection_pool: RpcConnectionPool | None = None,
+        concurrency: int = 1,
+        refresh_intervals: RefreshIntervals | None = None,
     ):
         self._rpc_host = rpc_host
         self._rpc_port = rpc_port
         self._rpc_endpoint = rpc_endpoint
         self._rpc_module = rpc_module
         self._logger = logger
+        self._connection_pool = connection_pool or RpcConnectionPool(
+            rpc_host=rpc_host,
+            rpc_port=rpc_port,
+            max_connections=concurrency,
+            logger=logger,
+        )
+        self._executor = (
+            ThreadPoolExecutor(
+                max_workers=concurrency,
+                thread_name_prefix=self.__class__.__name__,
+            )
+            if concurrency > 1
+            else None
+        )
+        self._refresh_cache = RefreshCache(refresh_intervals)
 
     @contextlib.contextmanager
     def _get_rpc_client(self):
-        transport = None
-
+        connected = False
         try:
-            self._logger.debug(
-                "Creating RPC transport to %s:%d",
-                self._rpc_host,
-                self._rpc_port,
+            with self._connection_pool.connection() as connection:
+                connected = True
+                yield connection.client(self._rpc_endpoint, self._rpc_module)
+        except DeadlineExceededError as exc:
+            if not connected:
+                raise
+            self._logger.warning(
+                "%s returning partial results: %s",
+                self.__class__.__name__,
+                exc,
             )
-            transport = TSocket.TSocket(self._rpc_host, self._rpc_port)
-            transport.setTimeout(5000)
-            transport = TTransport.TBufferedTransport(transport)
+            outcome.report_partial(str(exc))
 
-            self._logger.debug("Opening RPC transport")
-            transport.open()
+    def _read(self, client, method: str, *args, trigger=None):
+        """
+        Call an RPC method, unless its result for the same arguments and
+        trigger is still fresh according to its refresh tier.
+        """
+        return self._refresh_cache.get(
+            (method, *args),
+            self.refresh_tiers.get(method, RefreshTier.FAST),
+            lambda: getattr(client, method)(*args),
+            trigger,
+        )
 
-            self._logger.debug(
-                "Creating RPC client for endpoint: %s",
-                self._rpc_endpoint,
+    def _read_pipelined(self, client, calls: list[tuple[str, tuple]]) -> list:
+        """
+        Pipeline the calls whose results are not fresh according to their
+        refresh tier, returning the results of all calls like
+        :py:meth:`RpcClient.pipeline`.
+        """
+        keys = [(method, *args) for method, args in calls]
+        results = [
+            self._refresh_cache.lookup(
+                key, self.refresh_tiers.get(key[0], RefreshTier.FAST)
             )
-            client = self._rpc_module.Client(
-                TMultiplexedProtocol.TMultiplexedProtocol(
-                    TBinaryProtocol.TBinaryProtocol(transport),
-                    self._rpc_endpoint,
+            for key in keys
+        ]
+        missing = [
+            i
+            for i, result in enumerate(results)
+            if result is RefreshCache.MISSING
+        ]
+        if missing:
+            replies = client.pipeline([calls[i] for i in missing])
+            for i, reply in zip(missing, replies):
+                results[i] = reply
+                if not isinstance(reply, Exception):
+                    self._refresh_cache.store(keys[i], reply)
+        return results
+
+    def _fan_out(self, work, batches: list[list]) -> list:
+        """
+        Call ``work(client, batch, results)`` for each batch of items,
+        where ``work`` appends the results for the items of the batch to
+        ``results``.
+
+        Without concurrency, the batches are processed one after the other
+        with the same client. Otherwise, they are processed by the worker
+        threads as they become free, each batch with a client borrowed for
+        it alone, so that a batch that is slow to process only holds up
+        one worker.
+
+        Returns the results of all batches, in the order of the batches.
+        Batches that could not be processed before the deadline of the
+        scrape contribute the results appended until then, if any.
+        """
+        if self._executor is None:
+            results = []
+            with self._get_rpc_client() as client:
+                for batch in batches:
+                    work(client, batch, results)
+            return results
+
+        def process(batch):
+            results = []
+            try:
+                with self._get_rpc_client() as client:
+                    work(client, batch, results)
+            except DeadlineExceededError:
+                # Not even connected in time, no need to warn for each batch
+                self._logger.debug(
+                    "%s skipping batch: deadline exceeded",
+                    self.__class__.__name__,
                 )
-            )
-            yield client
+                outcome.report_partial("Deadline exceeded")
+            return results
+
+        # Each batch runs in its own copy of the context, for the deadline
+        futures = [
+            self._executor.submit(contextvars.copy_context().run, process, b)
+            for b in batches
+        ]
+        results = []
+        try:
+            for future in futures:
+                results.extend(future.result())
         finally:
-            if transport is not None:
-                self._logger.debug("Disconnecting from RPC")
-                transport.close()
+            for future in futures:
+                future.cancel()
+        return results
+
+    def collect(self):
+        try:
+            metrics = list(self._collect())
+        except RpcUnavailableError as exc:
+            self._logger.debug("Skipping %s: %s", self.__class__.__name__, exc)
+            outcome.report_failed(str(exc))
+            return
+        except DeadlineExceededError as exc:
+            self._logger.warning(
+                "Skipping %s: %s", self.__class__.__name__, exc
+            )
+            outcome.report_failed(str(exc))
+            return
+        yield from metrics
+
+    @abc.abstractmethod
+    def _collect(self):
+        """
+        Collect the metrics of this collector.
+        """
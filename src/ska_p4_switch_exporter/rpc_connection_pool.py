@@ -0,0 +1,450 @@
+# pylint: disable=import-error
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-instance-attributes
+# pylint: disable=too-many-positional-arguments
+
+"""
+Pool of long-lived connections to a Barefoot RPC server.
+"""
+
+import contextlib
+import logging
+import select
+import socket
+import threading
+import time
+from types import ModuleType
+
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+from prometheus_client.registry import Collector, CollectorRegistry
+from thrift.protocol import TMultiplexedProtocol
+from thrift.transport import TTransport
+
+from ska_exporter_common import deadline
+from ska_exporter_common.call_trace import TraceWriter
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_p4_switch_exporter.rpc_circuit_breaker import (
+    CircuitBreaker,
+    CircuitState,
+)
+from ska_p4_switch_exporter.rpc_client import RpcClient
+from ska_p4_switch_exporter.rpc_instrumentation import RpcInstrumentation
+from ska_p4_switch_exporter.rpc_transport import (
+    ByteCounter,
+    RpcTransportFactory,
+)
+
+__all__ = [
+    "RpcConnection",
+    "RpcConnectionPool",
+    "RpcUnavailableError",
+]
+
+
+class RpcUnavailableError(RuntimeError):
+    """
+    Error raised when the Barefoot RPC server cannot be reached, or when
+    calls are rejected because the server was found to be unreachable.
+    """
+
+
+def _is_connection_error(exc: BaseException) -> bool:
+    return isinstance(exc, (TTransport.TTransportException, OSError, EOFError))
+
+
+class RpcConnection:
+    """
+    A single transport to a Barefoot RPC server.
+
+    The transport is endpoint-agnostic: clients for a specific endpoint are
+    created on top of it using a multiplexed protocol, and are reused for as
+    long as the transport stays open.
+
+    If an :py:class:`RpcInstrumentation` is given, the bytes sent and
+    received on the transport are counted, and the calls of the clients
+    are recorded with it. If a :py:class:`TraceWriter` is given, the calls
+    of the clients are written to its trace.
+    """
+
+    def __init__(
+        self,
+        rpc_host: str,
+        rpc_port: int,
+        transport_factory: RpcTransportFactory,
+        logger: logging.Logger,
+        instrumentation: RpcInstrumentation | None = None,
+        recorder: TraceWriter | None = None,
+    ):
+        self._rpc_host = rpc_host
+        self._rpc_port = rpc_port
+        self._transport_factory = transport_factory
+        self._logger = logger
+        self._instrumentation = instrumentation
+        self._recorder = recorder
+        self.byte_counter = None if instrumentation is None else ByteCounter()
+        self._socket = None
+        self._transport = None
+        self._protocol = None
+        self._timeout_ms = None
+        self._clients = {}
+
+    def open(self):
+        """
+        Open the transport to the RPC server.
+        """
+        self._logger.debug(
+            "Creating RPC transport to %s:%d",
+            self._rpc_host,
+            self._rpc_port,
+        )
+        self._socket, self._transport = self._transport_factory.open_transport(
+            self._rpc_host,
+            self._rpc_port,
+            counter=self.byte_counter,
+        )
+        self._protocol = self._transport_factory.create_protocol(
+            self._transport
+        )
+        self._timeout_ms = self._transport_factory.timeout_ms
+
+    def close(self):
+        """
+        Close the transport to the RPC server, ignoring any errors.
+        """
+        if self._transport is None:
+            return
+
+        self._logger.debug("Disconnecting from RPC")
+        try:
+            self._transport.close()
+        except Exception:  # pylint: disable=broad-exception-caught
+            self._logger.debug("Error while closing transport", exc_info=True)
+        finally:
+            self._socket = None
+            self._transport = None
+            self._protocol = None
+            self._timeout_ms = None
+            self._clients = {}
+
+    def apply_deadline(self, call_deadline: deadline.Deadline):
+        """
+        Lower the socket timeout so that the next call does not outlive
+        the given deadline.
+        """
+        timeout_ms = self._transport_factory.timeout_ms
+        if call_deadline.bounded:
+            timeout_ms = max(
+                min(timeout_ms, int(call_deadline.remaining() * 1000)), 1
+            )
+        if self._socket is not None and timeout_ms != self._timeout_ms:
+            self._socket.setTimeout(timeout_ms)
+            self._timeout_ms = timeout_ms
+
+    def is_alive(self) -> bool:
+        """
+        Check whether the connection can still be used.
+
+        An idle connection should never have anything to read. If the socket
+        is readable, the server either closed the connection or sent data
+        nobody asked for; in both cases the connection is unusable. This
+        check does not perform any I/O and never blocks.
+        """
+        if self._transport is None or not self._transport.isOpen():
+            return False
+
+        handle = getattr(self._socket, "handle", None)
+        if not isinstance(handle, socket.socket):
+            return True
+
+        try:
+            readable, _, _ = select.select([handle], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def client(self, rpc_endpoint: str, rpc_module: ModuleType):
+        """
+        Get the client for the given endpoint on top of this connection.
+        """
+        client = self._clients.get(rpc_endpoint)
+        if client is None:
+            self._logger.debug(
+                "Creating RPC client for endpoint: %s", rpc_endpoint
+            )
+            client = RpcClient(
+                rpc_module.Client(
+                    TMultiplexedProtocol.TMultiplexedProtocol(
+                        self._protocol,
+                        rpc_endpoint,
+                    )
+                ),
+                self,
+                rpc_endpoint,
+                self._instrumentation,
+                self._recorder,
+            )
+            self._clients[rpc_endpoint] = client
+        return client
+
+
+class RpcConnectionPool(Collector):
+    """
+    Pool of long-lived connections to a Barefoot RPC server.
+
+    Connections are kept open between scrapes and checked for liveness
+    before being handed out. Connections that turn out to be broken are
+    transparently replaced with new ones.
+
+    A connection is only ever borrowed by one caller at a time, which
+    serializes the requests of all collectors sharing it. The pool opens
+    at most ``max_connections`` connections; further callers wait until a
+    connection is returned. With the default of a single connection, all
+    collectors share one socket to the RPC server.
+
+    Connection errors are tracked by a :py:class:`CircuitBreaker`. Once
+    the server is considered unreachable, connections are refused
+    immediately with a :py:class:`RpcUnavailableError` instead of waiting
+    for the transport to time out, until a probing call succeeds again.
+
+    If an :py:class:`RpcInstrumentation` is given, connection attempts and
+    the calls made on the pooled connections are recorded with it. If a
+    :py:class:`TraceWriter` is given, the calls made on the pooled
+    connections are written to its trace.
+
+    Waiting for a connection is bounded by the current
+    :py:mod:`deadline <ska_exporter_common.deadline>`. A call abandoned
+    because of its deadline neither opens nor closes the breaker.
+
+    The pool is also a Prometheus collector exposing its own statistics,
+    so it can be registered with the registry serving the RPC collectors.
+    """
+
+    def __init__(
+        self,
+        rpc_host: str,
+        rpc_port: int,
+        transport_factory: RpcTransportFactory | None = None,
+        max_connections: int = 1,
+        circuit_breaker: CircuitBreaker | None = None,
+        instrumentation: RpcInstrumentation | None = None,
+        logger: logging.Logger | None = None,
+        registry: CollectorRegistry | None = None,
+        recorder: TraceWriter | None = None,
+    ):
+        self._rpc_host = rpc_host
+        self._rpc_port = rpc_port
+        self._transport_factory = transport_factory or RpcTransportFactory()
+        self._max_connections = max_connections
+        self._circuit_breaker = circuit_breaker or CircuitBreaker()
+        self._instrumentation = instrumentation
+        self._recorder = recorder
+        self._logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Condition()
+        self._idle: list[RpcConnection] = []
+        self._in_use = 0
+        self._opened_total = 0
+        self._reconnects_total = 0
+
+        if registry:
+            self._logger.info("Registering %s", self.__class__.__name__)
+            registry.register(self)
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrow a connection from the pool for the duration of the context.
+
+        If an error is raised while the connection is borrowed, the
+        connection is discarded instead of returned to the pool, because
+        the error may have left unread data on the wire. Connection errors
+        are re-raised as :py:class:`RpcUnavailableError`. If the current
+        deadline passes while waiting for a connection, a
+        :py:class:`DeadlineExceededError` is raised.
+        """
+        if not self._circuit_breaker.allow():
+            raise RpcUnavailableError(
+                f"RPC server {self._rpc_host}:{self._rpc_port}"
+                " is unreachable, not attempting to connect"
+            )
+
+        try:
+            connection = self._acquire()
+        except BaseException as exc:
+            self._record_result(exc)
+            if _is_connection_error(exc):
+                raise RpcUnavailableError(
+                    f"Unable to connect to RPC server"
+                    f" {self._rpc_host}:{self._rpc_port}"
+                ) from exc
+            raise
+
+        try:
+            yield connection
+        except DeadlineExceededError as exc:
+            # The connection is closed if the deadline interrupted a call,
+            # otherwise it is still usable
+            self._release(connection)
+            self._record_result(exc)
+            raise
+        except BaseException as exc:
+            self._discard(connection)
+            self._record_result(exc)
+            if _is_connection_error(exc):
+                raise RpcUnavailableError(
+                    f"Connection to RPC server"
+                    f" {self._rpc_host}:{self._rpc_port} failed"
+                ) from exc
+            raise
+        self._release(connection)
+        self._record_result(None)
+
+    def close(self):
+        """
+        Close all idle connections.
+        """
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            connection.close()
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "p4_switch_exporter_rpc_pool_connections",
+            "Number of open connections in the RPC connection pool",
+        )
+        connections_in_use = GaugeMetricFamily(
+            "p4_switch_exporter_rpc_pool_connections_in_use",
+            "Number of connections currently borrowed from the"
+            " RPC connection pool",
+        )
+        connections_opened = CounterMetricFamily(
+            "p4_switch_exporter_rpc_connections_opened",
+            "Number of connections opened to the RPC server",
+        )
+        up = GaugeMetricFamily(
+            "p4_switch_exporter_rpc_up",
+            "Whether the RPC server was reachable on the last attempt",
+        )
+        circuit_breaker_open = GaugeMetricFamily(
+            "p4_switch_exporter_rpc_circuit_breaker_open",
+            "Whether calls to the RPC server are currently being rejected"
+            " because it was found to be unreachable",
+        )
+        consecutive_failures = GaugeMetricFamily(
+            "p4_switch_exporter_rpc_consecutive_failures",
+            "Number of consecutive failed attempts to use the RPC server",
+        )
+        reconnects = CounterMetricFamily(
+            "p4_switch_exporter_rpc_reconnects",
+            "Number of broken connections to the RPC server"
+            " that had to be replaced",
+        )
+
+        with self._lock:
+            connections.add_metric([], len(self._idle) + self._in_use)
+            connections_in_use.add_metric([], self._in_use)
+            connections_opened.add_metric([], self._opened_total)
+            reconnects.add_metric([], self._reconnects_total)
+
+        failures = self._circuit_breaker.consecutive_failures
+        up.add_metric([], 0 if failures else 1)
+        circuit_breaker_open.add_metric(
+            [],
+            self._circuit_breaker.state is not CircuitState.CLOSED,
+        )
+        consecutive_failures.add_metric([], failures)
+
+        yield from [
+            up,
+            circuit_breaker_open,
+            consecutive_failures,
+            connections,
+            connections_in_use,
+            connections_opened,
+            reconnects,
+        ]
+
+    def _acquire(self) -> RpcConnection:
+        call_deadline = deadline.current()
+        with self._lock:
+            while not self._idle and self._in_use >= self._max_connections:
+                call_deadline.check()
+                self._logger.debug("Waiting for an RPC connection")
+                self._lock.wait(
+                    call_deadline.remaining()
+                    if call_deadline.bounded
+                    else None
+                )
+
+            self._in_use += 1
+            connection = self._idle.pop() if self._idle else None
+
+        if connection is not None:
+            if connection.is_alive():
+                return connection
+
+            self._logger.info(
+                "RPC connection is no longer alive, reconnecting"
+            )
+            connection.close()
+            with self._lock:
+                self._reconnects_total += 1
+
+        connection = RpcConnection(
+            self._rpc_host,
+            self._rpc_port,
+            self._transport_factory,
+            self._logger,
+            self._instrumentation,
+            self._recorder,
+        )
+        start = time.perf_counter()
+        try:
+            connection.open()
+        except BaseException:
+            self._record_connect(start, error=True)
+            connection.close()
+            with self._lock:
+                self._in_use -= 1
+                self._lock.notify()
+            raise
+        self._record_connect(start, error=False)
+
+        with self._lock:
+            self._opened_total += 1
+        return connection
+
+    def _record_connect(self, start: float, error: bool):
+        if self._instrumentation is not None:
+            self._instrumentation.record_connect(
+                time.perf_counter() - start, error
+            )
+
+    def _release(self, connection: RpcConnection):
+        with self._lock:
+            self._in_use -= 1
+            self._idle.append(connection)
+            self._lock.notify()
+
+    def _discard(self, connection: RpcConnection):
+        self._logger.debug("Discarding RPC connection after error")
+        connection.close()
+        with self._lock:
+            self._in_use -= 1
+            self._reconnects_total += 1
+            self._lock.notify()
+
+    def _record_result(self, exc: BaseException | None):
+        if isinstance(exc, DeadlineExceededError):
+            self._circuit_breaker.record_cancelled()
+        elif exc is not None and _is_connection_error(exc):
+            self._logger.warning(
+                "Error while communicating with RPC server %s:%d: %s",
+                self._rpc_host,
+                self._rpc_port,
+                exc,
+            )
+            self._circuit_breaker.record_failure()
+        else:
+            self._circuit_breaker.record_success()
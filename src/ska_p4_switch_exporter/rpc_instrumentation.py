@@ -0,0 +1,211 @@
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-positional-arguments
+
+"""
+Statistics about the calls made to the Barefoot RPC server.
+"""
+
+import bisect
+import logging
+import math
+import threading
+
+from prometheus_client.core import (
+    CounterMetricFamily,
+    HistogramMetricFamily,
+)
+from prometheus_client.registry import Collector, CollectorRegistry
+from prometheus_client.utils import floatToGoString
+
+__all__ = [
+    "DEFAULT_BUCKETS",
+    "RpcInstrumentation",
+]
+
+DEFAULT_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+"""
+Upper bounds in seconds of the buckets of the RPC duration histograms.
+"""
+
+
+class _Histogram:
+    """
+    Histogram of durations, without any locking of its own.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self._buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """
+        Add an observation to the histogram.
+        """
+        self.counts[bisect.bisect_left(self._buckets, value)] += 1
+        self.sum += value
+
+    def cumulative_buckets(self) -> list[tuple[str, int]]:
+        """
+        Get the cumulative bucket counts, keyed by upper bound.
+        """
+        buckets = []
+        total = 0
+        for bound, count in zip((*self._buckets, math.inf), self.counts):
+            total += count
+            buckets.append((floatToGoString(bound), total))
+        return buckets
+
+
+class _MethodStats:
+    """
+    Statistics about the calls of a single RPC method.
+    """
+
+    def __init__(self, buckets: tuple[float, ...]):
+        self.duration = _Histogram(buckets)
+        self.errors = 0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+
+
+class RpcInstrumentation(Collector):
+    """
+    Statistics about the calls made to the Barefoot RPC server.
+
+    The :py:class:`~ska_p4_switch_exporter.rpc_client.RpcClient` proxies
+    record the duration, outcome and size on the wire of every call, per
+    endpoint and method, and the connection pool records how long it takes
+    to connect. Recording a call takes a lock and a few additions; when no
+    instrumentation is given to the pool, nothing is recorded at all.
+    """
+
+    def __init__(
+        self,
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+        logger: logging.Logger | None = None,
+        registry: CollectorRegistry | None = None,
+    ):
+        self._buckets = tuple(sorted(buckets))
+        self._logger = logger or logging.getLogger(__name__)
+
+        self._lock = threading.Lock()
+        self._methods: dict[tuple[str, str], _MethodStats] = {}
+        self._connect = _MethodStats(self._buckets)
+
+        if registry:
+            self._logger.info("Registering %s", self.__class__.__name__)
+            registry.register(self)
+
+    def record_call(
+        self,
+        endpoint: str,
+        method: str,
+        duration: float,
+        error: bool,
+        bytes_sent: int = 0,
+        bytes_received: int = 0,
+    ):
+        """
+        Record a call to an RPC method.
+        """
+        with self._lock:
+            stats = self._methods.get((endpoint, method))
+            if stats is None:
+                stats = self._methods[endpoint, method] = _MethodStats(
+                    self._buckets
+                )
+            self._record(stats, duration, error)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def record_connect(self, duration: float, error: bool):
+        """
+        Record an attempt to connect to the RPC server.
+        """
+        with self._lock:
+            self._record(self._connect, duration, error)
+
+    def collect(self):
+        duration = HistogramMetricFamily(
+            "p4_switch_exporter_rpc_duration_seconds",
+            "Duration of calls to the RPC server",
+            labels=["endpoint", "method"],
+        )
+        calls = CounterMetricFamily(
+            "p4_switch_exporter_rpc_calls",
+            "Number of calls to the RPC server",
+            labels=["endpoint", "method"],
+        )
+        errors = CounterMetricFamily(
+            "p4_switch_exporter_rpc_errors",
+            "Number of calls to the RPC server that raised an error,"
+            " including errors reported by the RPC server itself",
+            labels=["endpoint", "method"],
+        )
+        sent = CounterMetricFamily(
+            "p4_switch_exporter_rpc_sent_bytes",
+            "Number of bytes sent to the RPC server",
+            labels=["endpoint", "method"],
+        )
+        received = CounterMetricFamily(
+            "p4_switch_exporter_rpc_received_bytes",
+            "Number of bytes received from the RPC server",
+            labels=["endpoint", "method"],
+        )
+        connect_duration = HistogramMetricFamily(
+            "p4_switch_exporter_rpc_connect_duration_seconds",
+            "Duration of attempts to connect to the RPC server",
+        )
+        connect_errors = CounterMetricFamily(
+            "p4_switch_exporter_rpc_connect_errors",
+            "Number of failed attempts to connect to the RPC server",
+        )
+
+        with self._lock:
+            for (endpoint, method), stats in sorted(self._methods.items()):
+                labels = [endpoint, method]
+                buckets = stats.duration.cumulative_buckets()
+                duration.add_metric(labels, buckets, stats.duration.sum)
+                calls.add_metric(labels, buckets[-1][1])
+                errors.add_metric(labels, stats.errors)
+                sent.add_metric(labels, stats.bytes_sent)
+                received.add_metric(labels, stats.bytes_received)
+
+            connect_duration.add_metric(
+                [],
+                self._connect.duration.cumulative_buckets(),
+                self._connect.duration.sum,
+            )
+            connect_errors.add_metric([], self._connect.errors)
+
+        yield from [
+            duration,
+            calls,
+            errors,
+            sent,
+            received,
+            connect_duration,
+            connect_errors,
+        ]
+
+    @staticmethod
+    def _record(stats: _MethodStats, duration: float, error: bool):
+        stats.duration.observe(duration)
+        if error:
+            stats.errors += 1
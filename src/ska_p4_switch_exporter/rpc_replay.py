@@ -0,0 +1,174 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Replay of recorded Barefoot RPC calls.
+"""
+
+import contextlib
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from types import ModuleType
+
+from ska_exporter_common import deadline
+from ska_exporter_common.call_trace import (
+    CallRecord,
+    TraceError,
+    encode_value,
+)
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_p4_switch_exporter.rpc_connection_pool import RpcUnavailableError
+
+__all__ = [
+    "RpcReplayError",
+    "RpcReplayPool",
+]
+
+
+class RpcReplayError(LookupError):
+    """
+    Error raised when a call that is not in the trace is replayed.
+    """
+
+
+class RpcReplayPool:
+    """
+    Stand-in for an :py:class:`RpcConnectionPool` that answers the calls of
+    the collectors from a trace recorded with
+    :py:class:`~ska_exporter_common.call_trace.TraceWriter`, instead of
+    calling a Barefoot RPC server.
+
+    Each call is answered with the next recorded reply to the same method
+    and arguments, starting over once all of them have been replayed, so
+    that the calls can be made in any order, e.g. by concurrent collectors.
+    Recorded RPC errors are raised again as the exception of the RPC
+    module with the same name; recorded connection errors are raised as
+    :py:class:`RpcUnavailableError`, like the pool does.
+
+    With a ``speed`` greater than 0, each call takes its recorded duration
+    divided by ``speed``, e.g. 1 for real time or 10 for ten times faster.
+    With a ``speed`` of 0, calls return immediately. Like real calls, no
+    call is replayed once the current
+    :py:mod:`deadline <ska_exporter_common.deadline>` has passed.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[CallRecord],
+        speed: float = 0.0,
+        logger: logging.Logger | None = None,
+    ):
+        self._speed = speed
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._replies: dict[tuple, list[CallRecord]] = {}
+        self._next: dict[tuple, int] = {}
+        for record in records:
+            key = _call_key(record.source, record.method, record.args)
+            self._replies.setdefault(key, []).append(record)
+        self._logger.debug(
+            "Replaying %d distinct RPC calls", len(self._replies)
+        )
+
+    @contextlib.contextmanager
+    def connection(self):
+        """
+        Borrow a connection for the duration of the context.
+        """
+        yield _ReplayConnection(self)
+
+    def close(self):
+        """
+        Close all idle connections, which a replay does not have.
+        """
+
+    def replay(
+        self, rpc_endpoint: str, rpc_module: ModuleType, method: str, args
+    ):
+        """
+        Replay a call, returning its recorded result or raising its
+        recorded error.
+        """
+        deadline.current().check()
+        key = _call_key(rpc_endpoint, method, args)
+        with self._lock:
+            replies = self._replies.get(key)
+            if not replies:
+                raise RpcReplayError(
+                    f"No recorded call to {rpc_endpoint}.{method}{args}"
+                )
+            index = self._next.get(key, 0)
+            self._next[key] = (index + 1) % len(replies)
+        record = replies[index]
+
+        if self._speed > 0:
+            time.sleep(record.duration / self._speed)
+
+        if isinstance(record.value, TraceError):
+            raise _recorded_error(record.value, rpc_module)
+        return record.value
+
+
+class _ReplayConnection:
+    def __init__(self, pool: RpcReplayPool):
+        self._pool = pool
+
+    def client(self, rpc_endpoint: str, rpc_module: ModuleType):
+        """
+        Get the client for the given endpoint.
+        """
+        return _ReplayClient(self._pool, rpc_endpoint, rpc_module)
+
+
+class _ReplayClient:
+    def __init__(
+        self, pool: RpcReplayPool, rpc_endpoint: str, rpc_module: ModuleType
+    ):
+        self._pool = pool
+        self._rpc_endpoint = rpc_endpoint
+        self._rpc_module = rpc_module
+
+    def __getattr__(self, name: str):
+        def call(*args):
+            return self._pool.replay(
+                self._rpc_endpoint, self._rpc_module, name, args
+            )
+
+        setattr(self, name, call)
+        return call
+
+    def pipeline(self, calls: list[tuple[str, tuple]]) -> list:
+        """
+        Replay several calls, returning errors in place of their results,
+        like :py:meth:`RpcClient.pipeline`.
+        """
+        results = []
+        for name, args in calls:
+            try:
+                results.append(getattr(self, name)(*args))
+            except (DeadlineExceededError, RpcUnavailableError):
+                raise
+            except Exception as exc:  # pylint: disable=broad-except
+                results.append(exc)
+        return results
+
+
+def _call_key(source: str, method: str, args) -> tuple:
+    encoded = bytearray()
+    encode_value(list(args), encoded)
+    return source, method, bytes(encoded)
+
+
+def _recorded_error(error: TraceError, rpc_module: ModuleType) -> Exception:
+    cls = getattr(rpc_module, error.type_name, None)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        return RpcUnavailableError(
+            f"Replayed {error.type_name}: {', '.join(map(str, error.args))}"
+        )
+
+    exc = cls.__new__(cls)
+    exc.args = error.args
+    for name, value in error.attributes.items():
+        setattr(exc, name, value)
+    return exc
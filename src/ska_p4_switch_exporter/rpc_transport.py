@@ -0,0 +1,170 @@
+# pylint: disable=import-error
+
+"""
+Factory for the Thrift transport and protocol stack used to talk to the
+Barefoot RPC server.
+"""
+
+import dataclasses
+import socket
+
+from thrift.protocol import TBinaryProtocol
+from thrift.transport import TSocket, TTransport
+
+try:
+    from thrift.protocol import fastbinary
+except ImportError:
+    fastbinary = None
+
+__all__ = [
+    "ByteCounter",
+    "RpcTransportFactory",
+    "PROTOCOLS",
+]
+
+PROTOCOLS = ["accelerated", "binary"]
+
+# Keepalive settings used to detect dead peers on idle pooled connections.
+_KEEPALIVE_OPTIONS = [
+    ("TCP_KEEPIDLE", 30),
+    ("TCP_KEEPINTVL", 10),
+    ("TCP_KEEPCNT", 3),
+]
+
+
+@dataclasses.dataclass
+class ByteCounter:
+    """
+    Number of bytes sent and received over a transport.
+    """
+
+    sent: int = 0
+    received: int = 0
+
+
+class _CountingTransport:
+    """
+    Transport counting the bytes sent and received over another transport.
+    """
+
+    # pylint: disable=missing-function-docstring
+
+    def __init__(self, trans, counter: ByteCounter):
+        self._trans = trans
+        self._counter = counter
+
+    def isOpen(self):  # pylint: disable=invalid-name
+        return self._trans.isOpen()
+
+    def open(self):
+        return self._trans.open()
+
+    def close(self):
+        return self._trans.close()
+
+    def read(self, sz: int) -> bytes:
+        buf = self._trans.read(sz)
+        self._counter.received += len(buf)
+        return buf
+
+    def readAll(self, sz: int) -> bytes:  # pylint: disable=invalid-name
+        buf = b""
+        while len(buf) < sz:
+            chunk = self.read(sz - len(buf))
+            if not chunk:
+                raise EOFError()
+            buf += chunk
+        return buf
+
+    def write(self, buf: bytes):
+        self._trans.write(buf)
+        self._counter.sent += len(buf)
+
+    def flush(self):
+        return self._trans.flush()
+
+
+@dataclasses.dataclass(frozen=True)
+class RpcTransportFactory:
+    """
+    Factory for the Thrift transport and protocol stack used to talk to the
+    Barefoot RPC server.
+
+    The ``accelerated`` protocol uses the C extension that comes with
+    Thrift to encode and decode messages, and falls back to the pure Python
+    implementation when that extension is not available.
+    """
+
+    protocol: str = "accelerated"
+    timeout_ms: int = 5000
+    read_buffer_size: int = 4096
+    socket_buffer_size: int = 0
+    tcp_nodelay: bool = True
+    tcp_keepalive: bool = True
+
+    def __post_init__(self):
+        if self.protocol not in PROTOCOLS:
+            raise ValueError(f"Unknown RPC protocol: {self.protocol}")
+
+    @property
+    def accelerated(self) -> bool:
+        """
+        Whether the protocols created by this factory use the C extension.
+        """
+        return self.protocol == "accelerated" and fastbinary is not None
+
+    def open_transport(
+        self,
+        rpc_host: str,
+        rpc_port: int,
+        counter: ByteCounter | None = None,
+    ):
+        """
+        Open a buffered transport to the RPC server.
+
+        Returns the underlying socket transport as well as the buffered
+        transport wrapping it. If a ``counter`` is given, the bytes sent
+        and received on the socket are added to it.
+        """
+        sock = TSocket.TSocket(rpc_host, rpc_port)
+        sock.setTimeout(self.timeout_ms)
+        transport = TTransport.TBufferedTransport(
+            sock if counter is None else _CountingTransport(sock, counter),
+            rbuf_size=self.read_buffer_size,
+        )
+        transport.open()
+        try:
+            self._configure_socket(sock.handle)
+        except OSError:
+            transport.close()
+            raise
+        return sock, transport
+
+    def create_protocol(self, transport):
+        """
+        Create the protocol used to encode messages on the given transport.
+        """
+        if self.accelerated:
+            return TBinaryProtocol.TBinaryProtocolAccelerated(transport)
+        return TBinaryProtocol.TBinaryProtocol(transport)
+
+    def _configure_socket(self, handle):
+        if not isinstance(handle, socket.socket):
+            return
+
+        if self.tcp_nodelay:
+            handle.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+        if self.tcp_keepalive:
+            handle.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+            for name, value in _KEEPALIVE_OPTIONS:
+                if hasattr(socket, name):
+                    handle.setsockopt(
+                        socket.IPPROTO_TCP, getattr(socket, name), value
+                    )
+
+        if self.socket_buffer_size > 0:
+            for option in [socket.SO_RCVBUF, socket.SO_SNDBUF]:
+                handle.setsockopt(
+                    socket.SOL_SOCKET, option, self.socket_buffer_size
+                )
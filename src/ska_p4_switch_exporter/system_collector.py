@@ -1,5 +1,7 @@
 # pylint: disable=import-error
 # pylint: disable=too-few-public-methods
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-positional-arguments
 
 """
 Custom Prometheus collector that collects system metrics using the
@@ -12,7 +14,9 @@ from pltfm_mgr_rpc import pltfm_mgr_rpc
 from prometheus_client.core import GaugeMetricFamily
 from prometheus_client.registry import REGISTRY, CollectorRegistry
 
+from ska_exporter_common.refresh import RefreshIntervals, RefreshTier
 from ska_p4_switch_exporter.rpc_collector_base import RpcCollectorBase
+from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
 
 __all__ = [
     "SystemCollector",
@@ -23,14 +27,22 @@ class SystemCollector(RpcCollectorBase):
     """
     Custom Prometheus collector that collects system metrics using the
     Barefoot platform manager RPC.
+
+    The system temperatures are in the medium refresh tier.
     """
 
+    refresh_tiers = {
+        "pltfm_mgr_sys_tmp_get": RefreshTier.MEDIUM,
+    }
+
     def __init__(
         self,
         rpc_host: str,
         rpc_port: int,
         logger: logging.Logger | None = None,
         registry: CollectorRegistry | None = REGISTRY,
+        connection_pool: RpcConnectionPool | None = None,
+        refresh_intervals: RefreshIntervals | None = None,
     ):
         logger = logger or logging.getLogger(__name__)
         super().__init__(
@@ -39,13 +51,15 @@ class SystemCollector(RpcCollectorBase):
             rpc_endpoint="pltfm_mgr_rpc",
             rpc_module=pltfm_mgr_rpc,
             logger=logger,
+            connection_pool=connection_pool,
+            refresh_intervals=refresh_intervals,
         )
 
         if registry:
             logger.info("Registering %s", self.__class__.__name__)
             registry.register(self)
 
-    def collect(self):
+    def _collect(self):
         system_temperature = GaugeMetricFamily(
             "p4_switch_system_temperature",
             "Temperature of the system",
@@ -54,7 +68,7 @@ class SystemCollector(RpcCollectorBase):
         )
 
         with self._get_rpc_client() as client:
-            temperatures = client.pltfm_mgr_sys_tmp_get()
+            temperatures = self._read(client, "pltfm_mgr_sys_tmp_get")
 
             for i in range(5):
                 label = f"motherboard{i+1}"
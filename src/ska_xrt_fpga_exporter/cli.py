@@ -1,15 +1,19 @@
+# pylint: disable=too-many-arguments
+# pylint: disable=too-many-positional-arguments
+
 """
 This is the main entrypoint of the application.
 """
 
 import logging
+import pathlib
 import signal
 
 import click
-from prometheus_client import start_http_server
-from prometheus_client.core import CollectorRegistry
 from ska_ser_logging import configure_logging
 
+from ska_exporter_common import call_trace, http_server, poller, refresh
+from ska_exporter_common.registry import CoalescingRegistry, ParallelRegistry
 from ska_xrt_fpga_exporter import release
 
 
@@ -25,6 +29,90 @@ from ska_xrt_fpga_exporter import release
     default=9101,
     help="Port number on which to expose metrics",
 )
+@click.option(
+    "--scrape-timeout-offset",
+    type=click.FloatRange(min=0),
+    default=0.5,
+    help="Time in seconds subtracted from the scrape timeout requested by"
+    " Prometheus, to leave time to send the response",
+)
+@click.option(
+    "--collector-timeout",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which a scrape serves the last result of a"
+    " collector still running, or 0 to wait for it until the scrape timeout."
+    " Collectors run concurrently",
+)
+@click.option(
+    "--scrape-cache-ttl",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds for which the result of a scrape is returned to"
+    " further scrapes. Scrapes that arrive while another one is in"
+    " progress always wait for its result",
+)
+@click.option(
+    "--xrt-record",
+    type=click.Path(dir_okay=False, writable=True, path_type=pathlib.Path),
+    default=None,
+    help="Path of a trace file to which all calls to pyxrt are written,"
+    " with their results, so that they can be replayed offline",
+)
+@click.option(
+    "--poll-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Interval in seconds at which the FPGAs are polled in the"
+    " background, with scrapes served from the latest poll, or 0 to read"
+    " the FPGAs on every scrape",
+)
+@click.option(
+    "--refresh-tiers/--no-refresh-tiers",
+    default=False,
+    help="Whether to read the values that change slowly or not at all less"
+    " often than the others, according to the refresh intervals below."
+    " Without, every value is read on every collection and the refresh"
+    " intervals are ignored",
+)
+@click.option(
+    "--fast-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the thermal and electrical readings"
+    " are read again, or 0 to read them on every collection",
+)
+@click.option(
+    "--medium-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=10.0,
+    help="Time in seconds after which the UUID of the loaded xclbin is read"
+    " again, or 0 to read it on every collection",
+)
+@click.option(
+    "--static-refresh-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the BDF, name and platform"
+    " information of the devices are read again, or 0 to read them again"
+    " only when the devices change",
+)
+@click.option(
+    "--adaptive-refresh-min-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds after which the thermal and electrical readings"
+    " are read again while they change quickly or are close to their"
+    " limits, when adaptive refresh is enabled",
+)
+@click.option(
+    "--adaptive-refresh-max-interval",
+    type=click.FloatRange(min=0),
+    default=0.0,
+    help="Time in seconds up to which the interval of these readings"
+    " grows while they stay flat, or 0 to disable adaptive refresh."
+    " Requires --refresh-tiers",
+)
 @click.option(
     "--log-level",
     type=click.Choice(
@@ -34,8 +122,19 @@ from ska_xrt_fpga_exporter import release
     default="INFO",
     help="Logging level used to configure the Python logger",
 )
-def run(
+def run(  # pylint: disable=too-many-locals
     web_port: int,
+    scrape_timeout_offset: float,
+    collector_timeout: float,
+    scrape_cache_ttl: float,
+    xrt_record: pathlib.Path | None,
+    poll_interval: float,
+    refresh_tiers: bool,
+    fast_refresh_interval: float,
+    medium_refresh_interval: float,
+    static_refresh_interval: float,
+    adaptive_refresh_min_interval: float,
+    adaptive_refresh_max_interval: float,
     log_level: str,
 ):
     """
@@ -52,23 +151,64 @@ def run(
     # pylint: disable-next=import-outside-toplevel
     from ska_xrt_fpga_exporter import (
         exporter_info_collector,
+        pyxrt_trace,
         xrt_fpga_collector,
     )
 
-    registry = CollectorRegistry()
+    recorder = None
+    pyxrt_module = None
+    if xrt_record is not None:
+        logger.info("Recording pyxrt calls to %s", xrt_record)
+        recorder = call_trace.TraceWriter.open(xrt_record)
+        pyxrt_module = pyxrt_trace.RecordingPyxrt(
+            xrt_fpga_collector.pyxrt, recorder
+        )
+
+    registry = ParallelRegistry(
+        logger=logger,
+        collector_timeout=collector_timeout or None,
+        metric_prefix="xrt_fpga_exporter",
+    )
     exporter_info_collector.ExporterInfoCollector(
         logger=logger,
         registry=registry,
     )
-    xrt_fpga_collector.XrtFpgaCollector(
+    refresh_intervals = (
+        refresh.RefreshIntervals(
+            fast=fast_refresh_interval,
+            medium=medium_refresh_interval,
+            static=static_refresh_interval,
+            adaptive_min=adaptive_refresh_min_interval,
+            adaptive_max=adaptive_refresh_max_interval,
+        )
+        if refresh_tiers
+        else None
+    )
+    fpga_collector = xrt_fpga_collector.XrtFpgaCollector(
         logger=logger,
-        registry=registry,
+        registry=None,
+        pyxrt_module=pyxrt_module,
+        refresh_intervals=refresh_intervals,
     )
 
+    # When polling, scrapes are served from the latest poll of the FPGAs
+    # instead of reading them on every scrape
+    background_poller = poller.Poller(logger=logger) if poll_interval else None
+    logger.info("Registering %s", fpga_collector.__class__.__name__)
+    if background_poller is not None:
+        registry.register(background_poller.add(fpga_collector, poll_interval))
+        background_poller.start()
+    else:
+        registry.register(fpga_collector)
+
     logger.info("Starting HTTP server on port %d", web_port)
-    server, server_thread = start_http_server(
+    server, server_thread = http_server.start_http_server(
         web_port,
-        registry=registry,
+        registry=CoalescingRegistry(
+            registry, ttl=scrape_cache_ttl, logger=logger
+        ),
+        timeout_offset=scrape_timeout_offset,
+        logger=logger,
     )
 
     def shutdown(*args, **kwargs):  # pylint: disable=unused-argument
@@ -76,6 +216,15 @@ def run(
         server.shutdown()
         server_thread.join(timeout=10)
 
+        if background_poller is not None:
+            logger.info("Stopping background polling")
+            background_poller.stop(timeout=10)
+
+        if recorder is not None:
+            logger.info("Closing trace file")
+            recorder.close()
+
+        registry.close()
         logger.info("Shutdown complete")
 
     shutdown_signals = [signal.SIGINT, signal.SIGTERM]
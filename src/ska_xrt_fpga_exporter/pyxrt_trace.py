@@ -0,0 +1,243 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Recording and replay of the calls the collectors make to ``pyxrt``.
+"""
+
+import builtins
+import logging
+import threading
+import time
+from collections.abc import Iterable
+from types import ModuleType
+
+from ska_exporter_common.call_trace import (
+    CallRecord,
+    TraceError,
+    TraceWriter,
+    encode_value,
+)
+
+__all__ = [
+    "PyxrtReplayError",
+    "RecordingPyxrt",
+    "ReplayPyxrt",
+]
+
+# Source of the calls in a trace
+SOURCE = "pyxrt"
+
+
+class PyxrtReplayError(LookupError):
+    """
+    Error raised when a call that is not in the trace is replayed.
+    """
+
+
+class RecordingPyxrt:
+    """
+    Proxy around the ``pyxrt`` module that writes the calls made through it
+    to a trace.
+
+    Only the parts of ``pyxrt`` used by the collectors are proxied. The
+    selectors passed to ``get_info`` are recorded by name, and the UUIDs
+    returned by ``get_xclbin_uuid`` as strings.
+    """
+
+    def __init__(self, pyxrt_module: ModuleType, recorder: TraceWriter):
+        self._pyxrt = pyxrt_module
+        self._recorder = recorder
+        self.xrt_info_device = pyxrt_module.xrt_info_device
+
+    def device(self, index: int):
+        """
+        Open the device with the given index.
+        """
+        device = self._call(
+            "device",
+            (index,),
+            lambda: self._pyxrt.device(index),
+            lambda _: None,
+        )
+        return _RecordingDevice(self, device, index)
+
+    def _call(self, method: str, args: tuple, call, recorded=None):
+        start = self._recorder.clock()
+        try:
+            value = call()
+        except Exception as exc:
+            self._recorder.record(
+                SOURCE,
+                method,
+                args,
+                start,
+                self._recorder.clock() - start,
+                exc,
+            )
+            raise
+        self._recorder.record(
+            SOURCE,
+            method,
+            args,
+            start,
+            self._recorder.clock() - start,
+            value if recorded is None else recorded(value),
+        )
+        return value
+
+
+class _RecordingDevice:
+    def __init__(self, trace: RecordingPyxrt, device, index: int):
+        self._trace = trace
+        self._device = device
+        self._index = index
+
+    def get_info(self, selector):
+        """
+        Retrieve information about the device.
+        """
+        # pylint: disable=protected-access
+        return self._trace._call(
+            "get_info",
+            (self._index, _selector_name(selector)),
+            lambda: self._device.get_info(selector),
+        )
+
+    def get_xclbin_uuid(self):
+        """
+        Retrieve the UUID of the xclbin loaded on the device.
+        """
+        # pylint: disable=protected-access
+        return self._trace._call(
+            "get_xclbin_uuid",
+            (self._index,),
+            self._device.get_xclbin_uuid,
+            lambda uuid: uuid.to_string(),
+        )
+
+
+class ReplayPyxrt:
+    """
+    Stand-in for the ``pyxrt`` module that answers the calls of the
+    collectors from a trace recorded with :py:class:`RecordingPyxrt`.
+
+    Each call is answered with the next recorded reply to the same method
+    and arguments, starting over once all of them have been replayed.
+    Recorded errors are raised again as the built-in exception with the
+    same name, or as a :py:class:`RuntimeError`, which is what ``pyxrt``
+    raises.
+
+    With a ``speed`` greater than 0, each call takes its recorded duration
+    divided by ``speed``, e.g. 1 for real time or 10 for ten times faster.
+    With a ``speed`` of 0, calls return immediately.
+    """
+
+    def __init__(
+        self,
+        records: Iterable[CallRecord],
+        speed: float = 0.0,
+        logger: logging.Logger | None = None,
+    ):
+        self._speed = speed
+        self._logger = logger or logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self._replies: dict[tuple, list[CallRecord]] = {}
+        self._next: dict[tuple, int] = {}
+        for record in records:
+            if record.source != SOURCE:
+                continue
+            key = _call_key(record.method, record.args)
+            self._replies.setdefault(key, []).append(record)
+        self._logger.debug(
+            "Replaying %d distinct pyxrt calls", len(self._replies)
+        )
+        self.xrt_info_device = _SelectorNames()
+
+    def device(self, index: int):
+        """
+        Open the device with the given index.
+        """
+        self.replay("device", (index,))
+        return _ReplayDevice(self, index)
+
+    def replay(self, method: str, args: tuple):
+        """
+        Replay a call, returning its recorded result or raising its
+        recorded error.
+        """
+        key = _call_key(method, args)
+        with self._lock:
+            replies = self._replies.get(key)
+            if not replies:
+                raise PyxrtReplayError(f"No recorded call to {method}{args}")
+            index = self._next.get(key, 0)
+            self._next[key] = (index + 1) % len(replies)
+        record = replies[index]
+
+        if self._speed > 0:
+            time.sleep(record.duration / self._speed)
+
+        if isinstance(record.value, TraceError):
+            raise _recorded_error(record.value)
+        return record.value
+
+
+class _SelectorNames:
+    """
+    Stand-in for ``pyxrt.xrt_info_device``, whose selectors are their names.
+    """
+
+    def __getattr__(self, name: str) -> str:
+        if name.startswith("__"):
+            raise AttributeError(name)
+        return name
+
+
+class _ReplayDevice:
+    def __init__(self, trace: ReplayPyxrt, index: int):
+        self._trace = trace
+        self._index = index
+
+    def get_info(self, selector):
+        """
+        Retrieve information about the device.
+        """
+        return self._trace.replay(
+            "get_info", (self._index, _selector_name(selector))
+        )
+
+    def get_xclbin_uuid(self):
+        """
+        Retrieve the UUID of the xclbin loaded on the device.
+        """
+        return _ReplayUuid(
+            self._trace.replay("get_xclbin_uuid", (self._index,))
+        )
+
+
+class _ReplayUuid:
+    def __init__(self, value: str):
+        self._value = value
+
+    def to_string(self) -> str:
+        """
+        Retrieve the UUID as a string.
+        """
+        return self._value
+
+
+def _selector_name(selector) -> str:
+    return getattr(selector, "name", selector)
+
+
+def _call_key(method: str, args: tuple) -> tuple:
+    encoded = bytearray()
+    encode_value(list(args), encoded)
+    return method, bytes(encoded)
+
+
+def _recorded_error(error: TraceError) -> Exception:
+    cls = getattr(builtins, error.type_name, None)
+    if not (isinstance(cls, type) and issubclass(cls, Exception)):
+        cls = RuntimeError
+    return cls(*error.args)
@@ -9,11 +9,19 @@ Custom Prometheus collector that collects metrics from Xilinx XRT FPGAs.
 
 import json
 import logging
+from types import ModuleType
 
 import pyxrt
 from prometheus_client.core import GaugeMetricFamily, InfoMetricFamily
 from prometheus_client.registry import REGISTRY, Collector, CollectorRegistry
 
+from ska_exporter_common import deadline, outcome
+from ska_exporter_common.refresh import (
+    RefreshCache,
+    RefreshIntervals,
+    RefreshTier,
+)
+
 __all__ = [
     "XrtFpgaCollector",
 ]
@@ -22,14 +30,47 @@ __all__ = [
 class XrtFpgaCollector(Collector):
     """
     Custom Prometheus collector that collects metrics from Xilinx XRT FPGAs.
+
+    Devices are read one after the other until the deadline of the scrape
+    passes; the metrics of the devices read until then are still exported.
+
+    The devices are read with the ``pyxrt`` module, unless a stand-in for
+    it is given as ``pyxrt_module``, e.g. to record or replay the calls
+    with :py:mod:`ska_xrt_fpga_exporter.pyxrt_trace`.
+
+    Given ``refresh_intervals``, the device information is read according
+    to the refresh tier it is assigned to in :py:attr:`refresh_tiers`.
+    Static information is read again when the devices change. Without,
+    everything is read on every collection.
+
+    With adaptive refresh intervals, the thermal and electrical readings
+    are read more often while they change quickly or are close to their
+    limits, and less often while they stay flat. The temperatures are
+    compared with the critical temperatures of the fans, and the power
+    consumption with its maximum.
     """
 
+    refresh_tiers = {
+        "bdf": RefreshTier.STATIC,
+        "name": RefreshTier.STATIC,
+        "platform": RefreshTier.STATIC,
+        "xclbin_uuid": RefreshTier.MEDIUM,
+        "thermal": RefreshTier.FAST,
+        "electrical": RefreshTier.FAST,
+        "mechanical": RefreshTier.STATIC,
+    }
+    """Refresh tier of each piece of device information."""
+
     def __init__(
         self,
         registry: CollectorRegistry | None = REGISTRY,
         logger: logging.Logger | None = None,
+        pyxrt_module: ModuleType | None = None,
+        refresh_intervals: RefreshIntervals | None = None,
     ):
         self._logger = logger or logging.getLogger(__name__)
+        self._pyxrt = pyxrt_module or pyxrt
+        self._refresh_cache = RefreshCache(refresh_intervals)
 
         if registry:
             self._logger.info("Registering %s", self.__class__.__name__)
@@ -78,13 +119,12 @@ class XrtFpgaCollector(Collector):
             labels=["bdf"],
         )
 
-        for device in self._iter_devices():
-            bdf = device.get_info(pyxrt.xrt_info_device.bdf)
-            name = device.get_info(pyxrt.xrt_info_device.name)
-            xclbin_uuid = device.get_xclbin_uuid().to_string()
-            platform_info = json.loads(
-                device.get_info(pyxrt.xrt_info_device.platform)
-            )
+        index = -1
+        for index, device in enumerate(self._iter_devices()):
+            bdf = self._read(index, device, "bdf")
+            name = self._read(index, device, "name")
+            xclbin_uuid = self._read(index, device, "xclbin_uuid")
+            platform_info = json.loads(self._read(index, device, "platform"))
 
             info.add_metric(
                 [bdf],
@@ -97,9 +137,8 @@ class XrtFpgaCollector(Collector):
                 },
             )
 
-            thermal_info = json.loads(
-                device.get_info(pyxrt.xrt_info_device.thermal)
-            )
+            thermal_info = json.loads(self._read(index, device, "thermal"))
+            self._adapt_thermal(index, device, thermal_info)
             for reading in thermal_info["thermals"]:
                 if reading["is_present"] != "true":
                     self._logger.debug(
@@ -114,8 +153,9 @@ class XrtFpgaCollector(Collector):
                 )
 
             electrical_info = json.loads(
-                device.get_info(pyxrt.xrt_info_device.electrical)
+                self._read(index, device, "electrical")
             )
+            self._adapt_electrical(index, electrical_info)
             power.add_metric(
                 [bdf],
                 float(electrical_info["power_consumption_watts"]),
@@ -155,6 +195,9 @@ class XrtFpgaCollector(Collector):
                         current_reading,
                     )
 
+        # Forget the devices that are gone, in case they come back changed
+        self._refresh_cache.invalidate(lambda key: key[1] > index)
+
         yield from [
             info,
             temperature,
@@ -165,12 +208,85 @@ class XrtFpgaCollector(Collector):
             power_warning,
         ]
 
+    def _read(self, index: int, device, name: str):
+        """
+        Read a piece of information of a device, unless it is still fresh
+        according to its refresh tier.
+        """
+        if name == "xclbin_uuid":
+
+            def read():
+                return device.get_xclbin_uuid().to_string()
+
+        else:
+
+            def read():
+                selector = getattr(self._pyxrt.xrt_info_device, name)
+                return device.get_info(selector)
+
+        return self._refresh_cache.get(
+            (name, index), self.refresh_tiers[name], read
+        )
+
+    def _adapt_thermal(self, index: int, device, thermal_info: dict):
+        """
+        Adapt the refresh interval of the thermal readings of a device to
+        how they change and how close they are to the critical temperature
+        of its fans.
+        """
+        if not self._refresh_cache.adaptive:
+            return
+        mechanical_info = json.loads(self._read(index, device, "mechanical"))
+        limits = [
+            float(fan["critical_trigger_temp_C"])
+            for fan in mechanical_info["fans"]
+            if fan["is_present"] == "true"
+        ]
+        self._refresh_cache.adapt(
+            ("thermal", index),
+            [
+                (float(reading["temp_C"]), limits)
+                for reading in thermal_info["thermals"]
+                if reading["is_present"] == "true"
+            ],
+        )
+
+    def _adapt_electrical(self, index: int, electrical_info: dict):
+        """
+        Adapt the refresh interval of the electrical readings of a device
+        to how they change and how close the power consumption is to its
+        maximum.
+        """
+        readings = [
+            (
+                float(electrical_info["power_consumption_watts"]),
+                [float(electrical_info["power_consumption_max_watts"])],
+            )
+        ]
+        for rail in electrical_info["power_rails"]:
+            for reading, unit in [
+                (rail["voltage"], "volts"),
+                (rail["current"], "amps"),
+            ]:
+                if reading["is_present"] == "true":
+                    readings.append((float(reading[unit]), []))
+        self._refresh_cache.adapt(("electrical", index), readings)
+
     def _iter_devices(self):
         i = 0
+        scrape_deadline = deadline.current()
         while True:
+            if scrape_deadline.expired():
+                self._logger.warning(
+                    "Deadline exceeded, skipping XRT devices from %d onwards",
+                    i,
+                )
+                outcome.report_partial("Deadline exceeded")
+                break
+
             self._logger.debug("Attempting to retrieve XRT device %d", i)
             try:
-                device = pyxrt.device(i)
+                device = self._pyxrt.device(i)
                 yield device
                 i += 1
             except RuntimeError:
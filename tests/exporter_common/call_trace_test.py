@@ -0,0 +1,185 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_exporter_common.call_trace` module.
+"""
+
+import dataclasses
+import pathlib
+
+import pytest
+
+from ska_exporter_common.call_trace import (
+    TraceError,
+    TraceFormatError,
+    TraceObject,
+    TraceWriter,
+    read_trace,
+)
+
+
+class SlottedStruct:
+    """
+    Struct keeping its fields in slots, like generated Thrift structs.
+    """
+
+    __slots__ = ("entry", "status")
+
+    def __init__(self, entry, status):
+        self.entry = entry
+        self.status = status
+
+
+@dataclasses.dataclass
+class Thresholds:
+    """
+    Struct with a computed field.
+    """
+
+    high: float | None
+
+    @property
+    def high_is_set(self):
+        """
+        Whether the high threshold is set.
+        """
+        return self.high is not None
+
+
+class OperationError(RuntimeError):
+    """
+    Error with a field, like generated Thrift exceptions.
+    """
+
+    def __init__(self, code: int):
+        super().__init__(f"error {code}")
+        self.code = code
+
+
+class FakeClock:
+    """
+    Clock that only advances when told to.
+    """
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.mark.parametrize(
+    "value",
+    [
+        None,
+        True,
+        False,
+        0,
+        -1,
+        2**63 + 5,
+        -(2**40),
+        1.5,
+        "",
+        "pal_port_all_stats_get",
+        b"\x00\xff",
+        [1, [2, "three"], {"four": 4.0}],
+        {1: None, "key": [True]},
+    ],
+)
+def test_values_round_trip(tmp_path: pathlib.Path, value):
+    """
+    Tests whether plain values are read back as they were written.
+    """
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path) as writer:
+        writer.record("pal", "method", (value,), writer.clock(), 0.0, value)
+
+    (record,) = read_trace(path)
+
+    assert record.args == (value,)
+    assert record.value == value
+    assert not record.error
+
+
+def test_objects_are_read_back_by_attribute(tmp_path: pathlib.Path):
+    """
+    Tests whether objects are read back with the attributes of the
+    recorded objects, whether stored in slots, dicts or properties.
+    """
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path) as writer:
+        for value in [SlottedStruct([1, 2, 3], 0), Thresholds(high=None)]:
+            writer.record("pal", "method", (), writer.clock(), 0.0, value)
+
+    stats, thresholds = (record.value for record in read_trace(path))
+
+    assert isinstance(stats, TraceObject)
+    assert stats.entry == [1, 2, 3]
+    assert stats.status == 0
+    assert repr(stats) == "SlottedStruct(entry=[1, 2, 3], status=0)"
+    assert thresholds.high is None
+    assert thresholds.high_is_set is False
+
+
+def test_errors_are_read_back(tmp_path: pathlib.Path):
+    """
+    Tests whether exceptions are read back as :py:class:`TraceError`.
+    """
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path) as writer:
+        writer.record(
+            "pal", "method", (), writer.clock(), 0.0, OperationError(3)
+        )
+
+    (record,) = read_trace(path)
+
+    assert record.error
+    assert record.value == TraceError(
+        "OperationError", ("error 3",), {"code": 3}
+    )
+
+
+def test_timing_is_recorded(tmp_path: pathlib.Path):
+    """
+    Tests whether the start time relative to the start of the trace and
+    the duration of calls are recorded.
+    """
+    clock = FakeClock()
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path, clock=clock) as writer:
+        clock.now += 1.5
+        writer.record("pal", "method", (), writer.clock(), 0.25, 1)
+
+    (record,) = read_trace(path)
+
+    assert record.timestamp == pytest.approx(1.5)
+    assert record.duration == pytest.approx(0.25)
+    assert record.source == "pal"
+    assert record.method == "method"
+
+
+def test_truncated_trace_is_read_up_to_last_flush(tmp_path: pathlib.Path):
+    """
+    Tests whether a trace whose writer was never closed can be read up to
+    its last flush.
+    """
+    path = tmp_path / "trace.bin"
+    with open(path, "wb") as file:
+        writer = TraceWriter(file)
+        for i in range(3):
+            writer.record("pal", "method", (i,), writer.clock(), 0.0, i)
+        writer.flush()
+        writer.record("pal", "method", (3,), writer.clock(), 0.0, 3)
+
+    assert [record.value for record in read_trace(path)] == [0, 1, 2]
+
+
+def test_other_files_are_rejected(tmp_path: pathlib.Path):
+    """
+    Tests whether reading a file that is not a trace raises an error.
+    """
+    path = tmp_path / "trace.bin"
+    path.write_bytes(b"not a trace")
+
+    with pytest.raises(TraceFormatError):
+        list(read_trace(path))
@@ -0,0 +1,89 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_exporter_common.http_server` module.
+"""
+
+from wsgiref.util import setup_testing_defaults
+
+import pytest
+from prometheus_client import CollectorRegistry
+from prometheus_client.registry import Collector
+
+from ska_exporter_common import deadline
+from ska_exporter_common.http_server import (
+    SCRAPE_TIMEOUT_HEADER,
+    make_deadline_wsgi_app,
+)
+
+
+class DeadlineRecorder(Collector):
+    """
+    Collector that records the deadline of the scrape.
+    """
+
+    def __init__(self):
+        self.deadline = None
+
+    def collect(self):
+        self.deadline = deadline.current()
+        yield from []
+
+
+@pytest.fixture(name="recorder")
+def fxt_recorder(registry: CollectorRegistry):
+    """
+    Register a collector recording the deadline of the scrape.
+    """
+    recorder = DeadlineRecorder()
+    registry.register(recorder)
+    return recorder
+
+
+def scrape(registry: CollectorRegistry, headers: dict[str, str]) -> str:
+    """
+    Scrape the WSGI app with the given WSGI environment headers.
+    """
+    environ = dict(headers)
+    setup_testing_defaults(environ)
+    statuses = []
+    app = make_deadline_wsgi_app(registry, timeout_offset=0.5)
+    app(environ, lambda status, headers: statuses.append(status))
+    return statuses[0]
+
+
+@pytest.mark.parametrize(
+    ("header", "expected_remaining"),
+    [
+        ("10", 9.5),
+        ("2.5", 2.0),
+        ("0.2", 0.2),
+    ],
+)
+def test_scrape_timeout_header_sets_deadline(
+    registry: CollectorRegistry,
+    recorder: DeadlineRecorder,
+    header: str,
+    expected_remaining: float,
+):
+    """
+    Tests whether the scrape timeout sent by Prometheus, less the offset,
+    becomes the deadline of the scrape.
+    """
+    assert scrape(registry, {SCRAPE_TIMEOUT_HEADER: header}) == "200 OK"
+    assert recorder.deadline.remaining() == pytest.approx(
+        expected_remaining, abs=0.05
+    )
+
+
+@pytest.mark.parametrize("headers", [{}, {SCRAPE_TIMEOUT_HEADER: "soon"}])
+def test_scrape_without_valid_timeout_is_unbounded(
+    registry: CollectorRegistry,
+    recorder: DeadlineRecorder,
+    headers: dict[str, str],
+):
+    """
+    Tests whether scrapes without a valid timeout header are not bounded.
+    """
+    assert scrape(registry, headers) == "200 OK"
+    assert not recorder.deadline.bounded
@@ -0,0 +1,193 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_exporter_common.poller` module.
+"""
+
+import threading
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from ska_exporter_common import deadline, outcome
+from ska_exporter_common.poller import PolledCollector, Poller
+
+
+class CountingCollector(Collector):
+    """
+    Collector exporting how many times it was collected, spending a fixed
+    amount of time collecting.
+    """
+
+    def __init__(self, name: str, duration: float = 0.0):
+        self.name = name
+        self.duration = duration
+        self.polls = 0
+        self.deadline = None
+        self.error: Exception | None = None
+        self.partial = False
+
+    def collect(self):
+        self.deadline = deadline.current()
+        time.sleep(self.duration)
+        if self.error is not None:
+            raise self.error
+        if self.partial:
+            outcome.report_partial("Deadline exceeded")
+        self.polls += 1
+        metric = GaugeMetricFamily(self.name, "Test metric")
+        metric.add_metric([], self.polls)
+        yield metric
+
+
+@pytest.fixture(name="poller")
+def fxt_poller():
+    """
+    Create a poller, stopping it after the test.
+    """
+    poller = Poller()
+    yield poller
+    poller.stop(timeout=1)
+
+
+def test_scrapes_are_served_from_snapshot(registry: CollectorRegistry):
+    """
+    Tests whether scrapes return the metrics of the latest poll without
+    collecting again.
+    """
+    collector = CountingCollector("metric")
+    polled = PolledCollector(collector, interval=1.0)
+    registry.register(polled)
+
+    assert registry.get_sample_value("metric") is None
+    polled.poll()
+    assert registry.get_sample_value("metric") == 1.0
+    assert registry.get_sample_value("metric") == 1.0
+    assert collector.polls == 1
+    assert polled.snapshot.duration >= 0.0
+    assert polled.snapshot.timestamp == pytest.approx(time.time(), abs=1)
+
+
+def test_poll_is_bounded_by_timeout():
+    """
+    Tests whether each poll runs with a deadline of the poll timeout, the
+    interval by default.
+    """
+    collector = CountingCollector("metric")
+    PolledCollector(collector, interval=2.0).poll()
+    assert collector.deadline.remaining() == pytest.approx(2.0, abs=0.1)
+
+    PolledCollector(collector, interval=2.0, timeout=0.5).poll()
+    assert collector.deadline.remaining() == pytest.approx(0.5, abs=0.1)
+
+
+def test_previous_snapshot_is_kept_on_failure(registry: CollectorRegistry):
+    """
+    Tests whether the metrics of the last successful poll are still served
+    after a poll has failed.
+    """
+    collector = CountingCollector("metric")
+    polled = PolledCollector(collector, interval=1.0)
+    registry.register(polled)
+    polled.poll()
+
+    collector.error = RuntimeError("Wedged")
+    polled.poll()
+
+    assert registry.get_sample_value("metric") == 1.0
+
+
+def test_previous_snapshot_is_kept_on_partial_poll(
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether the metrics and timestamp of the last complete poll are
+    kept after a partial poll, and whether a partial poll is only kept
+    while there is no complete one.
+    """
+    collector = CountingCollector("metric")
+    collector.partial = True
+    polled = PolledCollector(collector, interval=1.0)
+    registry.register(polled)
+
+    polled.poll()
+    assert registry.get_sample_value("metric") == 1.0
+    assert not polled.snapshot.complete
+
+    collector.partial = False
+    polled.poll()
+    snapshot = polled.snapshot
+    assert snapshot.complete
+
+    collector.partial = True
+    polled.poll()
+
+    assert polled.snapshot is snapshot
+    assert registry.get_sample_value("metric") == 2.0
+
+
+def test_collectors_are_polled_on_their_interval(
+    poller: Poller, registry: CollectorRegistry
+):
+    """
+    Tests whether each collector is polled immediately and then on its own
+    interval, until the poller is stopped.
+    """
+    fast = CountingCollector("fast")
+    slow = CountingCollector("slow")
+    registry.register(poller.add(fast, interval=0.05))
+    registry.register(poller.add(slow, interval=10.0))
+
+    poller.start()
+    time.sleep(0.28)
+    poller.stop(timeout=1)
+    polls = fast.polls
+    time.sleep(0.1)
+
+    assert 5 <= polls <= 7
+    assert fast.polls == polls
+    assert slow.polls == 1
+    assert registry.get_sample_value("fast") == polls
+
+
+def test_slow_collector_does_not_delay_others(poller: Poller):
+    """
+    Tests whether a collector that takes long to poll does not delay the
+    polls of the other collectors.
+    """
+    slow = CountingCollector("slow", duration=0.5)
+    fast = CountingCollector("fast")
+    poller.add(slow, interval=0.05)
+    poller.add(fast, interval=0.05)
+
+    poller.start()
+    time.sleep(0.28)
+
+    assert fast.polls >= 5
+    assert slow.polls == 0
+
+
+def test_scrapes_do_not_wait_for_polls(registry: CollectorRegistry):
+    """
+    Tests whether scrapes are served while a poll is in progress.
+    """
+    collector = CountingCollector("metric")
+    polled = PolledCollector(collector, interval=1.0)
+    registry.register(polled)
+    polled.poll()
+
+    collector.duration = 0.5
+    thread = threading.Thread(target=polled.poll)
+    thread.start()
+    time.sleep(0.05)
+    start = time.monotonic()
+    value = registry.get_sample_value("metric")
+    elapsed = time.monotonic() - start
+    thread.join()
+
+    assert value == 1.0
+    assert elapsed < 0.05
+    assert registry.get_sample_value("metric") == 2.0
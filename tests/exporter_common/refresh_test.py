@@ -0,0 +1,226 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_exporter_common.refresh` module.
+"""
+
+import pytest
+
+from ska_exporter_common.refresh import (
+    RefreshCache,
+    RefreshIntervals,
+    RefreshTier,
+)
+
+
+class FakeClock:
+    """
+    Clock that only advances when told to.
+    """
+
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+class Reader:
+    """
+    Read function counting how many times it was called.
+    """
+
+    def __init__(self):
+        self.reads = 0
+
+    def __call__(self):
+        self.reads += 1
+        return self.reads
+
+
+@pytest.fixture(name="clock")
+def fxt_clock():
+    """
+    Create a fake clock.
+    """
+    return FakeClock()
+
+
+@pytest.fixture(name="cache")
+def fxt_cache(clock: FakeClock):
+    """
+    Create a cache with a different interval for each tier.
+    """
+    return RefreshCache(
+        RefreshIntervals(fast=0.0, medium=10.0, static=0.0), clock=clock
+    )
+
+
+def test_values_are_read_again_after_their_interval(
+    cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether values are reused until they are older than the interval
+    of their tier.
+    """
+    read = Reader()
+
+    assert cache.get("key", RefreshTier.MEDIUM, read) == 1
+    clock.now += 9.9
+    assert cache.get("key", RefreshTier.MEDIUM, read) == 1
+    clock.now += 0.1
+    assert cache.get("key", RefreshTier.MEDIUM, read) == 2
+
+
+def test_fast_values_are_read_every_time(cache: RefreshCache):
+    """
+    Tests whether values of a tier with an interval of 0 are never reused.
+    """
+    read = Reader()
+
+    assert cache.get("key", RefreshTier.FAST, read) == 1
+    assert cache.get("key", RefreshTier.FAST, read) == 2
+
+
+def test_static_values_are_read_again_on_trigger(
+    cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether static values are only read again when their trigger
+    changes.
+    """
+    read = Reader()
+
+    assert cache.get("key", RefreshTier.STATIC, read, trigger="a") == 1
+    clock.now += 1e6
+    assert cache.get("key", RefreshTier.STATIC, read, trigger="a") == 1
+    assert cache.get("key", RefreshTier.STATIC, read, trigger="b") == 2
+
+
+def test_static_values_expire_with_interval(clock: FakeClock):
+    """
+    Tests whether static values are read again once older than the static
+    interval, if there is one.
+    """
+    cache = RefreshCache(RefreshIntervals(static=60.0), clock=clock)
+    read = Reader()
+
+    assert cache.get("key", RefreshTier.STATIC, read) == 1
+    clock.now += 60.0
+    assert cache.get("key", RefreshTier.STATIC, read) == 2
+
+
+def test_invalidated_values_are_read_again(cache: RefreshCache):
+    """
+    Tests whether invalidated values are read again, and only those.
+    """
+    first, second = Reader(), Reader()
+    cache.get(("info", 1), RefreshTier.STATIC, first)
+    cache.get(("info", 2), RefreshTier.STATIC, second)
+
+    cache.invalidate(lambda key: key[1] == 1)
+
+    assert cache.get(("info", 1), RefreshTier.STATIC, first) == 2
+    assert cache.get(("info", 2), RefreshTier.STATIC, second) == 1
+
+
+def test_nothing_is_cached_without_intervals():
+    """
+    Tests whether every value is read every time without intervals.
+    """
+    cache = RefreshCache()
+    read = Reader()
+
+    assert cache.get("key", RefreshTier.STATIC, read) == 1
+    assert cache.get("key", RefreshTier.STATIC, read) == 2
+    assert cache.lookup("key", RefreshTier.STATIC) is RefreshCache.MISSING
+
+
+@pytest.fixture(name="adaptive_cache")
+def fxt_adaptive_cache(clock: FakeClock):
+    """
+    Create a cache adapting intervals between 1 and 9 seconds.
+    """
+    return RefreshCache(
+        RefreshIntervals(medium=5.0, adaptive_min=1.0, adaptive_max=9.0),
+        clock=clock,
+    )
+
+
+def read_adapted(
+    cache: RefreshCache, clock: FakeClock, value: float, thresholds=()
+) -> float:
+    """
+    Read and adapt to a value as soon as it is due, returning the time it
+    is cached for.
+    """
+    cache.get("key", RefreshTier.MEDIUM, lambda: value)
+    cache.adapt("key", [(value, thresholds)])
+    start = clock.now
+    while cache.lookup("key", RefreshTier.MEDIUM) is not RefreshCache.MISSING:
+        clock.now += 0.5
+    return clock.now - start
+
+
+def test_flat_readings_back_off(
+    adaptive_cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether the interval of a reading grows to the maximum while it
+    stays flat, and drops to the minimum as soon as it changes.
+    """
+    intervals = [
+        read_adapted(adaptive_cache, clock, value)
+        for value in [40.0, 40.0, 40.1, 40.0, 40.0, 40.0, 40.0, 45.0, 45.0]
+    ]
+
+    assert intervals == [1.0, 3.0, 5.0, 7.0, 9.0, 9.0, 9.0, 1.0, 3.0]
+
+
+def test_readings_close_to_thresholds_are_read_often(
+    adaptive_cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether a flat reading is read at the minimum interval while it
+    is close to one of its thresholds, relative to their range.
+    """
+    thresholds = (-5.0, 0.0, 70.0, 75.0)
+
+    intervals = [
+        read_adapted(adaptive_cache, clock, value, thresholds)
+        for value in [61.0, 61.0, 61.0, 62.5, 62.5]
+    ]
+
+    assert intervals == [1.0, 3.0, 5.0, 1.0, 1.0]
+
+
+def test_adapting_twice_to_same_reading(
+    adaptive_cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether adapting again to a value served from the cache leaves
+    its interval as it is.
+    """
+    adaptive_cache.get("key", RefreshTier.MEDIUM, lambda: 1.0)
+    adaptive_cache.adapt("key", [(1.0, ())])
+    clock.now += 0.5
+    adaptive_cache.get("key", RefreshTier.MEDIUM, lambda: 2.0)
+    adaptive_cache.adapt("key", [(1.0, ())])
+
+    clock.now += 0.5
+    assert (
+        adaptive_cache.lookup("key", RefreshTier.MEDIUM)
+        is RefreshCache.MISSING
+    )
+
+
+def test_readings_are_not_adapted_without_maximum(
+    cache: RefreshCache, clock: FakeClock
+):
+    """
+    Tests whether the interval of the tier is used when adaptive refresh is
+    disabled.
+    """
+    assert not cache.adaptive
+    assert read_adapted(cache, clock, 1.0) == 10.0
+    assert read_adapted(cache, clock, 1.0) == 10.0
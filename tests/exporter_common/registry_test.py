@@ -0,0 +1,543 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_exporter_common.registry` module.
+"""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+
+from ska_exporter_common import deadline, outcome
+from ska_exporter_common.poller import PolledCollector
+from ska_exporter_common.registry import (
+    CoalescingRegistry,
+    ExporterRegistry,
+    ParallelRegistry,
+)
+
+# Prefix of the names of the metrics about the collectors
+PREFIX = "test_exporter"
+
+
+class DeadlineRecorder(Collector):
+    """
+    Collector that records the deadline it was given, and spends a fixed
+    amount of time collecting.
+    """
+
+    def __init__(self, name: str, duration: float = 0.0):
+        self.name = name
+        self.duration = duration
+        self.deadline = None
+
+    def collect(self):
+        self.deadline = deadline.current()
+        time.sleep(self.duration)
+        metric = GaugeMetricFamily(self.name, "Test metric")
+        metric.add_metric([], 1.0)
+        yield metric
+
+
+class CountingCollector(Collector):
+    """
+    Collector exporting how many times it was collected, spending a fixed
+    amount of time collecting.
+    """
+
+    def __init__(self, duration: float = 0.0):
+        self.duration = duration
+        self.collections = 0
+        self.error: Exception | None = None
+        self._lock = threading.Lock()
+
+    def collect(self):
+        time.sleep(self.duration)
+        if self.error is not None:
+            raise self.error
+        with self._lock:
+            self.collections += 1
+            collections = self.collections
+        metric = GaugeMetricFamily("collections", "Test metric")
+        metric.add_metric([], collections)
+        yield metric
+        metric = GaugeMetricFamily("other", "Test metric")
+        metric.add_metric([], 1.0)
+        yield metric
+
+
+class SteppingCollector(Collector):
+    """
+    Collector exporting a metric for each of its steps, spending a fixed
+    amount of time on each, and reporting its collection as partial when
+    the deadline leaves no time for the next step.
+    """
+
+    def __init__(self, steps: int, duration: float):
+        self.steps = steps
+        self.duration = duration
+        self.collections = 0
+
+    def collect(self):
+        self.collections += 1
+        collector_deadline = deadline.current()
+        for step in range(self.steps):
+            if (
+                collector_deadline.bounded
+                and collector_deadline.remaining() < self.duration
+            ):
+                outcome.report_partial("Deadline exceeded")
+                return
+            time.sleep(self.duration)
+            metric = GaugeMetricFamily(f"step{step}", "Test metric")
+            metric.add_metric([], self.collections)
+            yield metric
+
+
+def scrape(registry) -> dict[str, float]:
+    """
+    Collect the samples of a registry by name.
+    """
+    return {
+        sample.name: sample.value
+        for metric in registry.collect()
+        for sample in metric.samples
+    }
+
+
+@pytest.fixture(name="registry")
+def fxt_registry():
+    """
+    Create an exporter registry for each test.
+    """
+    return ExporterRegistry()
+
+
+def test_deadline_is_shared_between_collectors(registry: ExporterRegistry):
+    """
+    Tests whether each collector gets an equal share of the time remaining,
+    including the time left unused by the collectors before it.
+    """
+    collectors = [
+        DeadlineRecorder("first", duration=0.2),
+        DeadlineRecorder("second"),
+        DeadlineRecorder("third"),
+    ]
+    for collector in collectors:
+        registry.register(collector)
+
+    with deadline.scope(deadline.Deadline(1.2)):
+        start = time.monotonic()
+        list(registry.collect())
+        elapsed = time.monotonic() - start
+
+    # first: 1.2 / 3, second: (1.2 - 0.2) / 2, third: all that is left
+    assert collectors[0].deadline.remaining() == pytest.approx(
+        0.4 - elapsed, abs=0.05
+    )
+    assert collectors[1].deadline.remaining() == pytest.approx(
+        0.7 - elapsed, abs=0.05
+    )
+    assert collectors[2].deadline.remaining() == pytest.approx(
+        1.2 - elapsed, abs=0.05
+    )
+
+
+def test_collectors_are_unbounded_without_deadline(
+    registry: ExporterRegistry,
+):
+    """
+    Tests whether collectors run without a deadline if the scrape has none.
+    """
+    collector = DeadlineRecorder("metric")
+    registry.register(collector)
+
+    assert registry.get_sample_value("metric") == 1.0
+    assert not collector.deadline.bounded
+
+
+def test_unregistered_collector_is_not_collected(registry: ExporterRegistry):
+    """
+    Tests whether unregistering a collector removes it from the scrape.
+    """
+    collector = DeadlineRecorder("metric")
+    registry.register(collector)
+    registry.unregister(collector)
+
+    assert registry.get_sample_value("metric") is None
+    assert collector.deadline is None
+
+
+def test_concurrent_scrapes_are_coalesced():
+    """
+    Tests whether scrapes that arrive while another one is in progress
+    return its result instead of collecting again.
+    """
+    collector = CountingCollector(duration=0.2)
+    registry = ExporterRegistry()
+    registry.register(collector)
+    coalescing = CoalescingRegistry(registry)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = list(executor.map(lambda _: scrape(coalescing), range(3)))
+
+    assert collector.collections == 1
+    assert [result["collections"] for result in results] == [1.0] * 3
+
+    # Scrapes that do not overlap collect again
+    assert scrape(coalescing)["collections"] == 2.0
+
+
+def test_recent_results_are_cached():
+    """
+    Tests whether results younger than the TTL are returned without
+    collecting again.
+    """
+    collector = CountingCollector()
+    registry = ExporterRegistry()
+    registry.register(collector)
+    coalescing = CoalescingRegistry(registry, ttl=0.2)
+
+    assert scrape(coalescing)["collections"] == 1.0
+    assert scrape(coalescing)["collections"] == 1.0
+    time.sleep(0.25)
+    assert scrape(coalescing)["collections"] == 2.0
+
+
+def test_waiting_is_bounded_by_deadline():
+    """
+    Tests whether a scrape waiting for the collection in progress returns
+    the previous result once its deadline has passed.
+    """
+    collector = CountingCollector()
+    registry = ExporterRegistry()
+    registry.register(collector)
+    coalescing = CoalescingRegistry(registry)
+    scrape(coalescing)
+
+    collector.duration = 0.5
+    thread = threading.Thread(target=scrape, args=(coalescing,))
+    thread.start()
+    time.sleep(0.05)
+    with deadline.scope(deadline.Deadline(0.1)):
+        start = time.monotonic()
+        result = scrape(coalescing)
+        elapsed = time.monotonic() - start
+    thread.join()
+
+    assert result["collections"] == 1.0
+    assert elapsed == pytest.approx(0.1, abs=0.05)
+
+
+def test_errors_are_shared_and_not_cached():
+    """
+    Tests whether the scrapes waiting for a collection that fails fail as
+    well, and whether the failure is not cached.
+    """
+    collector = CountingCollector(duration=0.2)
+    collector.error = RuntimeError("Collection failed")
+    registry = ExporterRegistry()
+    registry.register(collector)
+    coalescing = CoalescingRegistry(registry, ttl=10.0)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        futures = [executor.submit(scrape, coalescing) for _ in range(2)]
+        for future in futures:
+            with pytest.raises(RuntimeError, match="Collection failed"):
+                future.result()
+
+    collector.error = None
+    assert scrape(coalescing)["collections"] == 1.0
+
+
+def test_restricted_registry():
+    """
+    Tests whether a restricted registry only returns the requested samples,
+    from the cached result.
+    """
+    collector = CountingCollector()
+    registry = ExporterRegistry()
+    registry.register(collector)
+    coalescing = CoalescingRegistry(registry, ttl=10.0)
+    scrape(coalescing)
+
+    assert scrape(coalescing.restricted_registry(["other"])) == {"other": 1.0}
+    assert collector.collections == 1
+
+
+def collected(registry) -> dict[str, float]:
+    """
+    Collect the samples of a registry by name, leaving out the metrics
+    about the collectors themselves.
+    """
+    return {
+        name: value
+        for name, value in scrape(registry).items()
+        if "_collector_" not in name
+    }
+
+
+@pytest.fixture(name="parallel_registry")
+def fxt_parallel_registry():
+    """
+    Create a parallel registry for each test, stopping its workers after.
+    """
+    registry = ParallelRegistry(collector_timeout=0.3, metric_prefix=PREFIX)
+    yield registry
+    registry.close()
+
+
+def test_collectors_run_concurrently(parallel_registry: ParallelRegistry):
+    """
+    Tests whether a scrape takes as long as the slowest collector, and
+    returns the metrics in the order the collectors were registered in.
+    """
+    for name, duration in [("first", 0.2), ("second", 0.1), ("third", 0.0)]:
+        parallel_registry.register(DeadlineRecorder(name, duration=duration))
+
+    start = time.monotonic()
+    names = list(collected(parallel_registry))
+    elapsed = time.monotonic() - start
+
+    assert names == ["first", "second", "third"]
+    assert elapsed == pytest.approx(0.2, abs=0.08)
+
+
+def test_last_collectors_run_after_the_others(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether collectors registered last start once the others have
+    returned, and return their metrics after them.
+    """
+    last = DeadlineRecorder("last")
+    slow = DeadlineRecorder("slow", duration=0.1)
+    parallel_registry.register(last, last=True)
+    parallel_registry.register(slow)
+
+    start = time.monotonic()
+    names = list(collected(parallel_registry))
+
+    assert names == ["slow", "last"]
+    assert time.monotonic() - start >= 0.1
+
+    parallel_registry.unregister(last)
+    assert list(collected(parallel_registry)) == ["slow"]
+
+
+def test_slow_collector_is_not_waited_for(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether a collector that exceeds the collector timeout is not
+    waited for, in later scrapes as well while it is still running.
+    """
+    slow = DeadlineRecorder("slow", duration=0.6)
+    parallel_registry.register(DeadlineRecorder("fast"))
+    parallel_registry.register(slow)
+
+    start = time.monotonic()
+    assert collected(parallel_registry) == {"fast": 1.0}
+    elapsed = time.monotonic() - start
+    assert elapsed == pytest.approx(
+        0.3 + ParallelRegistry.grace_period, abs=0.08
+    )
+    assert slow.deadline.bounded
+
+    start = time.monotonic()
+    assert collected(parallel_registry) == {"fast": 1.0}
+    assert time.monotonic() - start < 0.1
+
+    # Once it has returned, it is collected again
+    slow.duration = 0.0
+    time.sleep(0.3)
+    assert collected(parallel_registry) == {"fast": 1.0, "slow": 1.0}
+
+
+def test_collector_timeout_is_limited_by_scrape_deadline(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether collectors get the deadline of the scrape when it is
+    shorter than the collector timeout.
+    """
+    collector = DeadlineRecorder("metric")
+    parallel_registry.register(collector)
+
+    with deadline.scope(deadline.Deadline(0.1)):
+        scrape(parallel_registry)
+
+    assert collector.deadline.remaining() <= 0.1
+
+
+@pytest.mark.parametrize("failure", ["error", "timeout"])
+def test_last_success_is_served(
+    parallel_registry: ParallelRegistry, failure: str
+):
+    """
+    Tests whether the metrics of the last successful collection of a
+    collector are served when it fails or exceeds the collector timeout,
+    along with how old they are.
+    """
+    collector = CountingCollector()
+    parallel_registry.register(collector)
+    parallel_registry.register(DeadlineRecorder("fresh"))
+    start = time.time()
+    assert collected(parallel_registry)["collections"] == 1.0
+
+    time.sleep(0.2)
+    if failure == "error":
+        collector.error = RuntimeError("Collection failed")
+    else:
+        collector.duration = 0.5
+    samples = scrape(parallel_registry)
+
+    assert samples["collections"] == 1.0
+    assert samples["fresh"] == 1.0
+    last_success = parallel_registry.get_sample_value(
+        f"{PREFIX}_collector_last_success_timestamp_seconds",
+        {"collector": "CountingCollector"},
+    )
+    assert last_success == pytest.approx(start, abs=0.05)
+    data_age = parallel_registry.get_sample_value(
+        f"{PREFIX}_collector_data_age_seconds",
+        {"collector": "CountingCollector"},
+    )
+    assert data_age == pytest.approx(time.time() - start, abs=0.1)
+    assert parallel_registry.get_sample_value(
+        f"{PREFIX}_collector_data_age_seconds",
+        {"collector": "DeadlineRecorder"},
+    ) == pytest.approx(0.0, abs=0.05)
+
+
+def test_failing_collector_without_success_is_empty(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether a collector that never succeeded does not fail the
+    scrape, and has no staleness metrics.
+    """
+    collector = CountingCollector()
+    collector.error = RuntimeError("Collection failed")
+    parallel_registry.register(collector)
+    parallel_registry.register(DeadlineRecorder("fresh"))
+
+    assert collected(parallel_registry) == {"fresh": 1.0}
+    assert (
+        parallel_registry.get_sample_value(
+            f"{PREFIX}_collector_data_age_seconds",
+            {"collector": "CountingCollector"},
+        )
+        is None
+    )
+
+
+def test_polled_collector_is_as_old_as_its_snapshot(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether the metrics of a polled collector are as old as its last
+    poll, and whether it has no staleness metrics before its first poll.
+    """
+    polled = PolledCollector(CountingCollector(), interval=1.0)
+    parallel_registry.register(polled)
+    scrape(parallel_registry)
+    assert (
+        parallel_registry.get_sample_value(
+            f"{PREFIX}_collector_last_success_timestamp_seconds",
+            {"collector": "PolledCollector"},
+        )
+        is None
+    )
+
+    polled.poll()
+    time.sleep(0.1)
+    scrape(parallel_registry)
+    assert parallel_registry.get_sample_value(
+        f"{PREFIX}_collector_last_success_timestamp_seconds",
+        {"collector": "CountingCollector"},
+    ) == pytest.approx(polled.snapshot.timestamp)
+
+
+def test_partial_snapshot_is_not_a_success(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether a polled collector has no staleness metrics while its
+    only snapshot is of a partial poll.
+    """
+    polled = PolledCollector(
+        SteppingCollector(steps=2, duration=0.1), interval=1.0, timeout=0.15
+    )
+    parallel_registry.register(polled)
+    polled.poll()
+
+    samples = scrape(parallel_registry)
+
+    assert samples == {"step0": 1.0}
+
+
+def test_polled_collectors_are_named_after_their_collector(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether the staleness metrics of polled collectors are labelled
+    with the name of the collector they poll, one series for each.
+    """
+    for collector in [CountingCollector(), DeadlineRecorder("metric")]:
+        polled = PolledCollector(collector, interval=1.0)
+        polled.poll()
+        parallel_registry.register(polled)
+
+    samples = [
+        sample
+        for metric in parallel_registry.collect()
+        if metric.name == f"{PREFIX}_collector_data_age_seconds"
+        for sample in metric.samples
+    ]
+
+    assert [sample.labels["collector"] for sample in samples] == [
+        "CountingCollector",
+        "DeadlineRecorder",
+    ]
+
+
+def test_last_success_is_served_for_partial_collection(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether the metrics of the last complete collection of a
+    collector are served when it overruns its deadline halfway through a
+    collection, and whether its last success is left as it was.
+    """
+    last_success = f"{PREFIX}_collector_last_success_timestamp_seconds"
+    collector = SteppingCollector(steps=2, duration=0.1)
+    parallel_registry.register(collector)
+    samples = scrape(parallel_registry)
+    assert samples["step1"] == 1.0
+
+    with deadline.scope(deadline.Deadline(0.15)):
+        partial_samples = scrape(parallel_registry)
+
+    assert collector.collections == 2
+    assert partial_samples["step0"] == partial_samples["step1"] == 1.0
+    assert partial_samples[last_success] == samples[last_success]
+
+
+def test_partial_collection_without_success_is_served(
+    parallel_registry: ParallelRegistry,
+):
+    """
+    Tests whether the metrics of a partial collection are served when the
+    collector never completed one, without counting it as a success.
+    """
+    parallel_registry.register(SteppingCollector(steps=2, duration=0.1))
+
+    with deadline.scope(deadline.Deadline(0.15)):
+        samples = scrape(parallel_registry)
+
+    assert samples == {"step0": 1.0}
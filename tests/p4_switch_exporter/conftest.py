@@ -26,6 +26,9 @@ thrift.protocol.TMultiplexedProtocol = mock.MagicMock()
 thrift.transport = type(sys)("transport")
 thrift.transport.TSocket = mock.MagicMock()
 thrift.transport.TTransport = mock.MagicMock()
+thrift.transport.TTransport.TTransportException = type(
+    "TTransportException", (Exception,), {}
+)
 sys.modules["thrift"] = thrift
 sys.modules["thrift.protocol"] = thrift.protocol
 sys.modules["thrift.transport"] = thrift.transport
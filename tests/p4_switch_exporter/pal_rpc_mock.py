@@ -45,7 +45,7 @@ class Client:
     Mock for the ``tofino.pal_rpc.pal.Client`` class.
     """
 
-    dev_id = 0
+    num_devices = 1
     num_ports = 16
 
     def __init__(self, *args, **kwargs):
@@ -82,6 +82,21 @@ class Client:
             pal_front_port=port // 4 + 1,
         )
 
+    def pal_port_front_panel_port_to_dev_port_get(
+        self,
+        dev_id: int,
+        front_port: int,
+        front_chnl: int,
+    ):
+        self._validate_dev_id(dev_id)
+        port = (front_port - 1) * 4 + front_chnl
+        if front_port < 1 or not 0 <= front_chnl < 4:
+            raise InvalidPalOperation(
+                f"Invalid front panel port {front_port}/{front_chnl}"
+            )
+        self._validate_port(port)
+        return port
+
     def pal_port_oper_status_get(self, dev_id: int, port: int):
         self._validate_dev_id(dev_id)
         self._validate_port(port)
@@ -107,7 +122,7 @@ class Client:
         return random.randint(0, 10000)
 
     def _validate_dev_id(self, dev_id: int):
-        if dev_id != self.dev_id:
+        if not 0 <= dev_id < self.num_devices:
             raise InvalidPalOperation(f"Invalid dev_id {dev_id}")
 
     def _validate_port(self, port: int):
@@ -1,3 +1,7 @@
+# pylint: disable=too-few-public-methods
+# pylint: disable=too-many-lines
+# pylint: disable=too-many-locals
+
 """
 Unit tests for the
 :py:class:`ska_p4_switch_collector.port_collector.PortCollector`.
@@ -6,10 +10,51 @@ Note: the expected values in this test match the hard-coded test data
 provided in ``pal_rpc_mock.py``.
 """
 
+import random
+import time
+
 import pytest
 from prometheus_client import CollectorRegistry
 
+from ska_exporter_common import deadline
+from ska_exporter_common.refresh import RefreshIntervals
+from ska_p4_switch_exporter import port_matrix
 from ska_p4_switch_exporter.port_collector import PortCollector
+from ska_p4_switch_exporter.port_policy import PortPolicy
+from ska_p4_switch_exporter.port_stats import (
+    PORT_STAT_METRICS,
+    PalStat,
+    select_port_stat_metrics,
+)
+
+from . import pal_rpc_mock
+
+
+class FakeTime:
+    """
+    Stand-in for the ``time`` module, with a clock that only moves when
+    told to.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """
+        Read the clock.
+        """
+        return self.now
+
+
+STAT_MATRIX = [
+    False,
+    pytest.param(
+        True,
+        marks=pytest.mark.skipif(
+            not port_matrix.AVAILABLE, reason="NumPy is not available"
+        ),
+    ),
+]
 
 PORTS_UP = [
     (1, 0),
@@ -33,15 +78,40 @@ PORTS_DOWN = [
 ]
 
 
-@pytest.fixture(autouse=True)
-def register(registry: CollectorRegistry):
+@pytest.fixture(
+    autouse=True,
+    params=[(0, 1), (8, 1), (0, 4), (8, 4)],
+    ids=["sequential", "pipelined", "concurrent", "pipelined-concurrent"],
+)
+def register(registry: CollectorRegistry, request: pytest.FixtureRequest):
     """
-    Register the collector with the registry.
+    Register the collector with the registry, with and without pipelining
+    and concurrency.
     """
+    pipeline_depth, concurrency = request.param
     PortCollector(
         rpc_host="",
         rpc_port=9090,
         registry=registry,
+        pipeline_depth=pipeline_depth,
+        concurrency=concurrency,
+    )
+
+
+@pytest.fixture(name="slow_all_stats_get")
+def fxt_slow_all_stats_get(monkeypatch: pytest.MonkeyPatch):
+    """
+    Make retrieving the statistics of the first ports slower than that of
+    the others.
+    """
+    all_stats_get = pal_rpc_mock.Client.pal_port_all_stats_get
+
+    def slow_all_stats_get(self, dev_id: int, port: int):
+        time.sleep(0.05 if port < 4 else 0.01)
+        return all_stats_get(self, dev_id, port)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", slow_all_stats_get
     )
 
 
@@ -58,7 +128,7 @@ def test_port_up(
     assert (
         registry.get_sample_value(
             "p4_switch_port_up",
-            labels={"port": str(port), "channel": str(channel)},
+            labels={"device": "0", "port": str(port), "channel": str(channel)},
         )
         == 1.0
     )
@@ -77,7 +147,7 @@ def test_port_not_up(
     assert (
         registry.get_sample_value(
             "p4_switch_port_up",
-            labels={"port": str(port), "channel": str(channel)},
+            labels={"device": "0", "port": str(port), "channel": str(channel)},
         )
         == 0.0
     )
@@ -112,7 +182,7 @@ def test_port_counters_are_exported_for_all_ports(
     assert (
         registry.get_sample_value(
             metric,
-            labels={"port": str(port), "channel": str(channel)},
+            labels={"device": "0", "port": str(port), "channel": str(channel)},
         )
         is not None
     )
@@ -158,6 +228,7 @@ def test_port_frame_counters_are_exported_for_all_ports(
         registry.get_sample_value(
             metric,
             labels={
+                "device": "0",
                 "port": str(port),
                 "channel": str(channel),
                 "length": length,
@@ -165,3 +236,590 @@ def test_port_frame_counters_are_exported_for_all_ports(
         )
         is not None
     )
+
+
+@pytest.mark.usefixtures("slow_all_stats_get")
+def test_ports_are_exported_in_port_order_with_concurrency():
+    """
+    Tests whether the metrics of the ports are exported in port order when
+    they are collected in parallel, even if earlier ports take longer.
+    """
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        concurrency=4,
+    )
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert [
+        (int(sample.labels["port"]), int(sample.labels["channel"]))
+        for sample in metrics["p4_switch_port_up"].samples
+    ] == sorted(PORTS_UP + PORTS_DOWN)
+
+
+@pytest.mark.usefixtures("slow_all_stats_get")
+def test_concurrent_collection_is_bounded_by_deadline(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """
+    Tests whether the worker threads stop making calls once the deadline of
+    the scrape has passed, and the metrics collected until then are still
+    exported.
+    """
+    clock = FakeTime()
+    monkeypatch.setattr(deadline, "time", clock)
+    # Whether the deadline had passed when each port was read
+    expired = []
+    all_stats_get = pal_rpc_mock.Client.pal_port_all_stats_get
+
+    def expiring_all_stats_get(self, dev_id: int, port: int):
+        expired.append(scrape_deadline.expired())
+        if len(expired) == 4:
+            # The deadline passes while the fourth port is read
+            clock.now += 1.0
+        return all_stats_get(self, dev_id, port)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", expiring_all_stats_get
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        concurrency=2,
+    )
+
+    with deadline.scope(deadline.Deadline(0.5)) as scrape_deadline:
+        metrics = {metric.name: metric for metric in collector.collect()}
+
+    # The other worker may have checked the deadline just before it passed
+    assert expired.count(True) <= 1
+    assert 4 <= len(metrics["p4_switch_port_up"].samples) < 16
+
+
+@pytest.mark.parametrize(
+    "pipeline_depth", [0, 8], ids=["sequential", "pipelined"]
+)
+def test_front_panel_ports_are_static(
+    monkeypatch: pytest.MonkeyPatch, pipeline_depth: int
+):
+    """
+    Tests whether the front panel port of each port is only read once with
+    refresh tiers, while the statistics are read on every collection.
+    """
+    calls = {}
+    for method in [
+        "pal_port_dev_port_to_front_panel_port_get",
+        "pal_port_all_stats_get",
+    ]:
+
+        def counted(
+            self,
+            dev_id: int,
+            port: int,
+            method=method,
+            call=getattr(pal_rpc_mock.Client, method),
+        ):
+            calls[method] = calls.get(method, 0) + 1
+            return call(self, dev_id, port)
+
+        monkeypatch.setattr(pal_rpc_mock.Client, method, counted)
+
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        pipeline_depth=pipeline_depth,
+        refresh_intervals=RefreshIntervals(),
+    )
+    for _ in range(3):
+        metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert calls == {
+        "pal_port_dev_port_to_front_panel_port_get": 16,
+        "pal_port_all_stats_get": 48,
+    }
+    assert len(metrics["p4_switch_port_up"].samples) == 16
+
+
+@pytest.mark.parametrize(
+    "pipeline_depth", [0, 8], ids=["sequential", "pipelined"]
+)
+def test_port_topology_is_cached(
+    monkeypatch: pytest.MonkeyPatch, pipeline_depth: int
+):
+    """
+    Tests whether the ports are only enumerated again when the first or
+    last port changes, which is checked with three calls and one for each
+    of the 11 ports that are not valid.
+    """
+    calls = []
+    for method in [
+        "pal_port_get_first",
+        "pal_port_get_next",
+        "pal_port_is_valid",
+        "pal_port_dev_port_to_front_panel_port_get",
+    ]:
+
+        def counted(
+            self,
+            *args,
+            method=method,
+            call=getattr(pal_rpc_mock.Client, method),
+        ):
+            calls.append(method)
+            return call(self, *args)
+
+        monkeypatch.setattr(pal_rpc_mock.Client, method, counted)
+
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        pipeline_depth=pipeline_depth,
+        refresh_intervals=RefreshIntervals(),
+    )
+
+    def port_count():
+        metrics = {metric.name: metric for metric in collector.collect()}
+        return len(metrics["p4_switch_port_up"].samples)
+
+    assert port_count() == 16
+    enumeration = len(calls)
+    calls.clear()
+    assert port_count() == 16
+    assert (
+        sorted(calls)
+        == [
+            "pal_port_get_first",
+            "pal_port_get_next",
+        ]
+        + ["pal_port_is_valid"] * 12
+    )
+
+    # Ports added after the last one
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_ports", 20)
+    calls.clear()
+    assert port_count() == 20
+    assert len(calls) > enumeration
+
+    # Ports removed, the last one being no longer valid
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_ports", 12)
+    assert port_count() == 12
+
+
+def test_port_becoming_valid_is_found(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the ports are enumerated again when a port in the middle
+    of the enumeration becomes valid.
+    """
+    inserted = set()
+    is_valid = pal_rpc_mock.Client.pal_port_is_valid
+    monkeypatch.setattr(
+        pal_rpc_mock.Client,
+        "pal_port_is_valid",
+        lambda self, dev_id, port: port not in {5} - inserted
+        and is_valid(self, dev_id, port),
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        refresh_intervals=RefreshIntervals(),
+    )
+
+    def ports():
+        metrics = {metric.name: metric for metric in collector.collect()}
+        return [
+            sample.labels["port"]
+            for sample in metrics["p4_switch_port_up"].samples
+        ]
+
+    assert len(ports()) == 15
+    inserted.add(5)
+    assert len(ports()) == 16
+
+
+def test_ports_are_enumerated_again_periodically(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """
+    Tests whether the ports are enumerated again every topology interval,
+    so that a port inserted in the middle of the enumeration is found even
+    without a static refresh interval.
+    """
+    # Port 5 is skipped by the enumeration until it is inserted
+    inserted = set()
+    get_next = pal_rpc_mock.Client.pal_port_get_next
+    monkeypatch.setattr(
+        pal_rpc_mock.Client,
+        "pal_port_get_next",
+        lambda self, dev_id, port: get_next(
+            self, dev_id, port if port != 4 or 5 in inserted else 5
+        ),
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        refresh_intervals=RefreshIntervals(),
+        topology_interval=0.1,
+    )
+
+    def port_count():
+        metrics = {metric.name: metric for metric in collector.collect()}
+        return len(metrics["p4_switch_port_up"].samples)
+
+    assert port_count() == 15
+    inserted.add(5)
+    assert port_count() == 15
+
+    time.sleep(0.1)
+    assert port_count() == 16
+
+
+def test_removed_port_is_enumerated_again(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the ports are enumerated again after a collection failed
+    on a port that was removed.
+    """
+    removed = set()
+    is_valid = pal_rpc_mock.Client.pal_port_is_valid
+    oper_status_get = pal_rpc_mock.Client.pal_port_oper_status_get
+
+    def removable_oper_status_get(self, dev_id: int, port: int):
+        if port in removed:
+            raise pal_rpc_mock.InvalidPalOperation(f"No port {port}")
+        return oper_status_get(self, dev_id, port)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client,
+        "pal_port_is_valid",
+        lambda self, dev_id, port: port not in removed
+        and is_valid(self, dev_id, port),
+    )
+    monkeypatch.setattr(
+        pal_rpc_mock.Client,
+        "pal_port_oper_status_get",
+        removable_oper_status_get,
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        refresh_intervals=RefreshIntervals(),
+    )
+    list(collector.collect())
+
+    removed.add(5)
+    with pytest.raises(pal_rpc_mock.InvalidPalOperation):
+        list(collector.collect())
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+    assert len(metrics["p4_switch_port_up"].samples) == 15
+
+
+def test_selected_stat_metrics_are_exported():
+    """
+    Tests whether only the selected port statistics metrics are exported,
+    with a sample per value of their labels.
+    """
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        stat_metrics=select_port_stat_metrics(
+            include=["*priority_frames", "p4_switch_port_stats_pal"]
+        ),
+    )
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert list(metrics) == [
+        "p4_switch_port_up",
+        "p4_switch_port_stats_rx_priority_frames",
+        "p4_switch_port_stats_tx_priority_frames",
+        "p4_switch_port_stats_pal",
+    ]
+    assert len(metrics["p4_switch_port_stats_rx_priority_frames"].samples) == (
+        16 * 8
+    )
+    assert len(metrics["p4_switch_port_stats_pal"].samples) == 16 * len(
+        PalStat
+    )
+
+
+@pytest.mark.parametrize("stat_matrix", STAT_MATRIX)
+def test_port_rates(monkeypatch: pytest.MonkeyPatch, stat_matrix: bool):
+    """
+    Tests whether the rates of the ports are exported from the second
+    collection on, and whether counters that were reset, e.g. because
+    bf_switchd restarted, are assumed to have increased from 0.
+    """
+    counters = {"value": 1000}
+
+    def all_stats_get(_, _dev_id: int, port: int):
+        entry = [counters["value"] + port] * pal_rpc_mock.STAT_COUNT
+        entry[PalStat.FramesReceivedOK] = counters["value"] // 2 + port
+        return pal_rpc_mock.PortStats(entry, len(entry), 0)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", all_stats_get
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        rates=True,
+        stat_matrix=stat_matrix,
+    )
+
+    def collect_rates() -> tuple[dict, float, float]:
+        start = time.monotonic()
+        metrics = list(collector.collect())
+        end = time.monotonic()
+        rates = {
+            metric.name: {
+                (sample.labels["port"], sample.labels["channel"]): sample.value
+                for sample in metric.samples
+            }
+            for metric in metrics
+            if metric.name.endswith("_per_second")
+        }
+        return rates, start, end
+
+    rates, first_start, first_end = collect_rates()
+    assert rates and not any(rates.values())
+
+    time.sleep(0.05)
+    counters["value"] = 3000
+    rates, second_start, second_end = collect_rates()
+    assert len(rates["p4_switch_port_rx_bytes_per_second"]) == 16
+    for name, increase in [
+        ("p4_switch_port_rx_bytes_per_second", 2000),
+        ("p4_switch_port_tx_frames_per_second", 2000),
+        ("p4_switch_port_rx_errors_per_second", 1000),
+        ("p4_switch_port_tx_errors_per_second", 0),
+    ]:
+        rate = rates[name][("1", "0")]
+        assert increase / (second_end - first_start) <= rate
+        assert rate <= increase / (second_start - first_end)
+
+    counters["value"] = 500
+    rates, third_start, third_end = collect_rates()
+    rate = rates["p4_switch_port_rx_bytes_per_second"][("1", "0")]
+    assert 500 / (third_end - second_start) <= rate
+    assert rate <= 500 / (third_start - second_end)
+
+
+def test_port_rates_of_cached_stats_are_kept(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether statistics served from the refresh cache keep the rates
+    computed when they were read, instead of dropping to 0.
+    """
+    counters = {"value": 1000}
+
+    def all_stats_get(*_):
+        counters["value"] += 1000
+        entry = [counters["value"]] * pal_rpc_mock.STAT_COUNT
+        return pal_rpc_mock.PortStats(entry, len(entry), 0)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", all_stats_get
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        rates=True,
+        refresh_intervals=RefreshIntervals(fast=0.2),
+    )
+
+    def rx_bytes_rate():
+        registry = CollectorRegistry()
+        registry.register(collector)
+        return registry.get_sample_value(
+            "p4_switch_port_rx_bytes_per_second",
+            {"device": "0", "port": "1", "channel": "0"},
+        )
+
+    assert rx_bytes_rate() is None
+    time.sleep(0.25)
+    rate = rx_bytes_rate()
+    assert rate > 0
+    assert rx_bytes_rate() == rate
+
+
+@pytest.mark.skipif(not port_matrix.AVAILABLE, reason="NumPy is not available")
+def test_stat_matrix_exports_the_same_metrics():
+    """
+    Tests whether the metrics derived from the statistics matrix are the
+    same as those derived one port at a time.
+    """
+    collected = []
+    for stat_matrix in [False, True]:
+        random.seed(42)
+        collector = PortCollector(
+            rpc_host="",
+            rpc_port=9090,
+            registry=None,
+            stat_metrics=PORT_STAT_METRICS,
+            stat_matrix=stat_matrix,
+        )
+        collected.append(list(collector.collect()))
+
+    assert collected[0] == collected[1]
+
+
+@pytest.mark.parametrize(
+    "pipeline_depth", [0, 8], ids=["sequential", "pipelined"]
+)
+def test_stats_of_down_ports_are_read_less_often(
+    monkeypatch: pytest.MonkeyPatch, pipeline_depth: int
+):
+    """
+    Tests whether the statistics of the ports that are down are exported
+    again instead of read, until the ports come up.
+    """
+    up = {0, 8}
+    stats_calls = []
+    all_stats_get = pal_rpc_mock.Client.pal_port_all_stats_get
+
+    def counted(self, dev_id: int, port: int):
+        stats_calls.append(port)
+        return all_stats_get(self, dev_id, port)
+
+    monkeypatch.setattr(pal_rpc_mock.Client, "pal_port_all_stats_get", counted)
+    monkeypatch.setattr(
+        pal_rpc_mock.Client,
+        "pal_port_oper_status_get",
+        lambda _, dev_id, port: int(port in up),
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        pipeline_depth=pipeline_depth,
+        policy=PortPolicy(down_interval=60.0),
+    )
+
+    def collect() -> dict:
+        return {
+            (sample.labels["port"], sample.labels["channel"]): sample.value
+            for metric in collector.collect()
+            if metric.name == "p4_switch_port_stats_rx_bytes"
+            for sample in metric.samples
+        }
+
+    first = collect()
+    assert len(stats_calls) == 16
+
+    stats_calls.clear()
+    second = collect()
+    assert sorted(stats_calls) == [0, 8]
+    assert second[("1", "1")] == first[("1", "1")]
+
+    # A port that comes up is read right away
+    stats_calls.clear()
+    up.add(1)
+    collect()
+    assert sorted(stats_calls) == [0, 1, 8]
+
+
+def test_ports_are_selected_by_policy():
+    """
+    Tests whether only the ports selected by the policy are collected.
+    """
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        policy=PortPolicy(include=["1/.*", "3/0"], exclude=["1/3"]),
+    )
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert [
+        (sample.labels["port"], sample.labels["channel"])
+        for sample in metrics["p4_switch_port_up"].samples
+    ] == [("1", "0"), ("1", "1"), ("1", "2"), ("3", "0")]
+
+
+@pytest.mark.parametrize(
+    ("pipeline_depth", "concurrency"),
+    [(0, 1), (8, 1), (0, 4)],
+    ids=["sequential", "pipelined", "concurrent"],
+)
+def test_ports_of_all_devices_are_collected(
+    monkeypatch: pytest.MonkeyPatch, pipeline_depth: int, concurrency: int
+):
+    """
+    Tests whether the ports of every device are collected, with the device
+    in their labels, and whether devices without ports are skipped.
+    """
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_devices", 2)
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        pipeline_depth=pipeline_depth,
+        concurrency=concurrency,
+        refresh_intervals=RefreshIntervals(),
+        max_devices=3,
+    )
+
+    def collect_ports() -> list[tuple[str, str, str]]:
+        metrics = {metric.name: metric for metric in collector.collect()}
+        return [
+            (
+                sample.labels["device"],
+                sample.labels["port"],
+                sample.labels["channel"],
+            )
+            for sample in metrics["p4_switch_port_up"].samples
+        ]
+
+    ports = [
+        (str(device), str(port), str(channel))
+        for device in range(2)
+        for port, channel in sorted(PORTS_UP + PORTS_DOWN)
+    ]
+    assert collect_ports() == ports
+    assert collect_ports() == ports
+
+    # A device that goes away
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_devices", 1)
+    assert collect_ports() == ports[:16]
+
+
+def test_devices_are_collected_in_parallel(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether a collection takes as long as that of the slowest device,
+    rather than that of all devices.
+    """
+    all_stats_get = pal_rpc_mock.Client.pal_port_all_stats_get
+
+    def slow_all_stats_get(self, dev_id: int, port: int):
+        time.sleep(0.02 if dev_id else 0.01)
+        return all_stats_get(self, dev_id, port)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", slow_all_stats_get
+    )
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_devices", 2)
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        max_devices=2,
+    )
+
+    start = time.monotonic()
+    metrics = {metric.name: metric for metric in collector.collect()}
+    elapsed = time.monotonic() - start
+
+    assert len(metrics["p4_switch_port_up"].samples) == 32
+    # 0.32 s for the slowest device, 0.48 s for both one after the other
+    assert 0.32 <= elapsed < 0.44
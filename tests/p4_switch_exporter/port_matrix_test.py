@@ -0,0 +1,132 @@
+"""
+Unit tests for the :py:mod:`ska_p4_switch_exporter.port_matrix` module.
+"""
+
+import random
+
+import pytest
+from prometheus_client.core import CounterMetricFamily
+
+from ska_p4_switch_exporter import port_matrix
+from ska_p4_switch_exporter.port_stats import (
+    PORT_STAT_METRICS,
+    PalStat,
+    evaluate,
+    increase,
+)
+
+pytestmark = pytest.mark.skipif(
+    not port_matrix.AVAILABLE, reason="NumPy is not available"
+)
+
+
+@pytest.fixture(name="entries")
+def fxt_entries() -> list[list[int]]:
+    """
+    Statistics of a few ports, spread over the range of the counters.
+    """
+    rng = random.Random(0)
+    return [
+        [rng.randrange(0, 2**63) >> rng.randrange(0, 63) for _ in PalStat]
+        for _ in range(8)
+    ]
+
+
+def test_expressions_are_evaluated_for_every_port(entries: list[list[int]]):
+    """
+    Tests whether the expressions evaluated against the matrix are equal
+    to those evaluated one port at a time.
+    """
+    matrix = port_matrix.PortStatMatrix(entries)
+
+    for metric in PORT_STAT_METRICS:
+        expressions = list(metric.samples.values())
+        assert matrix.evaluate(expressions).tolist() == [
+            [evaluate(expression, entry) for expression in expressions]
+            for entry in entries
+        ]
+
+
+def test_samples_are_added_in_bulk(entries: list[list[int]]):
+    """
+    Tests whether the samples added in bulk are the same as those added
+    one at a time.
+    """
+    matrix = port_matrix.PortStatMatrix(entries)
+    port_labels = [["0", str(port), "0"] for port in range(len(entries))]
+    sample_labels = port_matrix.SampleLabels()
+    sample_labels.update(port_labels)
+
+    for metric in PORT_STAT_METRICS:
+        bulk, single = (
+            metric.family(
+                metric.name,
+                metric.documentation,
+                labels=["device", "port", "channel", *metric.labels],
+            )
+            for _ in range(2)
+        )
+        matrix.add_samples(bulk, metric, sample_labels.get(metric))
+        for labels, entry in zip(port_labels, entries):
+            for label_values, expression in metric.samples.items():
+                single.add_metric(
+                    [*labels, *label_values], evaluate(expression, entry)
+                )
+
+        assert bulk == single
+
+
+def test_empty_matrix():
+    """
+    Tests whether a matrix without ports adds no samples.
+    """
+    matrix = port_matrix.PortStatMatrix([])
+    family = CounterMetricFamily(
+        "test", "Test", labels=["device", "port", "channel"]
+    )
+    matrix.add_samples(
+        family,
+        PORT_STAT_METRICS[1],
+        port_matrix.SampleLabels().get(PORT_STAT_METRICS[1]),
+    )
+
+    assert not family.samples
+    assert port_matrix.rates([], [], []) == []
+
+
+def test_rates():
+    """
+    Tests whether the rates of several ports are computed at once, the same
+    way as one port at a time, including counters that were reset.
+    """
+    values = [[3000.0, 500.0], [10.0, 10.0]]
+    last = [[1000.0, 100000.0], [10.0, 0.0]]
+    elapsed = [2.0, 0.5]
+
+    assert port_matrix.rates(values, last, elapsed) == [
+        tuple(
+            increase(value, last_value) / port_elapsed
+            for value, last_value in zip(port_values, port_last)
+        )
+        for port_values, port_last, port_elapsed in zip(values, last, elapsed)
+    ]
+    assert port_matrix.rates(values, last, elapsed)[0] == (1000.0, 250.0)
+
+
+def test_sample_labels_follow_the_ports():
+    """
+    Tests whether the labels of the samples are kept while the ports stay
+    the same, and built again once they change.
+    """
+    metric = PORT_STAT_METRICS[0]
+    sample_labels = port_matrix.SampleLabels()
+    sample_labels.update([["0", "1", "0"], ["0", "1", "1"]])
+    labels = sample_labels.get(metric)
+
+    sample_labels.update([["0", "1", "0"], ["0", "1", "1"]])
+    assert sample_labels.get(metric) is labels
+
+    sample_labels.update([["0", "1", "0"]])
+    assert sample_labels.get(metric) == [
+        {"device": "0", "port": "1", "channel": "0"}
+    ]
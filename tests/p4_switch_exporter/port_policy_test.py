@@ -0,0 +1,63 @@
+"""
+Unit tests for the :py:mod:`ska_p4_switch_exporter.port_policy` module.
+"""
+
+import re
+
+import pytest
+
+from ska_p4_switch_exporter.port_policy import PortPolicy
+
+
+def test_all_ports_are_selected_by_default():
+    """
+    Tests whether all ports are collected without patterns.
+    """
+    assert PortPolicy().selects(["1", "0"])
+    assert PortPolicy().selects(["32", "3"])
+
+
+@pytest.mark.parametrize(
+    ("include", "exclude", "selected"),
+    [
+        (["1/0", "2/0"], [], ["1/0", "2/0"]),
+        (["1/.*"], [], ["1/0", "1/1"]),
+        ([], ["2/.*"], ["1/0", "1/1", "10/1"]),
+        (["1.*"], ["1/1"], ["1/0", "10/1"]),
+        (["1"], [], []),
+    ],
+)
+def test_ports_are_selected_by_pattern(
+    include: list[str], exclude: list[str], selected: list[str]
+):
+    """
+    Tests whether ports are selected by allowlist and regular expressions,
+    which match the whole front panel port.
+    """
+    policy = PortPolicy(include=include, exclude=exclude)
+    ports = ["1/0", "1/1", "2/0", "10/1"]
+
+    assert [
+        port for port in ports if policy.selects(port.split("/"))
+    ] == selected
+
+
+def test_invalid_pattern():
+    """
+    Tests whether invalid regular expressions are rejected up front.
+    """
+    with pytest.raises(re.error):
+        PortPolicy(include=["1/("])
+
+
+def test_stats_of_down_ports_are_reused():
+    """
+    Tests whether only the statistics of ports that are down are reused,
+    until they are older than the interval.
+    """
+    policy = PortPolicy(down_interval=60.0)
+
+    assert policy.reuses_stats(0, 30.0)
+    assert not policy.reuses_stats(0, 60.0)
+    assert not policy.reuses_stats(1, 30.0)
+    assert not PortPolicy().reuses_stats(0, 30.0)
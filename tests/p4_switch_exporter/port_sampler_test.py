@@ -0,0 +1,251 @@
+# pylint: disable=too-few-public-methods
+
+"""
+Unit tests for the :py:mod:`ska_p4_switch_exporter.port_sampler` module.
+"""
+
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from ska_p4_switch_exporter import port_sampler
+from ska_p4_switch_exporter.port_sampler import (
+    PortSampler,
+    parse_front_panel_port,
+)
+
+from . import pal_rpc_mock
+
+
+class FakeTime:
+    """
+    Stand-in for the ``time`` module, with a clock that only moves when
+    told to.
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        """
+        Read the clock.
+        """
+        return self.now
+
+
+@pytest.fixture(name="counters")
+def fxt_counters(monkeypatch: pytest.MonkeyPatch) -> dict[int, int]:
+    """
+    Make the counters of each device port the value set for it, 0 unless
+    set.
+    """
+    counters = {}
+
+    def all_stats_get(_, _dev_id: int, port: int):
+        entry = [counters.get(port, 0)] * pal_rpc_mock.STAT_COUNT
+        return pal_rpc_mock.PortStats(entry, len(entry), 0)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", all_stats_get
+    )
+    return counters
+
+
+@pytest.fixture(name="clock")
+def fxt_clock(monkeypatch: pytest.MonkeyPatch) -> FakeTime:
+    """
+    Make the sampler read a fake clock.
+    """
+    clock = FakeTime()
+    monkeypatch.setattr(port_sampler, "time", clock)
+    return clock
+
+
+def sampled(
+    sampler: PortSampler, name: str, port: str = "1", device: str = "0"
+) -> float | None:
+    """
+    Get a sampled rate of channel 0 of a front panel port.
+    """
+    registry = CollectorRegistry()
+    registry.register(sampler)
+    return registry.get_sample_value(
+        name, {"device": device, "port": port, "channel": "0"}
+    )
+
+
+def test_parse_front_panel_port():
+    """
+    Tests whether front panel ports are parsed from ``PORT/CHANNEL``.
+    """
+    assert parse_front_panel_port("12/3") == (12, 3)
+    for value in ["12", "12/3/4", "a/b"]:
+        with pytest.raises(ValueError):
+            parse_front_panel_port(value)
+
+
+@pytest.mark.parametrize("pipeline_depth", [0, 2])
+def test_bursts_are_exported(
+    counters: dict[int, int], clock: FakeTime, pipeline_depth: int
+):
+    """
+    Tests whether the highest and 99th percentile rates over the window
+    are exported, so that a single burst shows in the maximum only.
+    """
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0), (2, 0), (3, 0)],
+        interval=0.1,
+        window=20.0,
+        registry=None,
+        pipeline_depth=pipeline_depth,
+    )
+
+    sampler.sample()
+    assert sampled(sampler, "p4_switch_port_rx_bits_per_second_max") is None
+
+    for i in range(200):
+        clock.now += 0.1
+        counters[0] = counters.get(0, 0) + (11000 if i == 100 else 1000)
+        sampler.sample()
+
+    names = [
+        "p4_switch_port_rx_bits_per_second",
+        "p4_switch_port_tx_bits_per_second",
+    ]
+    for name in names:
+        assert sampled(sampler, f"{name}_max") == pytest.approx(880000)
+        assert sampled(sampler, f"{name}_p99") == pytest.approx(80000)
+    assert sampled(
+        sampler, "p4_switch_port_rx_frames_per_second_max"
+    ) == pytest.approx(110000)
+    assert sampled(sampler, f"{names[0]}_max", port="2") == 0
+
+    # Once the burst is out of the window, it is no longer exported
+    clock.now += 10.5
+    assert sampled(sampler, f"{names[0]}_max") == pytest.approx(80000)
+
+
+def test_ring_buffer_is_bounded(counters: dict[int, int], clock: FakeTime):
+    """
+    Tests whether only the rates of the window are kept, however many
+    samples are taken.
+    """
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0)],
+        interval=0.1,
+        window=1.0,
+        registry=None,
+    )
+
+    for _ in range(100):
+        clock.now += 0.1
+        counters[0] = counters.get(0, 0) + 1000
+        sampler.sample()
+
+    # pylint: disable-next=protected-access
+    assert len(sampler._rates[(1, 0)]) == 11
+
+
+def test_counter_reset(counters: dict[int, int], clock: FakeTime):
+    """
+    Tests whether a counter that went down, e.g. because bf_switchd
+    restarted, is assumed to have increased from 0.
+    """
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0)],
+        interval=0.1,
+        window=1.0,
+        registry=None,
+    )
+    counters[0] = 100000
+    sampler.sample()
+
+    clock.now += 0.1
+    counters[0] = 500
+    sampler.sample()
+
+    assert sampled(
+        sampler, "p4_switch_port_rx_bits_per_second_max"
+    ) == pytest.approx(40000)
+
+
+def test_missing_port_is_not_sampled(
+    counters: dict[int, int], clock: FakeTime
+):
+    """
+    Tests whether front panel ports that do not exist are left out, while
+    the others are sampled.
+    """
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0), (99, 0)],
+        interval=0.1,
+        window=1.0,
+        registry=None,
+    )
+    for _ in range(2):
+        clock.now += 0.1
+        counters[0] = counters.get(0, 0) + 1000
+        sampler.sample()
+
+    assert sampled(sampler, "p4_switch_port_rx_bits_per_second_max") > 0
+    assert sampled(sampler, "p4_switch_port_rx_bits_per_second_max", "99") is (
+        None
+    )
+
+
+def test_ports_of_device_are_sampled(
+    monkeypatch: pytest.MonkeyPatch, counters: dict[int, int], clock: FakeTime
+):
+    """
+    Tests whether the ports of the given device are sampled, and labelled
+    with it.
+    """
+    monkeypatch.setattr(pal_rpc_mock.Client, "num_devices", 2)
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0)],
+        interval=0.1,
+        window=1.0,
+        registry=None,
+        device=1,
+    )
+    for _ in range(2):
+        clock.now += 0.1
+        counters[0] = counters.get(0, 0) + 1000
+        sampler.sample()
+
+    name = "p4_switch_port_rx_bits_per_second_max"
+    assert sampled(sampler, name, device="1") == pytest.approx(80000)
+    assert sampled(sampler, name) is None
+
+
+def test_sampling_in_background(counters: dict[int, int]):
+    """
+    Tests whether the ports are sampled in the background once started.
+    """
+    counters[0] = 1000
+    sampler = PortSampler(
+        rpc_host="",
+        rpc_port=9090,
+        ports=[(1, 0)],
+        interval=0.05,
+        window=1.0,
+        registry=None,
+    )
+    sampler.start()
+    try:
+        time.sleep(0.3)
+    finally:
+        sampler.stop(timeout=1)
+
+    assert sampled(sampler, "p4_switch_port_rx_bits_per_second_max") == 0
@@ -0,0 +1,88 @@
+"""
+Unit tests for the :py:mod:`ska_p4_switch_exporter.port_stats` module.
+"""
+
+from ska_p4_switch_exporter.port_stats import (
+    PORT_STAT_METRICS,
+    PalStat,
+    StatDifference,
+    select_port_stat_metrics,
+)
+
+
+def test_every_stat_is_exported_by_a_metric():
+    """
+    Tests whether every statistic returned by the PAL RPC is exported by a
+    metric of its own, besides the metric exporting all of them.
+    """
+    stats = set()
+    for metric in PORT_STAT_METRICS:
+        if metric.name == "p4_switch_port_stats_pal":
+            continue
+        for expression in metric.samples.values():
+            if isinstance(expression, StatDifference):
+                stats |= {expression.minuend, expression.subtrahend}
+            else:
+                stats.add(expression)
+
+    assert stats == set(PalStat)
+
+
+def test_default_metrics_are_selected():
+    """
+    Tests whether the metrics exported by default are selected without
+    any patterns.
+    """
+    selected = select_port_stat_metrics()
+
+    assert len(selected) == 12
+    assert all(metric.default for metric in selected)
+
+
+def test_metrics_are_selected_by_pattern():
+    """
+    Tests whether metrics can be included and excluded by pattern, in the
+    order of the table.
+    """
+    selected = select_port_stat_metrics(
+        include=["*pause*", "p4_switch_port_stats_rx_bytes"],
+        exclude=["*microseconds"],
+    )
+
+    assert [metric.name for metric in selected] == [
+        "p4_switch_port_stats_rx_bytes",
+        "p4_switch_port_stats_rx_pause_frames",
+        "p4_switch_port_stats_tx_pause_frames",
+        "p4_switch_port_stats_rx_priority_pause_frames",
+        "p4_switch_port_stats_tx_priority_pause_frames",
+    ]
+
+
+def test_defaults_can_be_excluded():
+    """
+    Tests whether metrics exported by default can be excluded.
+    """
+    selected = select_port_stat_metrics(exclude=["*_frames"])
+
+    assert [metric.name for metric in selected] == [
+        "p4_switch_port_stats_rx_bytes",
+        "p4_switch_port_stats_tx_bytes",
+        "p4_switch_port_stats_rx_errors",
+        "p4_switch_port_stats_tx_errors",
+    ]
+
+
+def test_derived_values():
+    """
+    Tests whether the values of the samples are evaluated from the
+    statistics of a port.
+    """
+    entry = list(range(100, 100 + len(PalStat)))
+    rx_errors = next(
+        metric
+        for metric in PORT_STAT_METRICS
+        if metric.name == "p4_switch_port_stats_rx_errors"
+    )
+
+    assert rx_errors.value(rx_errors.samples[()], entry) == 1.0
+    assert rx_errors.value(PalStat.FramesTruncated, entry) == 188.0
@@ -6,21 +6,27 @@ Note: the expected values in this test match the hard-coded test data
 provided in ``pltfm_mgr_rpc_mock.py``.
 """
 
+import time
+
 import pytest
 from prometheus_client import CollectorRegistry
 
+from ska_exporter_common.refresh import RefreshIntervals
 from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
 
+from . import pltfm_mgr_rpc_mock
+
 
-@pytest.fixture(autouse=True)
-def register(registry: CollectorRegistry):
+@pytest.fixture(autouse=True, params=[1, 4], ids=["sequential", "concurrent"])
+def register(registry: CollectorRegistry, request: pytest.FixtureRequest):
     """
-    Register the collector with the registry.
+    Register the collector with the registry, with and without concurrency.
     """
     QSFPCollector(
         rpc_host="",
         rpc_port=9090,
         registry=registry,
+        concurrency=request.param,
     )
 
 
@@ -421,3 +427,225 @@ def test_qsfp_tx_power_threshold_metric(
         assert actual is not None
     else:
         assert actual is None
+
+
+def test_slow_qsfp_does_not_hold_up_others(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the other QSFPs are read while a slow QSFP is being read,
+    and all QSFPs are still exported in port order.
+    """
+    info_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_qsfp_info_get
+    reads = []
+
+    def slow_info_get(self, port: int):
+        if port == 1:
+            time.sleep(0.1)
+        reads.append(port)
+        return info_get(self, port)
+
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client, "pltfm_mgr_qsfp_info_get", slow_info_get
+    )
+    collector = QSFPCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        concurrency=2,
+    )
+
+    metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert reads == [3, 5, 1]
+    assert [
+        sample.labels["port"]
+        for sample in metrics["p4_switch_qsfp_present"].samples
+    ] == ["1", "2", "3", "4", "5"]
+
+
+def test_refresh_tiers(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the readings are only read again once older than the
+    interval of their tier, and the thresholds when a QSFP is plugged in.
+    """
+    calls = {}
+    for method in [
+        "pltfm_mgr_qsfp_temperature_get",
+        "pltfm_mgr_qsfp_thresholds_get",
+    ]:
+
+        def counted(
+            self,
+            port: int,
+            method=method,
+            call=getattr(pltfm_mgr_rpc_mock.Client, method),
+        ):
+            calls[method] = calls.get(method, 0) + 1
+            return call(self, port)
+
+        monkeypatch.setattr(pltfm_mgr_rpc_mock.Client, method, counted)
+
+    unplugged = set()
+    presence_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_qsfp_presence_get
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client,
+        "pltfm_mgr_qsfp_presence_get",
+        lambda self, port: port not in unplugged and presence_get(self, port),
+    )
+    collector = QSFPCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        refresh_intervals=RefreshIntervals(medium=0.2),
+    )
+
+    list(collector.collect())
+    list(collector.collect())
+    assert calls == {
+        "pltfm_mgr_qsfp_temperature_get": 3,
+        "pltfm_mgr_qsfp_thresholds_get": 3,
+    }
+
+    time.sleep(0.2)
+    list(collector.collect())
+    assert calls["pltfm_mgr_qsfp_temperature_get"] == 6
+    assert calls["pltfm_mgr_qsfp_thresholds_get"] == 3
+
+    # Unplug the QSFP of port 3, then plug it back in
+    unplugged.add(3)
+    list(collector.collect())
+    unplugged.clear()
+    list(collector.collect())
+    assert calls["pltfm_mgr_qsfp_thresholds_get"] == 4
+
+
+def test_adaptive_refresh(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether flat readings are read less and less often with adaptive
+    refresh, except those beyond their alarm thresholds.
+    """
+    reads = []
+    voltage_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_qsfp_voltage_get
+
+    def counted_voltage_get(self, port: int):
+        reads.append(port)
+        return voltage_get(self, port)
+
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client,
+        "pltfm_mgr_qsfp_voltage_get",
+        counted_voltage_get,
+    )
+    collector = QSFPCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        refresh_intervals=RefreshIntervals(adaptive_max=10.0),
+    )
+
+    for _ in range(4):
+        list(collector.collect())
+
+    # Port 1 has no thresholds, it is read again once before backing off,
+    # while the voltage of ports 3 and 5 is above their alarm threshold
+    assert reads.count(1) == 2
+    assert reads.count(3) == 4
+    assert reads.count(5) == 4
+
+
+def test_module_is_read_again_when_serial_changes(
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """
+    Tests whether the thresholds and readings of a module are kept when its
+    information is read again, unless its serial number changed or it was
+    plugged in.
+    """
+    calls = {}
+    serials = {}
+    info_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_qsfp_info_get
+    for method in [
+        "pltfm_mgr_qsfp_temperature_get",
+        "pltfm_mgr_qsfp_thresholds_get",
+    ]:
+
+        def counted(
+            self,
+            port: int,
+            method=method,
+            call=getattr(pltfm_mgr_rpc_mock.Client, method),
+        ):
+            if port == 3:
+                calls[method] = calls.get(method, 0) + 1
+            return call(self, port)
+
+        monkeypatch.setattr(pltfm_mgr_rpc_mock.Client, method, counted)
+
+    def counted_info_get(self, port: int):
+        if port == 3:
+            calls["pltfm_mgr_qsfp_info_get"] = (
+                calls.get("pltfm_mgr_qsfp_info_get", 0) + 1
+            )
+        info = info_get(self, port)
+        if port in serials:
+            serial = bytes.hex(serials[port].ljust(16).encode())
+            info = info[:392] + serial + info[424:]
+        return info
+
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client, "pltfm_mgr_qsfp_info_get", counted_info_get
+    )
+    unplugged = set()
+    presence_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_qsfp_presence_get
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client,
+        "pltfm_mgr_qsfp_presence_get",
+        lambda self, port: port not in unplugged and presence_get(self, port),
+    )
+    registry = CollectorRegistry()
+    QSFPCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=registry,
+        refresh_intervals=RefreshIntervals(medium=10.0, static=0.5),
+    )
+
+    def serial(port: str) -> str | None:
+        for metric in registry.collect():
+            for sample in metric.samples:
+                if (
+                    sample.name == "p4_switch_qsfp_info"
+                    and sample.labels["port"] == port
+                ):
+                    return sample.labels["serial"]
+        return None
+
+    assert serial("3") == "3" * 16
+    assert serial("3") == "3" * 16
+    assert calls == {
+        "pltfm_mgr_qsfp_info_get": 1,
+        "pltfm_mgr_qsfp_temperature_get": 1,
+        "pltfm_mgr_qsfp_thresholds_get": 1,
+    }
+
+    # Another module, swapped in between two collections, is only noticed
+    # once the information is read again
+    serials[3] = "replaced"
+    assert serial("3") == "3" * 16
+    time.sleep(0.5)
+    assert serial("3") == "replaced"
+    assert calls == {
+        "pltfm_mgr_qsfp_info_get": 2,
+        "pltfm_mgr_qsfp_temperature_get": 2,
+        "pltfm_mgr_qsfp_thresholds_get": 2,
+    }
+
+    # Unplug the QSFP of port 3, then plug it back in
+    unplugged.add(3)
+    assert serial("3") is None
+    unplugged.clear()
+    assert serial("3") == "replaced"
+    assert calls == {
+        "pltfm_mgr_qsfp_info_get": 3,
+        "pltfm_mgr_qsfp_temperature_get": 3,
+        "pltfm_mgr_qsfp_thresholds_get": 3,
+    }
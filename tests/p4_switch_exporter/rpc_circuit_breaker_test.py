@@ -0,0 +1,151 @@
+"""
+Unit tests for the
+:py:class:`ska_p4_switch_exporter.rpc_circuit_breaker.CircuitBreaker`.
+"""
+
+import pytest
+
+from ska_p4_switch_exporter.rpc_circuit_breaker import (
+    CircuitBreaker,
+    CircuitState,
+)
+
+
+class FakeClock:  # pylint: disable=too-few-public-methods
+    """
+    Clock that only moves when told to.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture(name="clock")
+def fxt_clock():
+    """
+    Create a fake clock.
+    """
+    return FakeClock()
+
+
+@pytest.fixture(name="breaker")
+def fxt_breaker(clock: FakeClock):
+    """
+    Create a circuit breaker without jitter, so delays are predictable.
+    """
+    return CircuitBreaker(
+        failure_threshold=3,
+        backoff_initial=1.0,
+        backoff_max=4.0,
+        jitter=0.0,
+        clock=clock,
+    )
+
+
+def test_breaker_opens_after_threshold(breaker: CircuitBreaker):
+    """
+    Tests whether the breaker only opens after the configured number of
+    consecutive failures.
+    """
+    for _ in range(2):
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state is CircuitState.CLOSED
+
+    assert breaker.allow()
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.OPEN
+    assert not breaker.allow()
+
+
+def test_success_resets_failure_count(breaker: CircuitBreaker):
+    """
+    Tests whether failures need to be consecutive to open the breaker.
+    """
+    breaker.record_failure()
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.consecutive_failures == 1
+
+
+def test_single_probe_after_backoff(breaker: CircuitBreaker, clock: FakeClock):
+    """
+    Tests whether exactly one call is allowed once the backoff delay has
+    passed, and whether a successful probe closes the breaker.
+    """
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 0.9
+    assert not breaker.allow()
+
+    clock.now = 1.0
+    assert breaker.allow()
+    assert breaker.state is CircuitState.HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record_success()
+    assert breaker.state is CircuitState.CLOSED
+    assert breaker.allow()
+
+
+def test_cancelled_probe_allows_new_probe(
+    breaker: CircuitBreaker, clock: FakeClock
+):
+    """
+    Tests whether a probe abandoned before its outcome was known lets the
+    next call probe again, without counting as a failure.
+    """
+    for _ in range(3):
+        breaker.record_failure()
+
+    clock.now = 1.0
+    assert breaker.allow()
+    breaker.record_cancelled()
+
+    assert breaker.state is CircuitState.OPEN
+    assert breaker.consecutive_failures == 3
+    assert breaker.allow()
+    assert breaker.state is CircuitState.HALF_OPEN
+
+
+def test_backoff_doubles_until_max(breaker: CircuitBreaker, clock: FakeClock):
+    """
+    Tests whether every failed probe doubles the backoff delay, up to the
+    configured maximum.
+    """
+    for _ in range(3):
+        breaker.record_failure()
+
+    for expected_delay in [1.0, 2.0, 4.0, 4.0]:
+        clock.now += expected_delay - 0.01
+        assert not breaker.allow()
+        clock.now += 0.01
+        assert breaker.allow()
+        breaker.record_failure()
+        assert breaker.state is CircuitState.OPEN
+
+
+def test_jitter_randomizes_delay(clock: FakeClock):
+    """
+    Tests whether the backoff delay stays within the jitter bounds.
+    """
+    breaker = CircuitBreaker(
+        failure_threshold=1,
+        backoff_initial=10.0,
+        jitter=0.5,
+        clock=clock,
+    )
+    breaker.record_failure()
+
+    clock.now = 4.99
+    assert not breaker.allow()
+    clock.now = 15.0
+    assert breaker.allow()
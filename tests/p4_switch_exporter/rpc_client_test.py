@@ -0,0 +1,149 @@
+"""
+Unit tests for the :py:class:`ska_p4_switch_exporter.rpc_client.RpcClient`.
+"""
+
+import collections
+from unittest import mock
+
+import pytest
+
+from ska_p4_switch_exporter.rpc_client import RpcClient, RpcSequenceError
+
+
+class FakeProtocol:  # pylint: disable=too-few-public-methods
+    """
+    Protocol that replays the replies queued by :py:class:`FakeClient`.
+    """
+
+    def __init__(self):
+        self.replies = collections.deque()
+        self.value = None
+
+    def readMessageBegin(self):  # pylint: disable=invalid-name
+        """
+        Read the header of the next queued reply.
+        """
+        seqid, self.value = self.replies.popleft()
+        return "echo", 2, seqid
+
+
+class FakeClient:
+    """
+    Client with a generated-style ``echo`` method, that records the order
+    in which requests are sent and replies are received.
+    """
+
+    def __init__(self):
+        self._iprot = FakeProtocol()
+        self._seqid = 0
+        self.log = []
+
+    def echo(self, value: int) -> int:
+        """
+        Send a request and wait for its reply.
+        """
+        self.send_echo(value)
+        return self.recv_echo()
+
+    def send_echo(self, value: int):
+        """
+        Send a request, with the current sequence id.
+        """
+        self.log.append(("send", value))
+        self._iprot.replies.append((self._seqid, value))
+
+    def recv_echo(self) -> int:
+        """
+        Receive the reply of a request, failing for negative values.
+        """
+        self._iprot.readMessageBegin()
+        value = self._iprot.value
+        self.log.append(("recv", value))
+        if value < 0:
+            raise ValueError(value)
+        return value
+
+
+@pytest.fixture(name="fake_client")
+def fxt_fake_client():
+    """
+    Create a fake generated client.
+    """
+    return FakeClient()
+
+
+@pytest.fixture(name="client")
+def fxt_client(fake_client: FakeClient):
+    """
+    Create a proxy around the fake client.
+    """
+    return RpcClient(fake_client, mock.MagicMock(byte_counter=None), "echo")
+
+
+def test_pipeline_sends_all_requests_first(
+    client: RpcClient,
+    fake_client: FakeClient,
+):
+    """
+    Tests whether all requests of a pipeline are sent before any reply is
+    read, and whether the replies are returned in order.
+    """
+    assert client.pipeline([("echo", (i,)) for i in range(3)]) == [0, 1, 2]
+    assert fake_client.log == [
+        ("send", 0),
+        ("send", 1),
+        ("send", 2),
+        ("recv", 0),
+        ("recv", 1),
+        ("recv", 2),
+    ]
+    assert fake_client._seqid == 0  # pylint: disable=protected-access
+
+
+def test_pipeline_returns_server_errors(client: RpcClient):
+    """
+    Tests whether an error for one call of a pipeline is returned in place
+    of its result, without affecting the other calls.
+    """
+    first, second, third = client.pipeline(
+        [("echo", (1,)), ("echo", (-1,)), ("echo", (3,))]
+    )
+
+    assert first == 1
+    assert isinstance(second, ValueError)
+    assert third == 3
+
+
+def test_pipeline_detects_out_of_order_replies(
+    client: RpcClient,
+    fake_client: FakeClient,
+):
+    """
+    Tests whether a reply that does not match its request is detected.
+    """
+    original_send = fake_client.send_echo
+
+    def send_with_wrong_seqid(value: int):
+        fake_client._seqid += 1  # pylint: disable=protected-access
+        original_send(value)
+
+    fake_client.send_echo = send_with_wrong_seqid
+
+    with pytest.raises(RpcSequenceError):
+        client.pipeline([("echo", (1,)), ("echo", (2,))])
+
+
+def test_pipeline_falls_back_to_sequential_calls():
+    """
+    Tests whether calls are made one after the other if the client cannot
+    split them into requests and replies.
+    """
+    fake_client = mock.MagicMock(spec=["echo"])
+    fake_client.echo.side_effect = [1, ValueError(), 3]
+    client = RpcClient(fake_client, mock.MagicMock(byte_counter=None), "echo")
+
+    first, second, third = client.pipeline([("echo", (i,)) for i in range(3)])
+
+    assert first == 1
+    assert isinstance(second, ValueError)
+    assert third == 3
@@ -0,0 +1,531 @@
+"""
+Unit tests for the
+:py:class:`ska_p4_switch_exporter.rpc_connection_pool.RpcConnectionPool`.
+"""
+
+import threading
+import time
+from unittest import mock
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from ska_exporter_common import deadline, outcome
+from ska_exporter_common.deadline import DeadlineExceededError
+from ska_exporter_common.poller import PolledCollector
+from ska_exporter_common.refresh import RefreshIntervals
+from ska_exporter_common.registry import ParallelRegistry
+from ska_p4_switch_exporter import rpc_transport
+from ska_p4_switch_exporter.port_collector import PortCollector
+from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
+from ska_p4_switch_exporter.rpc_circuit_breaker import CircuitBreaker
+from ska_p4_switch_exporter.rpc_connection_pool import (
+    RpcConnectionPool,
+    RpcUnavailableError,
+)
+from ska_p4_switch_exporter.system_collector import SystemCollector
+
+from . import pal_rpc_mock, pltfm_mgr_rpc_mock
+
+
+@pytest.fixture(name="transport_factory")
+def fxt_transport_factory(monkeypatch: pytest.MonkeyPatch):
+    """
+    Replaces the buffered transport with a mock, so tests can inspect how
+    often a transport was opened and control whether it is still open.
+    """
+    factory = mock.MagicMock(
+        side_effect=lambda *args, **kwargs: mock.MagicMock(
+            **{"isOpen.return_value": True}
+        )
+    )
+    monkeypatch.setattr(
+        rpc_transport.TTransport, "TBufferedTransport", factory
+    )
+    return factory
+
+
+@pytest.fixture(name="pool")
+def fxt_pool(registry: CollectorRegistry):
+    """
+    Create a connection pool registered with the test registry.
+    """
+    return RpcConnectionPool(rpc_host="", rpc_port=9090, registry=registry)
+
+
+def test_connection_is_reused(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether a connection is kept open and reused after it has been
+    returned to the pool.
+    """
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+
+    assert first is second
+    assert transport_factory.call_count == 1
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_pool_connections")
+        == 1.0
+    )
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_connections_opened_total"
+        )
+        == 1.0
+    )
+
+
+def test_clients_are_cached_per_endpoint(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+):
+    """
+    Tests whether clients for different endpoints share the connection,
+    and whether a client is reused for the same endpoint.
+    """
+    rpc_module = mock.MagicMock()
+    rpc_module.Client.side_effect = lambda *args: mock.MagicMock()
+
+    with pool.connection() as connection:
+        pal_client = connection.client("pal", rpc_module)
+        pltfm_mgr_client = connection.client("pltfm_mgr_rpc", rpc_module)
+    with pool.connection() as connection:
+        assert connection.client("pal", rpc_module) is pal_client
+
+    assert pal_client is not pltfm_mgr_client
+    assert rpc_module.Client.call_count == 2
+    assert transport_factory.call_count == 1
+
+
+def test_borrowers_are_serialized(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+):
+    """
+    Tests whether a caller waits for the single connection to be returned
+    instead of opening a second one.
+    """
+    borrowed = threading.Event()
+    acquired = threading.Event()
+
+    def borrow():
+        borrowed.wait()
+        with pool.connection():
+            acquired.set()
+
+    thread = threading.Thread(target=borrow)
+    thread.start()
+
+    with pool.connection():
+        borrowed.set()
+        assert not acquired.wait(timeout=0.1)
+
+    thread.join(timeout=1)
+    assert acquired.is_set()
+    assert transport_factory.call_count == 1
+
+
+def test_concurrent_borrows_open_separate_connections(
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether a connection that is in use is not handed out twice when
+    the pool allows multiple connections.
+    """
+    pool = RpcConnectionPool(
+        rpc_host="",
+        rpc_port=9090,
+        max_connections=2,
+        registry=registry,
+    )
+    with pool.connection() as first:
+        with pool.connection() as second:
+            assert first is not second
+            assert (
+                registry.get_sample_value(
+                    "p4_switch_exporter_rpc_pool_connections_in_use"
+                )
+                == 2.0
+            )
+
+    assert transport_factory.call_count == 2
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_pool_connections")
+        == 2.0
+    )
+
+
+def test_dead_connection_is_replaced(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether an idle connection that is no longer open is closed and
+    transparently replaced by a new one.
+    """
+    with pool.connection() as connection:
+        # pylint: disable-next=protected-access
+        transport = connection._transport
+        transport.isOpen.return_value = False
+
+    with pool.connection():
+        pass
+
+    transport.close.assert_called_once()
+    assert transport_factory.call_count == 2
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_reconnects_total")
+        == 1.0
+    )
+
+
+def test_connection_is_discarded_after_error(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether a connection is closed instead of returned to the pool
+    when an error occurs while it is borrowed.
+    """
+    with pytest.raises(RuntimeError):
+        with pool.connection() as connection:
+            # pylint: disable-next=protected-access
+            transport = connection._transport
+            raise RuntimeError("Broken pipe")
+
+    transport.close.assert_called_once()
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_pool_connections")
+        == 0.0
+    )
+
+    with pool.connection():
+        pass
+
+    assert transport_factory.call_count == 2
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_reconnects_total")
+        == 1.0
+    )
+
+
+def test_close_closes_idle_connections(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+):
+    """
+    Tests whether closing the pool closes all idle connections.
+    """
+    with pool.connection() as connection:
+        # pylint: disable-next=protected-access
+        transport = connection._transport
+
+    pool.close()
+
+    transport.close.assert_called_once()
+    assert transport_factory.call_count == 1
+
+
+def test_unreachable_server_opens_circuit(
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether connection errors are reported as
+    :py:class:`RpcUnavailableError`, and whether further connections are
+    refused without touching the network once the breaker is open.
+    """
+    transport_factory.side_effect = lambda *args, **kwargs: mock.MagicMock(
+        **{"open.side_effect": OSError("Connection refused")}
+    )
+    pool = RpcConnectionPool(
+        rpc_host="",
+        rpc_port=9090,
+        circuit_breaker=CircuitBreaker(failure_threshold=2),
+        registry=registry,
+    )
+
+    for _ in range(3):
+        with pytest.raises(RpcUnavailableError):
+            with pool.connection():
+                pass
+
+    assert transport_factory.call_count == 2
+    assert registry.get_sample_value("p4_switch_exporter_rpc_up") == 0.0
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_circuit_breaker_open"
+        )
+        == 1.0
+    )
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_consecutive_failures"
+        )
+        == 2.0
+    )
+
+
+def test_application_errors_do_not_open_circuit(
+    pool: RpcConnectionPool,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether errors that are unrelated to the connection are passed on
+    unchanged and do not count as failures of the RPC server.
+    """
+    with pytest.raises(ValueError):
+        with pool.connection():
+            raise ValueError("Invalid port")
+
+    assert registry.get_sample_value("p4_switch_exporter_rpc_up") == 1.0
+
+
+def test_collector_is_skipped_when_server_unavailable(
+    transport_factory: mock.MagicMock,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether an RPC collector yields no metrics instead of failing the
+    scrape when the RPC server cannot be reached, reporting its collection
+    as failed.
+    """
+    transport_factory.side_effect = lambda *args, **kwargs: mock.MagicMock(
+        **{"open.side_effect": OSError("Connection refused")}
+    )
+    pool = RpcConnectionPool(rpc_host="", rpc_port=9090)
+    SystemCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=registry,
+        connection_pool=pool,
+    )
+    registry.register(pool)
+
+    with outcome.track() as result:
+        assert (
+            registry.get_sample_value(
+                "p4_switch_system_temperature_celsius",
+                labels={"id": "tofino"},
+            )
+            is None
+        )
+    assert result.failed
+    assert registry.get_sample_value("p4_switch_exporter_rpc_up") == 0.0
+
+
+def test_polled_collector_keeps_snapshot_when_server_unavailable(
+    pool: RpcConnectionPool,
+    transport_factory: mock.MagicMock,
+):
+    """
+    Tests whether a polled RPC collector keeps the snapshot of its last
+    poll, instead of replacing it with an empty one, while the RPC server
+    cannot be reached.
+    """
+    polled = PolledCollector(
+        SystemCollector(
+            rpc_host="",
+            rpc_port=9090,
+            registry=None,
+            connection_pool=pool,
+        ),
+        interval=1.0,
+    )
+    polled.poll()
+    snapshot = polled.snapshot
+    assert len(snapshot.metrics) > 0
+
+    pool.close()
+    transport_factory.side_effect = lambda *args, **kwargs: mock.MagicMock(
+        **{"open.side_effect": OSError("Connection refused")}
+    )
+    polled.poll()
+
+    assert polled.snapshot is snapshot
+    assert list(polled.collect()) == list(snapshot.metrics)
+
+
+def test_collector_returns_partial_results_after_deadline(
+    pool: RpcConnectionPool,
+    monkeypatch: pytest.MonkeyPatch,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether an RPC collector stops making calls once the deadline of
+    the scrape has passed, and still yields what it collected until then,
+    reporting its collection as partial.
+    """
+    all_stats_get = pal_rpc_mock.Client.pal_port_all_stats_get
+
+    def slow_all_stats_get(*args, **kwargs):
+        time.sleep(0.05)
+        return all_stats_get(*args, **kwargs)
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_all_stats_get", slow_all_stats_get
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        connection_pool=pool,
+    )
+
+    with deadline.scope(deadline.Deadline(0.2)), outcome.track() as result:
+        metrics = {metric.name: metric for metric in collector.collect()}
+
+    assert result.partial and not result.failed
+    assert 0 < len(metrics["p4_switch_port_up"].samples) < 16
+    assert len(metrics["p4_switch_port_stats_rx_bytes"].samples) > 0
+    assert registry.get_sample_value("p4_switch_exporter_rpc_up") == 1.0
+
+
+def test_transport_error_discards_connection(
+    pool: RpcConnectionPool,
+    monkeypatch: pytest.MonkeyPatch,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether a transport error raised by a call that is not pipelined
+    stops the collection and discards the connection, instead of the next
+    calls being made over it.
+    """
+    is_valid = pal_rpc_mock.Client.pal_port_is_valid
+    calls = []
+
+    def timed_out_is_valid(self, dev_id: int, port: int):
+        if calls is None:
+            return is_valid(self, dev_id, port)
+        calls.append(port)
+        raise rpc_transport.TTransport.TTransportException("Timed out")
+
+    monkeypatch.setattr(
+        pal_rpc_mock.Client, "pal_port_is_valid", timed_out_is_valid
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        connection_pool=pool,
+        refresh_intervals=RefreshIntervals(),
+    )
+    # The ports are enumerated, then checked on the next collection
+    calls = None
+    list(collector.collect())
+    calls = []
+
+    with outcome.track() as result:
+        list(collector.collect())
+
+    assert result.failed
+    assert len(calls) == 1
+    assert (
+        registry.get_sample_value("p4_switch_exporter_rpc_pool_connections")
+        == 0.0
+    )
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_consecutive_failures"
+        )
+        == 1.0
+    )
+
+
+def test_waiting_for_connection_is_bounded_by_deadline(
+    pool: RpcConnectionPool,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether waiting for a connection gives up once the deadline has
+    passed, without counting as a failure of the RPC server.
+    """
+    with pool.connection():
+        with deadline.scope(deadline.Deadline(0.05)):
+            with pytest.raises(DeadlineExceededError):
+                with pool.connection():
+                    pass
+
+    assert registry.get_sample_value("p4_switch_exporter_rpc_up") == 1.0
+
+
+def test_collectors_sharing_pool_overlap(
+    monkeypatch: pytest.MonkeyPatch, registry: CollectorRegistry
+):
+    """
+    Tests whether the collectors sharing a pool sized as the exporter does
+    read the switch at the same time, instead of waiting for each other's
+    connection.
+    """
+    rpc_concurrency, max_devices = 1, 1
+    # Each collector waits in its first call until all of them are in one
+    overlap = threading.Barrier(3, timeout=5.0)
+    waited = set()
+    for rpc_mock, method in [
+        (pltfm_mgr_rpc_mock, "pltfm_mgr_sys_tmp_get"),
+        (pltfm_mgr_rpc_mock, "pltfm_mgr_qsfp_get_max_port"),
+        (pal_rpc_mock, "pal_port_get_first"),
+    ]:
+
+        def overlapping(
+            *args,
+            method=method,
+            call=getattr(rpc_mock.Client, method),
+            **kwargs,
+        ):
+            if method not in waited:
+                waited.add(method)
+                overlap.wait()
+            return call(*args, **kwargs)
+
+        monkeypatch.setattr(rpc_mock.Client, method, overlapping)
+
+    pool = RpcConnectionPool(
+        rpc_host="",
+        rpc_port=9090,
+        max_connections=1 + rpc_concurrency + rpc_concurrency * max_devices,
+        registry=registry,
+    )
+    parallel_registry = ParallelRegistry(metric_prefix="p4_switch_exporter")
+    for collector in [
+        SystemCollector(
+            rpc_host="", rpc_port=9090, registry=None, connection_pool=pool
+        ),
+        QSFPCollector(
+            rpc_host="",
+            rpc_port=9090,
+            registry=None,
+            connection_pool=pool,
+            concurrency=rpc_concurrency,
+        ),
+        PortCollector(
+            rpc_host="",
+            rpc_port=9090,
+            registry=None,
+            connection_pool=pool,
+            concurrency=rpc_concurrency,
+            max_devices=max_devices,
+        ),
+    ]:
+        parallel_registry.register(collector)
+
+    try:
+        names = {metric.name for metric in parallel_registry.collect()}
+    finally:
+        parallel_registry.close()
+
+    assert not overlap.broken
+    assert {
+        "p4_switch_system_temperature_celsius",
+        "p4_switch_qsfp_present",
+        "p4_switch_port_up",
+    } <= names
@@ -0,0 +1,120 @@
+"""
+Unit tests for the
+:py:class:`ska_p4_switch_exporter.rpc_instrumentation.RpcInstrumentation`.
+"""
+
+from unittest import mock
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from ska_p4_switch_exporter import rpc_transport
+from ska_p4_switch_exporter.port_collector import PortCollector
+from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+from ska_p4_switch_exporter.rpc_instrumentation import RpcInstrumentation
+
+
+@pytest.fixture(name="instrumentation")
+def fxt_instrumentation(registry: CollectorRegistry):
+    """
+    Create an RPC instrumentation registered with the test registry.
+    """
+    return RpcInstrumentation(buckets=(0.01, 0.1), registry=registry)
+
+
+def test_call_duration_histogram(
+    instrumentation: RpcInstrumentation,
+    registry: CollectorRegistry,
+):
+    """
+    Tests whether call durations are sorted into cumulative buckets.
+    """
+    for duration in [0.005, 0.01, 0.05, 0.5]:
+        instrumentation.record_call(
+            "pal", "pal_port_all_stats_get", duration, False
+        )
+
+    labels = {"endpoint": "pal", "method": "pal_port_all_stats_get"}
+    for le, expected in [("0.01", 2.0), ("0.1", 3.0), ("+Inf", 4.0)]:
+        assert (
+            registry.get_sample_value(
+                "p4_switch_exporter_rpc_duration_seconds_bucket",
+                labels={**labels, "le": le},
+            )
+            == expected
+        )
+    assert registry.get_sample_value(
+        "p4_switch_exporter_rpc_duration_seconds_sum", labels=labels
+    ) == pytest.approx(0.565)
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_calls_total", labels=labels
+        )
+        == 4.0
+    )
+
+
+def test_calls_are_recorded_by_clients(
+    instrumentation: RpcInstrumentation,
+    registry: CollectorRegistry,
+    monkeypatch: pytest.MonkeyPatch,
+):
+    """
+    Tests whether the calls made by a collector through a pool with
+    instrumentation are recorded per endpoint and method.
+    """
+    monkeypatch.setattr(
+        rpc_transport.TTransport,
+        "TBufferedTransport",
+        mock.MagicMock(
+            side_effect=lambda *args, **kwargs: mock.MagicMock(
+                **{"isOpen.return_value": True}
+            )
+        ),
+    )
+    pool = RpcConnectionPool(
+        rpc_host="",
+        rpc_port=9090,
+        instrumentation=instrumentation,
+    )
+    collector = PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=None,
+        connection_pool=pool,
+    )
+    list(collector.collect())
+
+    def get(name: str, method: str) -> float:
+        return registry.get_sample_value(
+            name, labels={"endpoint": "pal", "method": method}
+        )
+
+    assert (
+        get("p4_switch_exporter_rpc_calls_total", "pal_port_all_stats_get")
+        == 16.0
+    )
+    assert (
+        get("p4_switch_exporter_rpc_errors_total", "pal_port_all_stats_get")
+        == 0.0
+    )
+    # The end of the port list is signalled with an error
+    assert (
+        get("p4_switch_exporter_rpc_errors_total", "pal_port_get_next") == 1.0
+    )
+    assert (
+        registry.get_sample_value(
+            "p4_switch_exporter_rpc_connect_duration_seconds_count"
+        )
+        == 1.0
+    )
+
+
+def test_nothing_is_recorded_without_instrumentation():
+    """
+    Tests whether connections of a pool without instrumentation neither
+    count bytes nor record calls.
+    """
+    pool = RpcConnectionPool(rpc_host="", rpc_port=9090)
+    with pool.connection() as connection:
+        assert connection.byte_counter is None
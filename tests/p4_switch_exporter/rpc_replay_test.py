@@ -0,0 +1,143 @@
+"""
+Unit tests for the
+:py:class:`ska_p4_switch_exporter.rpc_replay.RpcReplayPool`.
+"""
+
+import dataclasses
+import pathlib
+import time
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from ska_exporter_common import deadline
+from ska_exporter_common.call_trace import TraceWriter, read_trace
+from ska_p4_switch_exporter.port_collector import PortCollector
+from ska_p4_switch_exporter.qsfp_collector import QSFPCollector
+from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+from ska_p4_switch_exporter.rpc_replay import RpcReplayError, RpcReplayPool
+from ska_p4_switch_exporter.system_collector import SystemCollector
+
+from . import pal_rpc_mock
+
+
+def collect(pool, pipeline_depth: int = 0) -> dict:
+    """
+    Collect the samples of all RPC collectors through the given pool.
+    """
+    registry = CollectorRegistry()
+    PortCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=registry,
+        connection_pool=pool,
+        pipeline_depth=pipeline_depth,
+    )
+    for collector in [QSFPCollector, SystemCollector]:
+        collector(
+            rpc_host="",
+            rpc_port=9090,
+            registry=registry,
+            connection_pool=pool,
+        )
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for metric in registry.collect()
+        for sample in metric.samples
+    }
+
+
+@pytest.fixture(
+    name="recording", params=[0, 8], ids=["sequential", "pipelined"]
+)
+def fxt_recording(
+    tmp_path: pathlib.Path, request: pytest.FixtureRequest
+) -> tuple[pathlib.Path, dict]:
+    """
+    Record the calls of all RPC collectors to a trace, with and without
+    pipelining, returning the trace and the samples that were collected.
+    """
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path) as recorder:
+        samples = collect(
+            RpcConnectionPool(rpc_host="", rpc_port=9090, recorder=recorder),
+            pipeline_depth=request.param,
+        )
+    return path, samples
+
+
+@pytest.fixture(name="trace")
+def fxt_trace(recording: tuple[pathlib.Path, dict]) -> pathlib.Path:
+    """
+    Record the calls of all RPC collectors to a trace.
+    """
+    return recording[0]
+
+
+def test_replay_matches_recording(recording: tuple[pathlib.Path, dict]):
+    """
+    Tests whether collecting from a replayed trace gives the samples that
+    were collected while recording it.
+    """
+    trace, recorded = recording
+    replayed = collect(RpcReplayPool(read_trace(trace)))
+
+    assert replayed == recorded
+    assert replayed[
+        (
+            "p4_switch_port_stats_rx_bytes_total",
+            (("channel", "0"), ("device", "0"), ("port", "1")),
+        )
+    ]
+
+
+def test_errors_are_replayed(trace: pathlib.Path):
+    """
+    Tests whether recorded errors are raised again as the exception of the
+    RPC module.
+    """
+    pool = RpcReplayPool(read_trace(trace))
+    with pool.connection() as connection:
+        client = connection.client("pal", pal_rpc_mock)
+        # The end of the port list is signalled with an error
+        with pytest.raises(pal_rpc_mock.InvalidPalOperation):
+            client.pal_port_get_next(0, 16)
+
+
+def test_unrecorded_calls_fail(trace: pathlib.Path):
+    """
+    Tests whether replaying a call that was not recorded raises an error.
+    """
+    pool = RpcReplayPool(read_trace(trace))
+    with pool.connection() as connection:
+        client = connection.client("pal", pal_rpc_mock)
+        with pytest.raises(RpcReplayError):
+            client.pal_port_all_stats_get(1, 0)
+
+
+def test_replay_speed(trace: pathlib.Path):
+    """
+    Tests whether calls take their recorded duration divided by the speed.
+    """
+    records = [
+        dataclasses.replace(record, duration=0.04)
+        for record in read_trace(trace)
+    ]
+    pool = RpcReplayPool(records, speed=2.0)
+    with pool.connection() as connection:
+        client = connection.client("pal", pal_rpc_mock)
+        start = time.monotonic()
+        client.pal_port_get_first(0)
+        assert time.monotonic() - start == pytest.approx(0.02, abs=0.015)
+
+
+def test_replay_stops_at_deadline(trace: pathlib.Path):
+    """
+    Tests whether no call is replayed once the deadline has passed.
+    """
+    pool = RpcReplayPool(read_trace(trace))
+    with pool.connection() as connection:
+        client = connection.client("pal", pal_rpc_mock)
+        with deadline.scope(deadline.Deadline(0.0)):
+            with pytest.raises(deadline.DeadlineExceededError):
+                client.pal_port_get_first(0)
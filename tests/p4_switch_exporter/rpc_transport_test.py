@@ -0,0 +1,146 @@
+# pylint: disable=no-member
+
+"""
+Unit tests for the
+:py:class:`ska_p4_switch_exporter.rpc_transport.RpcTransportFactory`.
+"""
+
+import socket
+from unittest import mock
+
+import pytest
+
+from ska_p4_switch_exporter import rpc_transport
+from ska_p4_switch_exporter.rpc_transport import (
+    ByteCounter,
+    RpcTransportFactory,
+)
+
+
+@pytest.fixture(name="handle")
+def fxt_handle(monkeypatch: pytest.MonkeyPatch):
+    """
+    Makes the socket transport return a real (unconnected) socket handle,
+    so that socket options can be inspected.
+    """
+    handle = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    monkeypatch.setattr(
+        rpc_transport.TSocket,
+        "TSocket",
+        mock.MagicMock(return_value=mock.MagicMock(handle=handle)),
+    )
+    yield handle
+    handle.close()
+
+
+@pytest.mark.parametrize(
+    ("protocol", "fastbinary", "expected"),
+    [
+        ("accelerated", object(), "TBinaryProtocolAccelerated"),
+        ("accelerated", None, "TBinaryProtocol"),
+        ("binary", object(), "TBinaryProtocol"),
+    ],
+)
+def test_protocol_selection(
+    monkeypatch: pytest.MonkeyPatch,
+    protocol: str,
+    fastbinary: object | None,
+    expected: str,
+):
+    """
+    Tests whether the accelerated protocol is only used when requested and
+    when the Thrift C extension is available.
+    """
+    monkeypatch.setattr(rpc_transport, "fastbinary", fastbinary)
+    binary_protocol = mock.MagicMock()
+    monkeypatch.setattr(rpc_transport, "TBinaryProtocol", binary_protocol)
+
+    factory = RpcTransportFactory(protocol=protocol)
+    transport = mock.MagicMock()
+    result = factory.create_protocol(transport)
+
+    assert result is getattr(binary_protocol, expected).return_value
+    getattr(binary_protocol, expected).assert_called_once_with(transport)
+
+
+def test_unknown_protocol_is_rejected():
+    """
+    Tests whether creating a factory with an unknown protocol fails.
+    """
+    with pytest.raises(ValueError):
+        RpcTransportFactory(protocol="compact")
+
+
+def test_socket_options_are_applied(handle: socket.socket):
+    """
+    Tests whether the configured socket options are applied to the socket
+    once the transport is opened.
+    """
+    factory = RpcTransportFactory(socket_buffer_size=65536)
+    factory.open_transport("localhost", 9090)
+
+    assert handle.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    assert handle.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+    # Linux doubles the requested value to account for bookkeeping overhead
+    assert handle.getsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF) >= 65536
+
+
+def test_socket_options_can_be_disabled(handle: socket.socket):
+    """
+    Tests whether socket options are left alone when disabled.
+    """
+    factory = RpcTransportFactory(tcp_nodelay=False, tcp_keepalive=False)
+    factory.open_transport("localhost", 9090)
+
+    assert not handle.getsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY)
+    assert not handle.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+
+
+def test_timeout_and_read_buffer_are_applied(
+    monkeypatch: pytest.MonkeyPatch,
+    handle: socket.socket,
+):
+    """
+    Tests whether the timeout and read buffer size are passed on to the
+    Thrift transports.
+    """
+    buffered_transport = mock.MagicMock()
+    monkeypatch.setattr(
+        rpc_transport.TTransport, "TBufferedTransport", buffered_transport
+    )
+
+    factory = RpcTransportFactory(timeout_ms=1234, read_buffer_size=8192)
+    sock, transport = factory.open_transport("localhost", 9090)
+
+    assert sock.handle is handle
+    sock.setTimeout.assert_called_once_with(1234)
+    buffered_transport.assert_called_once_with(sock, rbuf_size=8192)
+    transport.open.assert_called_once()
+
+
+def test_bytes_are_counted(
+    monkeypatch: pytest.MonkeyPatch,
+    handle: socket.socket,
+):
+    """
+    Tests whether the bytes written to and read from the socket are added
+    to the given counter.
+    """
+    buffered_transport = mock.MagicMock()
+    monkeypatch.setattr(
+        rpc_transport.TTransport, "TBufferedTransport", buffered_transport
+    )
+
+    counter = ByteCounter()
+    sock, _ = RpcTransportFactory().open_transport(
+        "localhost", 9090, counter=counter
+    )
+    sock.read.return_value = b"reply"
+
+    counting_transport = buffered_transport.call_args.args[0]
+    counting_transport.write(b"request")
+    assert counting_transport.readAll(5) == b"reply"
+
+    assert sock.handle is handle
+    sock.write.assert_called_once_with(b"request")
+    assert counter == ByteCounter(sent=7, received=5)
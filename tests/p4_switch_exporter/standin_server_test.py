@@ -0,0 +1,102 @@
+"""
+Unit tests for the stand-in Thrift server in ``benchmarks/standin_server.py``.
+
+The stand-in server and the exporter run in a subprocess, because the
+tests of this package replace ``thrift`` and the SDE modules with mocks
+for the whole session.
+"""
+
+import json
+import os
+import pathlib
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = pathlib.Path(__file__).parents[2]
+
+# Makes a pipelined call to the stand-in server, then restarts the server
+# on the same port, so that the pooled connection has to be replaced
+SCENARIO = textwrap.dedent(
+    """
+    import json
+
+    from benchmarks import standin_server
+
+    standin_server.install_sde_modules()
+
+    from tofino.pal_rpc import pal
+
+    from ska_p4_switch_exporter.rpc_connection_pool import RpcConnectionPool
+
+
+    def is_valid(pool, ports):
+        with pool.connection() as connection:
+            return connection.client("pal", pal).pipeline(
+                [("pal_port_is_valid", (0, port)) for port in ports]
+            )
+
+
+    model = {"front_ports": 2, "channels": 2}
+    with standin_server.serve_in_subprocess(**model) as (host, port):
+        pool = RpcConnectionPool(rpc_host=host, rpc_port=port)
+        first = is_valid(pool, [0, 1, 2, 8])
+    with standin_server.serve_in_subprocess(port=port, **model):
+        second = is_valid(pool, [9, 10])
+
+    print(
+        json.dumps(
+            {
+                "first": first,
+                "second": second,
+                "samples": {
+                    sample.name: sample.value
+                    for metric in pool.collect()
+                    for sample in metric.samples
+                },
+            }
+        )
+    )
+    """
+)
+
+
+def run_python(code: str) -> subprocess.CompletedProcess:
+    """
+    Run Python code in a subprocess from the root of the repository.
+    """
+    return subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=ROOT,
+        env={
+            **os.environ,
+            "PYTHONPATH": os.pathsep.join([str(ROOT / "src"), str(ROOT)]),
+        },
+        capture_output=True,
+        text=True,
+        timeout=60,
+        check=False,
+    )
+
+
+def test_pipelined_call_and_reconnect():
+    """
+    Tests whether a pipelined call through the connection pool is served
+    by the stand-in server, and whether the pool reconnects once the server
+    is restarted.
+    """
+    if run_python("import thrift").returncode:
+        pytest.skip("thrift is not installed")
+
+    result = run_python(SCENARIO)
+
+    assert result.returncode == 0, result.stderr
+    output = json.loads(result.stdout)
+    assert output["first"] == [1, 1, 0, 1]
+    assert output["second"] == [1, 0]
+    samples = output["samples"]
+    assert samples["p4_switch_exporter_rpc_connections_opened_total"] == 2.0
+    assert samples["p4_switch_exporter_rpc_reconnects_total"] == 1.0
+    assert samples["p4_switch_exporter_rpc_up"] == 1.0
@@ -6,11 +6,16 @@ Note: the expected values in this test match the hard-coded test data
 provided in ``pltfm_mgr_rpc_mock.py``.
 """
 
+import time
+
 import pytest
 from prometheus_client import CollectorRegistry
 
+from ska_exporter_common.refresh import RefreshIntervals
 from ska_p4_switch_exporter.system_collector import SystemCollector
 
+from . import pltfm_mgr_rpc_mock
+
 
 @pytest.fixture(autouse=True)
 def register(registry: CollectorRegistry):
@@ -48,3 +53,37 @@ def test_system_temperature_celsius(
         )
         == expected
     )
+
+
+def test_temperatures_are_medium_tier(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the system temperatures are only read again once older
+    than the medium refresh interval.
+    """
+    reads = []
+    sys_tmp_get = pltfm_mgr_rpc_mock.Client.pltfm_mgr_sys_tmp_get
+
+    def counted_sys_tmp_get(self):
+        reads.append(time.monotonic())
+        return sys_tmp_get(self)
+
+    monkeypatch.setattr(
+        pltfm_mgr_rpc_mock.Client, "pltfm_mgr_sys_tmp_get", counted_sys_tmp_get
+    )
+    registry = CollectorRegistry()
+    SystemCollector(
+        rpc_host="",
+        rpc_port=9090,
+        registry=registry,
+        refresh_intervals=RefreshIntervals(medium=0.1),
+    )
+
+    for _ in range(2):
+        assert registry.get_sample_value(
+            "p4_switch_system_temperature_celsius", labels={"id": "tofino"}
+        ) == pytest.approx(47.5)
+    assert len(reads) == 1
+
+    time.sleep(0.1)
+    list(registry.collect())
+    assert len(reads) == 2
@@ -0,0 +1,81 @@
+"""
+Unit tests for the :py:mod:`ska_xrt_fpga_exporter.pyxrt_trace` module.
+"""
+
+import pathlib
+
+import pytest
+from prometheus_client import CollectorRegistry
+
+from ska_exporter_common.call_trace import TraceWriter, read_trace
+from ska_xrt_fpga_exporter.pyxrt_trace import (
+    PyxrtReplayError,
+    RecordingPyxrt,
+    ReplayPyxrt,
+)
+from ska_xrt_fpga_exporter.xrt_fpga_collector import XrtFpgaCollector
+
+from . import pyxrt_mock
+
+
+def collect(pyxrt_module) -> dict:
+    """
+    Collect the samples of the collector with the given ``pyxrt`` module.
+    """
+    registry = CollectorRegistry()
+    XrtFpgaCollector(registry=registry, pyxrt_module=pyxrt_module)
+    return {
+        (sample.name, tuple(sorted(sample.labels.items()))): sample.value
+        for metric in registry.collect()
+        for sample in metric.samples
+    }
+
+
+@pytest.fixture(name="trace")
+def fxt_trace(tmp_path: pathlib.Path) -> pathlib.Path:
+    """
+    Record the calls of the collector to a trace.
+    """
+    path = tmp_path / "trace.bin"
+    with TraceWriter.open(path) as recorder:
+        collect(RecordingPyxrt(pyxrt_mock, recorder))
+    return path
+
+
+def test_replay_matches_recording(trace: pathlib.Path):
+    """
+    Tests whether collecting from a replayed trace gives the samples that
+    are collected from the devices.
+    """
+    replayed = collect(ReplayPyxrt(read_trace(trace)))
+
+    assert replayed == collect(pyxrt_mock)
+    assert replayed[
+        (
+            "xrt_fpga_temperature_celsius",
+            (
+                ("bdf", "0000:00:00.1"),
+                ("description", "FPGA"),
+                ("location", "fpga0"),
+            ),
+        )
+    ] == pytest.approx(27.0)
+
+
+def test_errors_are_replayed(trace: pathlib.Path):
+    """
+    Tests whether recorded errors are raised again, such as the one that
+    ends the enumeration of the devices.
+    """
+    replay = ReplayPyxrt(read_trace(trace))
+    with pytest.raises(RuntimeError, match="No device for device_num 2"):
+        replay.device(2)
+
+
+def test_unrecorded_calls_fail(trace: pathlib.Path):
+    """
+    Tests whether replaying a call that was not recorded raises an error.
+    """
+    replay = ReplayPyxrt(read_trace(trace))
+    with pytest.raises(PyxrtReplayError):
+        replay.device(3)
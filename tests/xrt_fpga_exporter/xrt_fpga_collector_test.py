@@ -6,11 +6,17 @@ Note: the expected values in this test match the hard-coded test data
 provided in ``pyxrt_mock.py``.
 """
 
+import json
+
 import pytest
 from prometheus_client import CollectorRegistry
 
+from ska_exporter_common import deadline
+from ska_exporter_common.refresh import RefreshIntervals
 from ska_xrt_fpga_exporter.xrt_fpga_collector import XrtFpgaCollector
 
+from . import pyxrt_mock
+
 
 @pytest.fixture(autouse=True)
 def register(registry: CollectorRegistry):
@@ -187,3 +193,117 @@ def test_collector_does_not_export_metric(
     but aims to cover every applicable metric at least once per device.
     """
     assert registry.get_sample_value(metric, labels=labels) is None
+
+
+def test_devices_are_skipped_after_deadline(registry: CollectorRegistry):
+    """
+    Tests whether no further devices are read once the deadline of the
+    scrape has passed.
+    """
+    labels = {"bdf": "0000:00:00.1"}
+    assert registry.get_sample_value("xrt_fpga_power_watts", labels)
+
+    with deadline.scope(deadline.Deadline(0)):
+        assert (
+            registry.get_sample_value("xrt_fpga_power_watts", labels) is None
+        )
+
+
+def test_refresh_tiers(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the static device information is only read once with
+    refresh tiers, while the thermal readings are read on every collection,
+    and whether the information of devices that are gone is read again.
+    """
+    reads = []
+    get_info = pyxrt_mock.FakeXrtDevice.get_info
+
+    def counted_get_info(self, info_device):
+        reads.append(info_device.name)
+        return get_info(self, info_device)
+
+    monkeypatch.setattr(pyxrt_mock.FakeXrtDevice, "get_info", counted_get_info)
+    collector = XrtFpgaCollector(
+        registry=None, refresh_intervals=RefreshIntervals()
+    )
+
+    for _ in range(2):
+        list(collector.collect())
+    assert reads.count("platform") == 2
+    assert reads.count("thermal") == 4
+
+    # Only the first device is found, then both again
+    device = pyxrt_mock.device
+    monkeypatch.setattr(
+        pyxrt_mock,
+        "device",
+        lambda index: device(index + 2 if index else index),
+    )
+    list(collector.collect())
+    monkeypatch.setattr(pyxrt_mock, "device", device)
+    list(collector.collect())
+    assert reads.count("platform") == 3
+
+
+def test_adaptive_refresh(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether flat thermal and electrical readings are read less and
+    less often with adaptive refresh, and whether the fans are only read
+    for their critical temperature once.
+    """
+    reads = []
+    get_info = pyxrt_mock.FakeXrtDevice.get_info
+
+    def counted_get_info(self, info_device):
+        reads.append(info_device.name)
+        return get_info(self, info_device)
+
+    monkeypatch.setattr(pyxrt_mock.FakeXrtDevice, "get_info", counted_get_info)
+    collector = XrtFpgaCollector(
+        registry=None, refresh_intervals=RefreshIntervals(adaptive_max=10.0)
+    )
+
+    for _ in range(4):
+        list(collector.collect())
+
+    # Each device is read again once before backing off
+    assert reads.count("thermal") == 4
+    assert reads.count("electrical") == 4
+    assert reads.count("mechanical") == 2
+
+
+def test_thermal_readings_close_to_fan_limit(monkeypatch: pytest.MonkeyPatch):
+    """
+    Tests whether the thermal readings of a device are read on every
+    collection while close to the critical temperature of its fans.
+    """
+    reads = []
+    get_info = pyxrt_mock.FakeXrtDevice.get_info
+
+    def hot_get_info(self, info_device):
+        reads.append(info_device.name)
+        if info_device.name == "mechanical":
+            return json.dumps(
+                {
+                    "fans": [
+                        {
+                            "location_id": "fpga_fan_1",
+                            "description": "FPGA Fan 1",
+                            "critical_trigger_temp_C": "27",
+                            "speed_rpm": "1000",
+                            "is_present": "true",
+                        }
+                    ]
+                }
+            )
+        return get_info(self, info_device)
+
+    monkeypatch.setattr(pyxrt_mock.FakeXrtDevice, "get_info", hot_get_info)
+    collector = XrtFpgaCollector(
+        registry=None, refresh_intervals=RefreshIntervals(adaptive_max=10.0)
+    )
+
+    for _ in range(4):
+        list(collector.collect())
+
+    assert reads.count("thermal") == 8